@@ -2,10 +2,13 @@
 from django.contrib import admin
 from .models import (
     Notification, Company, Rol, UserCompany, Ship, SeatType, 
-    Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment
+    Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment,
+    ChangeLog, NotificationCounter, Job, RevokedToken, FareCalendarDay, TripSchedule, SeatTypeAvailability,
+    IdempotencyKey
 )
 
 admin.site.register(Notification)
+admin.site.register(NotificationCounter)
 admin.site.register(Company)
 admin.site.register(Rol)
 admin.site.register(UserCompany)
@@ -17,4 +20,11 @@ admin.site.register(Trip)
 admin.site.register(TripSeat)
 admin.site.register(Booking)
 admin.site.register(PaymentMethod)
-admin.site.register(Payment)
\ No newline at end of file
+admin.site.register(Payment)
+admin.site.register(ChangeLog)
+admin.site.register(Job)
+admin.site.register(RevokedToken)
+admin.site.register(FareCalendarDay)
+admin.site.register(TripSchedule)
+admin.site.register(SeatTypeAvailability)
+admin.site.register(IdempotencyKey)
\ No newline at end of file
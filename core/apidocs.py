@@ -0,0 +1,47 @@
+# apidocs.py
+"""Swagger and ReDoc pages that load drf_yasg's schema machinery on first use.
+
+``drf_yasg.views`` imports its generators, inspectors, renderers and codecs;
+serving workers only need them once someone opens the documentation, not to
+boot. ``get_schema_view`` takes drf_yasg's arguments and returns an object
+with the same ``with_ui``/``without_ui`` methods, whose views build the real
+ones on their first request.
+"""
+import threading
+
+from django.views.decorators.csrf import csrf_exempt
+
+
+class LazySchemaView:
+    def __init__(self, *args, **kwargs):
+        self._args, self._kwargs = args, kwargs
+        self._schema_view = None
+        self._lock = threading.Lock()
+
+    def schema_view(self):
+        with self._lock:
+            if self._schema_view is None:
+                from drf_yasg.views import get_schema_view as build
+
+                self._schema_view = build(*self._args, **self._kwargs)
+        return self._schema_view
+
+    def _lazy(self, method, *args):
+        built = []
+
+        @csrf_exempt
+        def view(request, *view_args, **view_kwargs):
+            if not built:
+                built.append(getattr(self.schema_view(), method)(*args))
+            return built[0](request, *view_args, **view_kwargs)
+        return view
+
+    def with_ui(self, renderer='swagger', cache_timeout=0, cache_kwargs=None):
+        return self._lazy('with_ui', renderer, cache_timeout, cache_kwargs)
+
+    def without_ui(self, cache_timeout=0, cache_kwargs=None):
+        return self._lazy('without_ui', cache_timeout, cache_kwargs)
+
+
+def get_schema_view(*args, **kwargs):
+    return LazySchemaView(*args, **kwargs)
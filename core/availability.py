@@ -0,0 +1,127 @@
+# availability.py
+"""Denormalized seat availability: ``Trip.available_seats`` and
+``SeatTypeAvailability.available``.
+
+Every ``TripSeat`` save or delete moves the counters with ``F()`` updates
+inside the same transaction (``TripSeat.save`` locks the row and records its
+previous state, ``core.signals`` calls ``seat_saved``/``seat_deleted``).
+Bulk writes that skip signals call ``reconcile`` for the trips they touched;
+``python manage.py reconcile_availability`` repairs any remaining drift.
+"""
+from collections import Counter
+
+from django.db import router, transaction
+from django.db.models import Count, F
+
+from .bulk import upsert
+from .models import Seat, SeatTypeAvailability, Trip, TripSeat
+
+AVAILABLE = 'disponible'
+
+
+def _apply(deltas):
+    """Apply ``{(trip_id, seat_id): delta}`` to both counters."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    seat_types = dict(
+        Seat.objects.filter(pk__in={seat_id for _, seat_id in deltas}).values_list('id', 'seatType_id')
+    )
+    per_trip, per_type = Counter(), Counter()
+    for (trip_id, seat_id), delta in deltas.items():
+        per_trip[trip_id] += delta
+        if seat_id in seat_types:
+            per_type[(trip_id, seat_types[seat_id])] += delta
+
+    for trip_id, delta in per_trip.items():
+        if delta:
+            Trip.objects.filter(pk=trip_id).update(available_seats=F('available_seats') + delta)
+    for (trip_id, seat_type_id), delta in per_type.items():
+        if not delta:
+            continue
+        rows = SeatTypeAvailability.objects.filter(trip_id=trip_id, seatType_id=seat_type_id)
+        # A missing row is only created for a gain: losses also come from
+        # cascade deletes, where the trip and its rows are already gone.
+        if not rows.update(available=F('available') + delta) and delta > 0:
+            SeatTypeAvailability.objects.bulk_create(
+                [SeatTypeAvailability(trip_id=trip_id, seatType_id=seat_type_id, available=0)],
+                ignore_conflicts=True,
+            )
+            rows.update(available=F('available') + delta)
+
+
+def seat_saved(trip_seat, created):
+    previous = None if created else getattr(trip_seat, '_previous', None)
+    if not created and previous is None:
+        return
+    deltas = Counter()
+    if previous is not None and previous[2] == AVAILABLE:
+        deltas[(previous[0], previous[1])] -= 1
+    if trip_seat.state == AVAILABLE:
+        deltas[(trip_seat.trip_id, trip_seat.seat_id)] += 1
+    _apply(deltas)
+
+
+def seat_deleted(trip_seat):
+    if trip_seat.state == AVAILABLE:
+        _apply({(trip_seat.trip_id, trip_seat.seat_id): -1})
+
+
+def seats_deleted(trip_seats):
+    """``seat_deleted`` for ``(trip_id, seat_id, state)`` rows deleted without signals."""
+    deltas = Counter()
+    for trip_id, seat_id, state in trip_seats:
+        if state == AVAILABLE:
+            deltas[(trip_id, seat_id)] -= 1
+    _apply(deltas)
+
+
+def reconcile(trip_ids, fix=True):
+    """Recount the counters of ``trip_ids`` from ``TripSeat`` and repair drift.
+
+    The trips are locked while they are recounted, so transitions committed
+    meanwhile apply their deltas on top of the corrected values. Returns the
+    number of drifted trips.
+    """
+    with transaction.atomic(using=router.db_for_write(Trip)):
+        stored = dict(
+            Trip.objects.select_for_update().filter(pk__in=trip_ids).order_by('pk')
+            .values_list('id', 'available_seats')
+        )
+        if not stored:
+            return 0
+        by_type = Counter()
+        for trip_id, seat_type_id, n in (
+            TripSeat.objects.filter(trip_id__in=stored, state=AVAILABLE)
+            .values_list('trip_id', 'seat__seatType_id').annotate(n=Count('id'))
+        ):
+            by_type[(trip_id, seat_type_id)] = n
+        actual = Counter()
+        for (trip_id, _), n in by_type.items():
+            actual[trip_id] += n
+        stored_by_type = {
+            (trip_id, seat_type_id): available
+            for trip_id, seat_type_id, available in SeatTypeAvailability.objects.filter(trip_id__in=stored)
+            .values_list('trip_id', 'seatType_id', 'available')
+        }
+
+        drifted_trips = {trip_id for trip_id, available in stored.items() if available != actual[trip_id]}
+        drifted_types = {
+            key for key in set(by_type) | set(stored_by_type) if stored_by_type.get(key) != by_type[key]
+        }
+        drifted = drifted_trips | {trip_id for trip_id, _ in drifted_types}
+        if fix:
+            Trip.objects.bulk_update(
+                [Trip(pk=trip_id, available_seats=actual[trip_id]) for trip_id in drifted_trips],
+                ['available_seats'], batch_size=1000,
+            )
+            upsert(
+                SeatTypeAvailability,
+                [
+                    SeatTypeAvailability(trip_id=trip_id, seatType_id=seat_type_id, available=by_type[(trip_id, seat_type_id)])
+                    for trip_id, seat_type_id in drifted_types
+                ],
+                unique_fields=['trip', 'seatType'],
+                update_fields=['available'],
+            )
+        return len(drifted)
@@ -0,0 +1,15 @@
+# base.py
+"""Django's MySQL backend with connections from ``core.dbpool``.
+
+Set ``ENGINE`` to ``'core.backends.mysql'`` and ``OPTIONS['pool']`` to pool;
+without ``pool`` it behaves exactly like ``django.db.backends.mysql``.
+"""
+from django.db.backends.mysql import base
+
+from core.dbpool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def ping_connection(self, connection):
+        # A COM_PING round trip, cheaper than a query.
+        connection.ping()
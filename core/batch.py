@@ -0,0 +1,289 @@
+# batch.py
+"""Run many API calls from one ``POST /api/batch/`` request.
+
+Sub-requests are dispatched straight to the views in ``core/urls.py``
+with the batch's already-authenticated user, so JWT validation, throttling
+and the HTTP round trip are paid once. Items run in order; each run of
+consecutive reads is executed together: ``retrieve`` calls on the same
+viewset share one ``pk__in`` query, the rest run on up to
+``BATCH_PARALLEL_WORKERS`` threads. Writes are barriers between runs.
+"""
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.signals import got_request_exception
+from django.db import connection, connections
+from django.http import Http404, HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.response import Response
+from rest_framework.throttling import UserRateThrottle
+from rest_framework.viewsets import ViewSetMixin
+
+from . import sharding
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+RESPONSE_HEADERS = ('ETag', 'Last-Modified', 'Location')
+ITEM_HEADERS = ('If-Match', 'Idempotency-Key')
+
+logger = logging.getLogger(__name__)
+
+
+def item_cost(item):
+    costs = getattr(settings, 'BATCH_COSTS', {})
+    if item['method'] in READ_METHODS:
+        return costs.get('read', 1)
+    return costs.get('write', 5)
+
+
+def batch_cost(items):
+    return sum(item_cost(item) for item in items)
+
+
+class BatchRateThrottle(UserRateThrottle):
+    """Charge a batch against the user quota by cost instead of as one request."""
+
+    def allow_request(self, request, view):
+        self.cost = 1
+        if isinstance(request.data, dict) and isinstance(request.data.get('requests'), list):
+            self.cost = max(sum(
+                item_cost({'method': str(item.get('method', 'GET')).upper()})
+                for item in request.data['requests'] if isinstance(item, dict)
+            ), 1)
+        return super().allow_request(request, view)
+
+    def throttle_success(self):
+        if len(self.history) + self.cost > self.num_requests:
+            return self.throttle_failure()
+        self.history[:0] = [self.now] * self.cost
+        self.cache.set(self.key, self.history, self.duration)
+        return True
+
+
+class SubRequest:
+    def __init__(self, index, item, batch_request, prefix):
+        self.index = index
+        self.item = item
+        self.method = item['method']
+        parts = urlsplit(item['path'])
+        self.path, self.query = parts.path, parts.query
+        self.batch_request = batch_request
+        self.prefix = prefix
+        self.match = None
+        self.error = None
+        self._resolve()
+
+    def _resolve(self):
+        if not self.path.startswith(self.prefix):
+            self.error = (400, f"Path must start with {self.prefix}.")
+            return
+        try:
+            match = resolve('/' + self.path[len(self.prefix):], urlconf='core.urls')
+        except Resolver404:
+            self.error = (404, "Not found.")
+            return
+        view_class = getattr(match.func, 'cls', None)
+        if view_class is None or getattr(view_class, 'batchable', True) is False:
+            self.error = (400, "This endpoint cannot be called from a batch.")
+            return
+        self.match = match
+
+    @property
+    def view_class(self):
+        return self.match.func.cls
+
+    @property
+    def retrieve_key(self):
+        """Group key for reads that can share one queryset, else ``None``."""
+        if self.match is None or self.method != 'GET' or self.query:
+            return None
+        actions = getattr(self.match.func, 'actions', None) or {}
+        view_class = self.view_class
+        lookup = view_class.lookup_url_kwarg or view_class.lookup_field
+        if actions.get('get') != 'retrieve' or set(self.match.kwargs) != {lookup}:
+            return None
+        if view_class.lookup_field not in ('pk', 'id') or not str(self.match.kwargs[lookup]).isdigit():
+            return None
+        return self.match.func
+
+    def http_request(self):
+        outer = self.batch_request._request
+        request = HttpRequest()
+        request.method = self.method
+        request.path = request.path_info = self.path
+        request.META = {
+            key: value for key, value in outer.META.items()
+            if key not in (
+                'CONTENT_TYPE', 'CONTENT_LENGTH', 'QUERY_STRING', 'HTTP_AUTHORIZATION',
+                'HTTP_IF_MATCH', 'HTTP_IDEMPOTENCY_KEY',
+            )
+        }
+        request.META.update({
+            'REQUEST_METHOD': self.method,
+            'PATH_INFO': self.path,
+            'QUERY_STRING': self.query,
+            'HTTP_ACCEPT': 'application/json',
+        })
+        headers = {name.lower(): value for name, value in self.item.get('headers', {}).items()}
+        for name in ITEM_HEADERS:
+            if name.lower() in headers:
+                request.META['HTTP_' + name.upper().replace('-', '_')] = headers[name.lower()]
+        request.GET = QueryDict(self.query)
+        body = b''
+        if 'body' in self.item and self.method not in READ_METHODS:
+            body = json.dumps(self.item['body']).encode()
+            request.META['CONTENT_TYPE'] = 'application/json'
+        request.META['CONTENT_LENGTH'] = str(len(body))
+        request._body = body
+        request._stream = io.BytesIO(body)
+        request._read_started = False
+        request.resolver_match = self.match
+        request.user = self.batch_request.user
+        # Authenticated once by the batch view; DRF skips its authenticators.
+        request._force_auth_user = self.batch_request.user
+        request._force_auth_token = self.batch_request.auth
+        return request
+
+    def view(self):
+        func = self.match.func
+        initkwargs = dict(getattr(func, 'initkwargs', {}), throttle_classes=())
+        if issubclass(self.view_class, ViewSetMixin):
+            return self.view_class.as_view(func.actions, **initkwargs)
+        return self.view_class.as_view(**initkwargs)
+
+    def result(self, response):
+        headers = {name: response[name] for name in RESPONSE_HEADERS if response.has_header(name)}
+        body = getattr(response, 'data', None)
+        if body is None and not hasattr(response, 'data') and response.content:
+            body = response.content.decode(errors='replace')
+        return {
+            'id': self.item.get('id', self.index),
+            'status': response.status_code,
+            'headers': headers,
+            'body': body,
+        }
+
+    def error_result(self, status, detail):
+        return {'id': self.item.get('id', self.index), 'status': status, 'headers': {}, 'body': {'detail': detail}}
+
+    def execute(self):
+        if self.error is not None:
+            return self.error_result(*self.error)
+        request = None
+        try:
+            request = self.http_request()
+            return self.result(self.view()(request, *self.match.args, **self.match.kwargs))
+        except Http404:
+            return self.error_result(404, "Not found.")
+        except Exception:
+            # Report it the way Django reports an unhandled view error.
+            logger.exception("Batch item %s %s failed", self.method, self.item['path'])
+            got_request_exception.send(sender=self.__class__, request=request or self.batch_request._request)
+            return self.error_result(500, "Internal server error.")
+
+
+def _retrieve_group(items):
+    """Answer several ``retrieve`` calls on one viewset from a single query."""
+    first = items[0]
+    func = first.match.func
+    view = first.view_class(**dict(getattr(func, 'initkwargs', {}), throttle_classes=()))
+    view.action_map = func.actions
+    view.args, view.kwargs = (), {}
+    view.format_kwarg = None
+    view.headers = view.default_response_headers
+    request = view.initialize_request(first.http_request())
+    view.request = request
+    lookup = view.lookup_url_kwarg or view.lookup_field
+    try:
+        try:
+            view.initial(request)
+            queryset = view.filter_queryset(view.get_queryset())
+            ids = {int(item.match.kwargs[lookup]) for item in items}
+            objects = sharding.in_bulk(queryset, ids)
+        except Exception as exc:
+            response = view.finalize_response(request, view.handle_exception(exc))
+            return [item.result(response) for item in items]
+
+        results = []
+        for item in items:
+            obj = objects.get(int(item.match.kwargs[lookup]))
+            try:
+                if obj is None:
+                    raise Http404
+                view.check_object_permissions(request, obj)
+                response = Response(view.get_serializer(obj).data)
+            except Exception as exc:
+                response = view.handle_exception(exc)
+            results.append(item.result(view.finalize_response(request, response)))
+        return results
+    except Exception:
+        # Anything DRF would turn into a 500: retry one by one so only the
+        # failing items report it.
+        logger.exception(
+            "Grouped retrieve of %d %s items failed; retrying them one by one",
+            len(items), first.view_class.__name__,
+        )
+        return [item.execute() for item in items]
+
+
+def _run_chunk(jobs):
+    try:
+        return [job() for job in jobs]
+    finally:
+        connections.close_all()
+
+
+def _execute_reads(items):
+    groups, singles = {}, []
+    for item in items:
+        key = item.retrieve_key
+        if key is not None:
+            groups.setdefault(key, []).append(item)
+        else:
+            singles.append(item)
+
+    jobs = []
+    for group in groups.values():
+        if len(group) == 1:
+            singles.extend(group)
+        else:
+            jobs.append((group, lambda group=group: _retrieve_group(group)))
+    jobs += [([item], lambda item=item: [item.execute()]) for item in singles]
+
+    workers = min(getattr(settings, 'BATCH_PARALLEL_WORKERS', 4), len(jobs))
+    # Other connections can't see this transaction's uncommitted rows.
+    if workers <= 1 or connection.in_atomic_block:
+        outputs = [job() for _, job in jobs]
+    else:
+        chunks = [jobs[offset::workers] for offset in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            chunk_outputs = list(pool.map(lambda chunk: _run_chunk([job for _, job in chunk]), chunks))
+        outputs = [None] * len(jobs)
+        for offset, chunk_output in enumerate(chunk_outputs):
+            outputs[offset::workers] = chunk_output
+
+    results = {}
+    for (job_items, _), output in zip(jobs, outputs):
+        for item, result in zip(job_items, output):
+            results[item.index] = result
+    return [results[item.index] for item in items]
+
+
+def execute(batch_request, items, prefix):
+    """Run ``items`` (validated dicts) and return their results in order."""
+    subrequests = [SubRequest(index, item, batch_request, prefix) for index, item in enumerate(items)]
+    results, reads = [], []
+    for subrequest in subrequests:
+        if subrequest.method in READ_METHODS:
+            reads.append(subrequest)
+            continue
+        if reads:
+            results += _execute_reads(reads)
+            reads = []
+        results.append(subrequest.execute())
+    if reads:
+        results += _execute_reads(reads)
+    return results
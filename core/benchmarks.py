@@ -0,0 +1,104 @@
+# benchmarks.py
+"""Shared helpers for the ``benchmark*`` management commands."""
+import json
+import math
+import platform
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.views import APIView
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def measure(func, iterations=50, warmup=5):
+    """Call ``func`` repeatedly and return latency, query and throughput stats.
+
+    ``func`` may return an HTTP response; its status code is reported.
+    """
+    for _ in range(warmup):
+        func()
+    timings = []
+    queries = 0
+    status = None
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            t0 = time.perf_counter()
+            result = func()
+            timings.append((time.perf_counter() - t0) * 1000)
+        queries += len(captured.captured_queries)
+        status = getattr(result, 'status_code', status)
+    elapsed = time.perf_counter() - started
+    timings.sort()
+    return {
+        'status': status,
+        'iterations': iterations,
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'queries': round(queries / iterations, 2),
+        'throughput_rps': round(iterations / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+@contextmanager
+def throttling_disabled():
+    """The benchmark would otherwise hit the per-user daily rate limit."""
+    original = APIView.throttle_classes
+    APIView.throttle_classes = ()
+    try:
+        yield
+    finally:
+        APIView.throttle_classes = original
+
+
+def report(results, extra_meta=None):
+    meta = {
+        'timestamp': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'database': connection.vendor,
+    }
+    meta.update(extra_meta or {})
+    return {'meta': meta, 'results': results}
+
+
+def write_json(path, data):
+    with open(path, 'w') as fh:
+        json.dump(data, fh, indent=2)
+
+
+def load_json(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def format_table(results, baseline=None):
+    """Render results as text, with p50/p95 deltas against ``baseline``."""
+    previous = {row['name']: row for row in (baseline or {}).get('results', [])}
+    header = f"{'scenario':<40} {'status':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'req/s':>9}"
+    lines = [header, '-' * len(header)]
+    for row in results:
+        line = (
+            f"{row['name']:<40} {row['status'] or '-':>6} {row['p50_ms']:>9.2f} "
+            f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['queries']:>8} "
+            f"{row['throughput_rps']:>9.1f}"
+        )
+        old = previous.get(row['name'])
+        if old and old['p50_ms'] and old['p95_ms']:
+            line += (
+                f"  p50 {100 * (row['p50_ms'] - old['p50_ms']) / old['p50_ms']:+.1f}%"
+                f"  p95 {100 * (row['p95_ms'] - old['p95_ms']) / old['p95_ms']:+.1f}%"
+            )
+        lines.append(line)
+    return '\n'.join(lines)
@@ -0,0 +1,21 @@
+# bulk.py
+"""Set-based writes that have to run on MySQL as well as SQLite/PostgreSQL."""
+from django.db import connections, router
+
+
+def upsert(model, objs, unique_fields, update_fields, using=None, batch_size=1000):
+    """``bulk_create`` that updates ``update_fields`` when a row already exists.
+
+    MySQL's ``ON DUPLICATE KEY UPDATE`` takes no conflict target, so
+    ``unique_fields`` is only passed to backends that accept one.
+    """
+    using = using or router.db_for_write(model)
+    if not connections[using].features.supports_update_conflicts_with_target:
+        unique_fields = None
+    return model.objects.using(using).bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=update_fields,
+        batch_size=batch_size,
+    )
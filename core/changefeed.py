@@ -0,0 +1,260 @@
+# changefeed.py
+"""Change log of catalog rows and the delta-sync feed read from it.
+
+Entries are numbered by the ``ChangeLog`` primary key, but ids are handed
+out when a row is inserted, not when its transaction commits, so a reader
+can see entry 12 while entry 11 is still uncommitted. A read position
+therefore keeps, next to the highest id read, the ids it skipped over
+(``gaps``) and looks for them again on later reads. A gap is given up
+once an entry above it is ``CHANGE_FEED_GAP_SECONDS`` old: by then the
+transaction that took the id has rolled back, or the entry was compacted
+away. The same position drives the public cursor and ``core.journeys``.
+"""
+import base64
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from . import sharding
+from .models import ChangeLog, Route, SeatType, Trip, TripSeat
+
+
+# Feed name -> (model, serializer name, select_related chain)
+TRACKED_MODELS = {
+    'route': (Route, 'RouteSerializer', ('company',)),
+    'trip': (Trip, 'TripSerializer', (
+        'route', 'route__company', 'seat', 'seat__seatType',
+        'seat__seatType__ship', 'seat__seatType__ship__company',
+    )),
+    'tripseat': (TripSeat, 'TripSeatSerializer', (
+        'trip', 'trip__route', 'trip__route__company', 'trip__seat',
+        'trip__seat__seatType', 'trip__seat__seatType__ship',
+        'trip__seat__seatType__ship__company', 'seat', 'seat__seatType',
+        'seat__seatType__ship', 'seat__seatType__ship__company',
+    )),
+    'seattype': (SeatType, 'SeatTypeSerializer', ('ship', 'ship__company')),
+}
+
+MODEL_NAMES = {model: name for name, (model, _, _) in TRACKED_MODELS.items()}
+
+
+# ``seq``: highest id read. ``gaps``: ``(id, seen_at)`` pairs below ``seq``
+# that were missing when read. ``synced_at``: creation time of the entry at
+# ``seq``, or when the reader last caught up; the entries still to be read
+# are younger than that.
+Position = namedtuple('Position', ['seq', 'gaps', 'synced_at'])
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class ExpiredCursor(Exception):
+    pass
+
+
+def retention():
+    return timedelta(days=getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 7))
+
+
+def record_change(instance, action):
+    """Log a change of ``instance``.
+
+    The log lives in the directory database. With ``core.sharding`` on, the
+    entry for a shard row is written outside the shard's transaction, so a
+    write that rolls back can leave an entry behind; readers then fetch the
+    unchanged row (or a tombstone if it never existed), which is harmless.
+    """
+    name = MODEL_NAMES.get(type(instance))
+    if name is not None:
+        ChangeLog.objects.create(model=name, object_id=instance.pk, action=action)
+
+
+def record_changes(model, ids, action):
+    """Log many changes at once, for code paths that bypass model signals
+    (``bulk_create``, ``QuerySet.update`` ...)."""
+    name = MODEL_NAMES[model]
+    ChangeLog.objects.bulk_create(
+        [ChangeLog(model=name, object_id=pk, action=action) for pk in ids],
+        batch_size=1000,
+    )
+
+
+def gap_window():
+    return timedelta(seconds=getattr(settings, 'CHANGE_FEED_GAP_SECONDS', 60))
+
+
+def head_position():
+    last = ChangeLog.objects.order_by('-id').values_list('id', flat=True).first()
+    return Position(last or 0, (), timezone.now())
+
+
+def _timestamp(moment):
+    return int(moment.timestamp())
+
+
+def _datetime(timestamp):
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def encode_cursor(position):
+    data = {'s': position.seq, 't': _timestamp(position.synced_at)}
+    if position.gaps:
+        data['g'] = [[pk, _timestamp(seen_at)] for pk, seen_at in position.gaps]
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = Position(
+            int(data['s']),
+            tuple((int(pk), _datetime(int(seen_at))) for pk, seen_at in data.get('g', ())),
+            _datetime(int(data['t'])),
+        )
+    except (ValueError, TypeError, KeyError, AttributeError):
+        raise InvalidCursor(cursor)
+    # Entries older than the retention window may have been compacted away,
+    # so a client whose next entries are that old has to resync from the
+    # listings.
+    if position.synced_at < timezone.now() - retention():
+        raise ExpiredCursor(cursor)
+    return position
+
+
+def head_cursor():
+    return encode_cursor(head_position())
+
+
+def read_entries(position, limit=None):
+    """Return ``(entries, position, has_more)`` for the entries after ``position``.
+
+    Entries that were missing at earlier reads and have committed since
+    come first. A page stops early rather than track more than
+    ``CHANGE_FEED_MAX_GAPS`` gaps; the next read picks up from there.
+    """
+    now = timezone.now()
+    horizon = now - gap_window()
+    max_gaps = getattr(settings, 'CHANGE_FEED_MAX_GAPS', 100)
+    gaps = {pk: seen_at for pk, seen_at in position.gaps if seen_at >= horizon}
+    queryset = ChangeLog.objects.filter(Q(id__gt=position.seq) | Q(id__in=list(gaps))).order_by('id')
+    rows = list(queryset if limit is None else queryset[:limit + 1])
+    has_more = limit is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+
+    entries, seq, synced_at = [], position.seq, position.synced_at
+    for entry in rows:
+        if entry.id <= position.seq:
+            gaps.pop(entry.id, None)
+            entries.append(entry)
+            continue
+        if entry.created_at >= horizon:
+            missing = range(seq + 1, entry.id)
+            if len(gaps) + len(missing) > max_gaps:
+                has_more = True
+                break
+            gaps.update(dict.fromkeys(missing, entry.created_at))
+        entries.append(entry)
+        seq, synced_at = entry.id, entry.created_at
+    if not has_more:
+        synced_at = now
+    return entries, Position(seq, tuple(sorted(gaps.items())), synced_at), has_more
+
+
+def _serialize(name, ids, context):
+    from . import serializers
+
+    model, serializer_name, related = TRACKED_MODELS[name]
+    # Each id is read from the shard it names; a row missing there is deleted.
+    objects = sharding.in_bulk(model.objects.select_related(*related), ids)
+    serializer_class = getattr(serializers, serializer_name)
+    return {
+        pk: serializer_class(obj, context=context).data
+        for pk, obj in objects.items()
+    }
+
+
+def read_changes(position, limit, context=None):
+    """Return ``(changes, position, has_more)`` for entries after ``position``.
+
+    Several entries for the same object inside one page collapse into the
+    latest one, and objects are fetched with one query per model, so the
+    cost is bounded by the page size rather than the catalog size.
+    """
+    entries, position, has_more = read_entries(position, limit)
+    if not entries:
+        return [], position, has_more
+
+    latest = {}
+    for entry in entries:
+        latest.pop((entry.model, entry.object_id), None)
+        latest[(entry.model, entry.object_id)] = entry
+
+    wanted = {}
+    for (name, object_id), entry in latest.items():
+        if entry.action != 'deleted' and name in TRACKED_MODELS:
+            wanted.setdefault(name, []).append(object_id)
+    payloads = {name: _serialize(name, ids, context) for name, ids in wanted.items()}
+
+    changes = []
+    for (name, object_id), entry in latest.items():
+        data = payloads.get(name, {}).get(object_id)
+        action = entry.action
+        if action != 'deleted' and data is None:
+            # Removed after this entry was written; its tombstone follows.
+            action = 'deleted'
+        changes.append({
+            'seq': entry.id,
+            'model': name,
+            'id': object_id,
+            'action': action,
+            'data': data,
+        })
+    return changes, position, has_more
+
+
+def compact(batch_size=1000):
+    """Bound the change log size.
+
+    Drops every entry older than the retention window (cursors that old are
+    rejected anyway) and, inside the window, entries superseded by a newer
+    entry for the same object. Returns ``(expired, superseded)`` counts.
+    """
+    expired = 0
+    cutoff = timezone.now() - retention()
+    while True:
+        ids = list(
+            ChangeLog.objects.filter(created_at__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        expired += ChangeLog.objects.filter(id__in=ids).delete()[0]
+
+    superseded = 0
+    newer = ChangeLog.objects.filter(
+        model=OuterRef('model'), object_id=OuterRef('object_id'), id__gt=OuterRef('id'),
+    )
+    last_id = 0
+    while True:
+        window = list(
+            ChangeLog.objects.filter(id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not window:
+            break
+        ids = list(
+            ChangeLog.objects.filter(id__in=window)
+            .filter(Exists(newer)).values_list('id', flat=True)
+        )
+        if ids:
+            superseded += ChangeLog.objects.filter(id__in=ids).delete()[0]
+        last_id = window[-1]
+    return expired, superseded
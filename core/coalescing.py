@@ -0,0 +1,134 @@
+# coalescing.py
+"""Single-flight coalescing for expensive, user-independent read endpoints.
+
+Concurrent requests with the same normalized key wait for one in-flight
+computation and share its result; with ``COALESCE_TTL_SECONDS`` the result is
+also reused for that long afterwards, which covers bursts on single-threaded
+workers. State is per process, so each worker still runs its own query, and
+``clear()`` (called by the catalog save and delete signals) only drops the
+results cached by the process that made the change: other workers can serve
+a stale listing for up to ``COALESCE_TTL_SECONDS`` after a write.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, ttl=0.0, wait_timeout=10.0, max_entries=1024):
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._results = OrderedDict()
+        self.stats = {'leaders': 0, 'followers': 0, 'hits': 0}
+
+    def do(self, key, func):
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] > time.monotonic():
+                self.stats['hits'] += 1
+                return cached[1]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats['leaders'] += 1
+            else:
+                self.stats['followers'] += 1
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            # The leader is stuck; don't pile up behind it.
+            return func()
+
+        try:
+            call.result = func()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self.ttl > 0:
+                    self._remember(key, call.result)
+            call.done.set()
+        return call.result
+
+    def _remember(self, key, result):
+        now = time.monotonic()
+        self._results[key] = (now + self.ttl, result)
+        self._results.move_to_end(key)
+        while self._results:
+            oldest_key, (expires, _) = next(iter(self._results.items()))
+            if expires > now and len(self._results) <= self.max_entries:
+                break
+            del self._results[oldest_key]
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+
+
+_coalescer = None
+_coalescer_lock = threading.Lock()
+
+
+def get_coalescer():
+    global _coalescer
+    if _coalescer is None:
+        with _coalescer_lock:
+            if _coalescer is None:
+                _coalescer = SingleFlight(
+                    ttl=getattr(settings, 'COALESCE_TTL_SECONDS', 0.0),
+                    wait_timeout=getattr(settings, 'COALESCE_WAIT_SECONDS', 10.0),
+                )
+    return _coalescer
+
+
+def request_key(request, namespace):
+    """Key on the endpoint, the URL prefix the client used (scheme, host, script
+    prefix) and the query params with order and blanks normalized.
+
+    The shared response carries absolute ``next``/``previous`` links built
+    from the leader's request, so only requests that would build the same
+    links may share it.
+    """
+    params = tuple(sorted(
+        (name, tuple(sorted(value.strip() for value in values if value.strip())))
+        for name, values in request.query_params.lists()
+        if any(value.strip() for value in values)
+    ))
+    return (namespace, request.scheme, request.get_host(), request.META.get('SCRIPT_NAME', ''), params)
+
+
+class CoalescedListMixin:
+    """Share ``list()`` results between identical concurrent requests.
+
+    Only for viewsets whose listing does not depend on the requesting user.
+    """
+
+    def should_coalesce(self, request):
+        return getattr(settings, 'COALESCE_ENABLED', True)
+
+    def list(self, request, *args, **kwargs):
+        if not self.should_coalesce(request):
+            return super().list(request, *args, **kwargs)
+        response = get_coalescer().do(
+            request_key(request, self.basename),
+            lambda: super(CoalescedListMixin, self).list(request, *args, **kwargs),
+        )
+        return response.__class__(response.data, status=response.status_code)
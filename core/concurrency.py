@@ -0,0 +1,58 @@
+# concurrency.py
+"""Optimistic concurrency for ``VersionedModel`` viewsets.
+
+Single-object responses carry the row version as ``ETag: "<version>"``. A
+PUT/PATCH sent with ``If-Match: "<version>"`` only writes if the row is still
+at that version (a conditional ``UPDATE``, no lock held while the request is
+handled) and answers ``409 Conflict`` with the current version otherwise.
+Without ``If-Match`` (or with ``If-Match: *``) updates stay last-write-wins.
+"""
+import re
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import VersionConflict
+
+IF_MATCH_RE = re.compile(r'\s*(?:W/)?"(\d+)"\s*')
+ETAG_ACTIONS = ('retrieve', 'create', 'update', 'partial_update')
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def expected_version(request):
+    """The version required by the request's ``If-Match`` header, or ``None``."""
+    header = request.headers.get('If-Match')
+    if header is None or header.strip() == '*':
+        return None
+    match = IF_MATCH_RE.fullmatch(header)
+    if match is None:
+        raise ValidationError({'If-Match': ['Expected a single version ETag, e.g. "3".']})
+    return int(match.group(1))
+
+
+class VersionedUpdateMixin:
+    """ETags on single-object responses and ``If-Match`` checked updates."""
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except VersionConflict as exc:
+            return Response(
+                {'detail': "The resource was modified by another request.", 'version': exc.current},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+    def perform_update(self, serializer):
+        serializer.instance.expected_version = expected_version(self.request)
+        super().perform_update(serializer)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        data = getattr(response, 'data', None)
+        if self.action in ETAG_ACTIONS and response.status_code < 300 and isinstance(data, dict) and 'version' in data:
+            response['ETag'] = etag(data['version'])
+        return response
@@ -0,0 +1,300 @@
+# dbpool.py
+"""Per-process database connection pool for backends without a built-in one.
+
+Enabled with ``OPTIONS['pool']`` on a database that uses a pooled backend
+(``core.backends.mysql``), the same switch Django's PostgreSQL backend uses::
+
+    'OPTIONS': {'pool': {'max_size': 10, 'timeout': 10, 'max_lifetime': 1800}}
+
+``CONN_MAX_AGE`` must be ``0``: Django then "closes" the connection at the end
+of every request, which hands it back to the pool instead of tearing down the
+TCP and auth session. Options:
+
+``max_size``
+    Open connections per process and database; further checkouts wait.
+``timeout``
+    Seconds a checkout waits for a free connection before failing with
+    ``OperationalError``.
+``max_lifetime``
+    Seconds after which a returned connection is closed instead of reused
+    (keep it below the server's ``wait_timeout``).
+``ping_after``
+    With ``CONN_HEALTH_CHECKS``, connections idle for longer than this many
+    seconds are pinged on checkout and replaced if the ping fails.
+
+A connection returned inside a transaction or outside autocommit is closed,
+never reused. ``stats()`` reports the counters of every pool in the process.
+"""
+import os
+import threading
+import time
+import weakref
+from collections import Counter, deque
+
+from django.core.exceptions import ImproperlyConfigured
+
+DEFAULTS = {'max_size': 10, 'timeout': 10.0, 'max_lifetime': 1800.0, 'ping_after': 0.0}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Entry:
+    __slots__ = ('connection', 'created', 'returned')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = self.returned = time.monotonic()
+
+
+class ConnectionPool:
+    """A bounded LIFO pool of raw DB-API connections for one database alias."""
+
+    def __init__(self, alias, max_size, timeout, max_lifetime, ping_after):
+        self.alias = alias
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.ping_after = ping_after
+        self.pid = os.getpid()
+        self.counters = Counter()
+        self._idle = deque()
+        self._size = 0
+        self._available = threading.Condition()
+
+    def _forget_if_forked(self):
+        if self.pid != os.getpid():
+            # The parent's sockets are shared with it; closing them here
+            # would end its sessions, so they are only dropped.
+            self.pid = os.getpid()
+            self._idle.clear()
+            self._size = 0
+            self.counters.clear()
+
+    def checkout(self, connect, ping=None):
+        """An idle connection, or a new one from ``connect()`` if there is room.
+
+        ``ping(connection)`` raises if the connection is dead; it's only called
+        for connections idle for longer than ``ping_after``.
+        """
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        with self._available:
+            self._forget_if_forked()
+            self.counters['checkouts'] += 1
+            while True:
+                entry = self._take_idle()
+                if entry is not None or self._size < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.counters['timeouts'] += 1
+                    raise PoolTimeout(
+                        f"No connection to '{self.alias}' was free within {self.timeout}s "
+                        f"(pool size {self.max_size})."
+                    )
+                waited = True
+                self._available.wait(remaining)
+            if waited:
+                self.counters['waits'] += 1
+                self.counters['wait_ms'] += round((time.monotonic() - started) * 1000)
+            if entry is None:
+                self._size += 1
+
+        if entry is not None and ping is not None and time.monotonic() - entry.returned > self.ping_after:
+            try:
+                ping(entry.connection)
+            except Exception:
+                self._close(entry.connection)
+                self._count('reconnects')
+                entry = None
+        if entry is None:
+            try:
+                entry = _Entry(connect())
+            except BaseException:
+                self._release_slot()
+                raise
+            self._count('connects')
+            return entry, False
+        return entry, True
+
+    def _take_idle(self):
+        # Called with the lock held. Most recently returned first: those are
+        # the least likely to have been cut by the server.
+        now = time.monotonic()
+        while self._idle:
+            entry = self._idle.pop()
+            if now - entry.created < self.max_lifetime:
+                return entry
+            self._size -= 1
+            self.counters['recycled'] += 1
+            self._close(entry.connection)
+        return None
+
+    def checkin(self, entry, reusable=True):
+        if entry.connection is None:
+            return
+        if not reusable or time.monotonic() - entry.created >= self.max_lifetime:
+            self.discard(entry, 'discarded' if not reusable else 'recycled')
+            return
+        entry.returned = time.monotonic()
+        with self._available:
+            if self.pid != os.getpid():
+                return
+            self._idle.append(entry)
+            self._available.notify()
+
+    def discard(self, entry, reason='discarded'):
+        connection, entry.connection = entry.connection, None
+        if connection is None:
+            return
+        if self.pid == os.getpid():
+            self._close(connection)
+            self._count(reason)
+            self._release_slot()
+
+    def _release_slot(self):
+        with self._available:
+            if self.pid == os.getpid():
+                self._size -= 1
+                self._available.notify()
+
+    def _count(self, name):
+        with self._available:
+            self.counters[name] += 1
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close the idle connections."""
+        with self._available:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._close(entry.connection)
+
+    def stats(self):
+        with self._available:
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                **{name: self.counters[name] for name in (
+                    'checkouts', 'waits', 'wait_ms', 'timeouts', 'connects', 'reconnects', 'recycled', 'discarded',
+                )},
+            }
+
+
+def get_pool(alias, options):
+    pool = _pools.get(alias)
+    if pool is None:
+        if options is True:
+            options = {}
+        unknown = set(options) - set(DEFAULTS)
+        if unknown:
+            raise ImproperlyConfigured(f"Unknown pool options for '{alias}': {', '.join(sorted(unknown))}.")
+        with _pools_lock:
+            pool = _pools.setdefault(alias, ConnectionPool(alias, **{**DEFAULTS, **options}))
+    return pool
+
+
+def stats():
+    """``{alias: counters}`` for the pools of this process."""
+    return {alias: pool.stats() for alias, pool in _pools.items()}
+
+
+def close_pool(alias):
+    pool = _pools.pop(alias, None)
+    if pool is not None:
+        pool.close()
+
+
+class PooledDatabaseWrapperMixin:
+    """Take ``DatabaseWrapper`` connections from a ``ConnectionPool``.
+
+    Backends mix it in front of Django's wrapper and may override
+    ``ping_connection``.
+    """
+    _pool_entry = None
+    _pool_reused = False
+    _pool_finalizer = None
+
+    @property
+    def pool(self):
+        options = self.settings_dict['OPTIONS'].get('pool')
+        if not options:
+            return None
+        if self.settings_dict.get('CONN_MAX_AGE', 0) != 0:
+            raise ImproperlyConfigured("Pooling doesn't support persistent connections (set CONN_MAX_AGE to 0).")
+        return get_pool(self.alias, options)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    def ping_connection(self, connection):
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        try:
+            entry, self._pool_reused = pool.checkout(
+                lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params),
+                self.ping_connection if self.settings_dict['CONN_HEALTH_CHECKS'] else None,
+            )
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+        self._pool_entry = entry
+        # A wrapper dropped with its thread or async context, never closed,
+        # must not keep the connection's slot.
+        self._pool_finalizer = weakref.finalize(self, pool.discard, entry)
+        return entry.connection
+
+    def _set_autocommit(self, autocommit):
+        # Connections are only returned to the pool in autocommit mode.
+        if not (self._pool_entry is not None and self._pool_reused and autocommit):
+            super()._set_autocommit(autocommit)
+
+    def init_connection_state(self):
+        # The session settings survive in a reused connection.
+        if not (self._pool_entry is not None and self._pool_reused):
+            super().init_connection_state()
+        self._pool_reused = False
+
+    def _close(self):
+        entry = self._pool_entry
+        if entry is None:
+            return super()._close()
+        self._pool_entry = None
+        self._pool_finalizer.detach()
+        self.pool.checkin(entry, reusable=self._pool_reusable())
+
+    def _pool_reusable(self):
+        if self.in_atomic_block or not self.autocommit:
+            return False
+        # As in close_if_unusable_or_obsolete(): after a database error the
+        # connection goes back only if it still answers.
+        if self.errors_occurred:
+            try:
+                return self.is_usable()
+            except Exception:
+                return False
+        return True
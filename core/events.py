@@ -0,0 +1,283 @@
+# events.py
+"""Broadcast hub for the live event stream (``/api/events/``).
+
+Publishers (model signals, the notification fan-out) run in sync code on any
+thread; subscribers are SSE connections, each an idle coroutine waiting on its
+own queue. The hub hands published events to a backend, which delivers them
+back through ``Hub.dispatch``. Select one with ``settings.EVENTS_BACKEND``:
+
+``LocalBackend``
+    Delivers immediately, to subscribers of the publishing process only.
+    Enough for a single ASGI process that also runs the publishers.
+``DatabaseBackend``
+    Relays events through the ``Event`` table, so events published by any
+    web worker or by ``runjobs`` reach the subscribers of every ASGI worker.
+"""
+import asyncio
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+
+RESET = object()
+
+
+class Subscription:
+    def __init__(self, hub, channels, max_queue):
+        self.hub = hub
+        self.channels = tuple(channels)
+        self.max_queue = max_queue
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        self.overflowed = False
+
+    def _put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.qsize() >= self.max_queue:
+            # A consumer this far behind is better off refetching state.
+            self.overflowed = True
+            event = RESET
+        self.queue.put_nowait(event)
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The subscriber's loop is gone; it will be unsubscribed on close.
+            pass
+
+    async def connected(self, timeout):
+        """Wait until the backend delivers every event published from now on."""
+        ready = self.hub.backend.ready
+        if not ready.is_set():
+            await self.loop.run_in_executor(None, ready.wait, timeout)
+
+    async def get(self, timeout):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class LocalBackend:
+    """Delivers events to subscribers of this process only."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.ready = threading.Event()
+        self.ready.set()
+
+    def start(self):
+        pass
+
+    def publish(self, channel, event):
+        self.hub.dispatch(channel, event)
+
+
+class DatabaseBackend:
+    """Relays events between processes through the ``Event`` table.
+
+    While a process has subscribers, a background thread keeps an
+    ``EventListener`` row fresh and polls for new ``Event`` rows every
+    ``EVENTS_POLL_SECONDS``. ``publish`` inserts a row only if some listener
+    was seen in the last ``EVENTS_LISTENER_SECONDS``; with nobody listening it
+    writes nothing. Publishers re-check at most once per poll interval, so a
+    new listener waits one interval before taking its position: from then on
+    every publisher sees it, and no event published after a subscriber is
+    connected is lost. Ids can become visible out of order, so each poll
+    re-reads the last ``EVENTS_POLL_OVERLAP`` ids and skips the ones already
+    dispatched. Old rows are deleted by the ``events`` retention policy
+    (``prune_data``).
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.interval = getattr(settings, 'EVENTS_POLL_SECONDS', 0.5)
+        self.overlap = getattr(settings, 'EVENTS_POLL_OVERLAP', 1000)
+        self.listener_ttl = getattr(settings, 'EVENTS_LISTENER_SECONDS', 30)
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.last_id = None
+        self.ready = threading.Event()
+        self._seen = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._listening = (None, False)
+        self._beat_at = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self.ready.clear()
+                self._thread = threading.Thread(target=self._run, name='events-poller', daemon=True)
+                self._thread.start()
+
+    def listening(self):
+        """Whether any process relays events; cached for one poll interval."""
+        from .models import EventListener
+
+        checked_at, listening = self._listening
+        now = time.monotonic()
+        if checked_at is None or now - checked_at >= self.interval:
+            since = timezone.now() - timedelta(seconds=self.listener_ttl)
+            listening = EventListener.objects.filter(seen_at__gte=since).exists()
+            self._listening = (now, listening)
+        return listening
+
+    def publish(self, channel, event):
+        from .models import Event
+
+        if self.listening():
+            Event.objects.create(channel=channel, payload=event)
+
+    def heartbeat(self):
+        """Record this process as a listener, at most every third of the TTL."""
+        from .models import EventListener
+
+        now = time.monotonic()
+        if self._beat_at is None or now - self._beat_at >= self.listener_ttl / 3:
+            EventListener.objects.update_or_create(name=self.name, defaults={'seen_at': timezone.now()})
+            self._beat_at = now
+
+    def take_position(self):
+        from .models import Event
+
+        self.last_id = Event.objects.aggregate(last=Max('id'))['last'] or 0
+        self._seen = set(Event.objects.filter(id__gt=self.last_id - self.overlap).values_list('id', flat=True))
+
+    def poll(self):
+        """Dispatch the events published since the position was taken."""
+        from .models import Event
+
+        if self.last_id is None:
+            self.take_position()
+            return 0
+        rows = list(
+            Event.objects.filter(id__gt=self.last_id - self.overlap)
+            .order_by('id').values_list('id', 'channel', 'payload')
+        )
+        dispatched = 0
+        for event_id, channel, payload in rows:
+            if event_id not in self._seen:
+                self._seen.add(event_id)
+                self.hub.dispatch(channel, payload)
+                dispatched += 1
+        if rows:
+            self.last_id = max(self.last_id, rows[-1][0])
+        self._seen = {event_id for event_id in self._seen if event_id > self.last_id - self.overlap}
+        return dispatched
+
+    def stop(self):
+        from .models import EventListener
+
+        EventListener.objects.filter(name=self.name).delete()
+        self._beat_at = None
+
+    def _run(self):
+        try:
+            self.heartbeat()
+            # Let publishers' cached "nobody listens" answers expire first.
+            time.sleep(self.interval)
+            self.take_position()
+        except Exception:
+            pass
+        finally:
+            self.ready.set()
+            connections.close_all()
+        while True:
+            with self._lock:
+                if not self.hub.subscriber_count():
+                    # Stop; events published while nobody listens are not replayed.
+                    self._thread = self.last_id = None
+                    try:
+                        self.stop()
+                    except Exception:
+                        pass
+                    finally:
+                        connections.close_all()
+                    return
+            try:
+                self.heartbeat()
+                self.poll()
+            except Exception:
+                # A database hiccup must not end the stream for everyone.
+                pass
+            finally:
+                connections.close_all()
+            time.sleep(self.interval)
+
+
+class Hub:
+    def __init__(self, backend_class=LocalBackend, max_queue=100):
+        self.max_queue = max_queue
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.backend = backend_class(self)
+
+    def subscribe(self, channels):
+        subscription = Subscription(self, channels, self.max_queue)
+        with self._lock:
+            for channel in subscription.channels:
+                self._subscribers.setdefault(channel, set()).add(subscription)
+        self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for channel in subscription.channels:
+                subscribers = self._subscribers.get(channel)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[channel]
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subs in self._subscribers.values() for s in subs})
+
+    def dispatch(self, channel, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def publish(self, channel, event):
+        self.backend.publish(channel, event)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = Hub(
+                    backend_class=import_string(
+                        getattr(settings, 'EVENTS_BACKEND', 'core.events.LocalBackend')
+                    ),
+                    max_queue=getattr(settings, 'EVENTS_MAX_QUEUE', 100),
+                )
+    return _hub
+
+
+def trip_channel(trip_id):
+    return f'trip:{trip_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+def publish_on_commit(channel, event, using=None):
+    transaction.on_commit(lambda: get_hub().publish(channel, event), using=using)
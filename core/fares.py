@@ -0,0 +1,172 @@
+# fares.py
+"""Precomputed fare calendar: (route, day) -> cheapest available fare and seats.
+
+A fare is ``Trip.basePrice + SeatType.aditionalPrice`` of an available trip
+seat. Whenever a trip, one of its seats or a seat type changes, the cells it
+touches are recomputed individually by a background job queued after commit,
+so writes never wait for the aggregates and reading a month is a single
+indexed range scan on ``FareCalendarDay``.
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import sharding
+from .bulk import upsert
+from .jobs import enqueue, task
+from .models import FareCalendarDay, Trip, TripSeat
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time()))
+    return start, start + timedelta(days=1)
+
+
+def departure_day(value):
+    return timezone.localdate(value)
+
+
+def compute(cells):
+    """Return ``{(route_id, day): (min_price, available_seats, trips)}``."""
+    results = {}
+    for route_id, day in cells:
+        start, end = _day_bounds(day)
+        trips = Trip.objects.filter(route_id=route_id, dateDeparture__gte=start, dateDeparture__lt=end)
+        stats = TripSeat.objects.filter(trip__in=trips).aggregate(
+            seats=Count('id', filter=Q(state='disponible')),
+            price=Min(
+                F('trip__basePrice') + F('seat__seatType__aditionalPrice'),
+                filter=Q(state='disponible'),
+            ),
+        )
+        results[(route_id, day)] = (stats['price'], stats['seats'], trips.count())
+    return results
+
+
+def store(results):
+    empty = [cell for cell, (_, _, trips) in results.items() if not trips]
+    for route_id, day in empty:
+        FareCalendarDay.objects.filter(route_id=route_id, day=day).delete()
+    upsert(
+        FareCalendarDay,
+        [
+            FareCalendarDay(
+                route_id=route_id, day=day, min_price=price, available_seats=seats, trips=trips,
+            )
+            for (route_id, day), (price, seats, trips) in results.items() if trips
+        ],
+        unique_fields=['route', 'day'],
+        update_fields=['min_price', 'available_seats', 'trips', 'updated_at'],
+    )
+
+
+def refresh(cells=(), trip_ids=()):
+    cells = set(cells)
+    if trip_ids:
+        for route_id, departure in Trip.objects.filter(id__in=trip_ids).values_list('route_id', 'dateDeparture'):
+            cells.add((route_id, departure_day(departure)))
+    if cells:
+        store(compute(cells))
+
+
+@task
+def refresh_cells(cells, trip_ids, alias=None):
+    """Job run for the marks of one transaction on ``alias``."""
+    with sharding.pinned(alias):
+        refresh(
+            cells=[(route_id, date.fromisoformat(day)) for route_id, day in cells],
+            trip_ids=trip_ids,
+        )
+
+
+class _Marks:
+    """Cells and trips marked inside one transaction; its on_commit callback."""
+
+    def __init__(self, using):
+        self.using = using
+        self.cells = set()
+        self.trip_ids = set()
+        self.queued = False
+
+    def __call__(self):
+        self.queued = True
+        enqueue(refresh_cells, kwargs={
+            'cells': sorted([route_id, day.isoformat()] for route_id, day in self.cells),
+            'trip_ids': sorted(self.trip_ids),
+            'alias': self.using,
+        })
+
+
+def mark_dirty(cell=None, trip_id=None, using=None):
+    """Recompute a cell, given directly or through one of its trips, once
+    the transaction on ``using`` commits.
+
+    Marks made inside one transaction share a single on_commit callback,
+    which queues one ``refresh_cells`` job for all of them; a rollback drops
+    the callback together with its marks.
+    """
+    connection = transaction.get_connection(using)
+    # The open transaction's on_commit callbacks (empty in autocommit mode).
+    marks = next(
+        (func for _, func, _ in connection.run_on_commit if isinstance(func, _Marks) and not func.queued), None,
+    )
+    registered = marks is not None
+    if not registered:
+        marks = _Marks(using)
+    if cell is not None:
+        marks.cells.add(cell)
+    if trip_id is not None:
+        marks.trip_ids.add(trip_id)
+    if not registered:
+        transaction.on_commit(marks, using=using)
+
+
+@task
+def refresh_seat_type(seat_type_id):
+    """A surcharge change touches every upcoming trip with seats of that type."""
+    # Run by a job worker: the seat type's id names the shard to work on.
+    with sharding.pinned(sharding.shard_for_pk(seat_type_id)):
+        trips = (
+            Trip.objects.filter(tripseat__seat__seatType_id=seat_type_id, dateDeparture__gte=timezone.now())
+            .values_list('id', flat=True).distinct()
+        )
+        refresh(trip_ids=list(trips))
+
+
+def rebuild(route_ids=None, start=None, end=None, batch_size=1000):
+    """Recompute every cell in the range from two grouped queries; for backfills and bulk loads."""
+    trips = Trip.objects.all()
+    if route_ids:
+        trips = trips.filter(route_id__in=route_ids)
+    if start:
+        trips = trips.filter(dateDeparture__gte=start)
+    if end:
+        trips = trips.filter(dateDeparture__lt=end)
+
+    results = {}
+    for row in trips.values('route_id', day=TruncDate('dateDeparture')).annotate(n=Count('id')):
+        results[(row['route_id'], row['day'])] = [None, 0, row['n']]
+    seats = (
+        TripSeat.objects.filter(trip__in=trips, state='disponible')
+        .values(route_id=F('trip__route_id'), day=TruncDate('trip__dateDeparture'))
+        .annotate(seats=Count('id'), price=Min(F('trip__basePrice') + F('seat__seatType__aditionalPrice')))
+    )
+    for row in seats:
+        cell = results.setdefault((row['route_id'], row['day']), [None, 0, 0])
+        cell[0], cell[1] = row['price'], row['seats']
+    items = list(results.items())
+    for offset in range(0, len(items), batch_size):
+        store({cell: tuple(values) for cell, values in items[offset:offset + batch_size]})
+    return len(results)
+
+
+def month(route_id, first_day):
+    """Calendar rows for the month starting at ``first_day`` (one indexed query)."""
+    next_month = (first_day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return (
+        FareCalendarDay.objects.filter(route_id=route_id, day__gte=first_day, day__lt=next_month)
+        .order_by('day').values('day', 'min_price', 'available_seats', 'trips')
+    )
@@ -1,11 +1,15 @@
 # filters.py
+from datetime import datetime, time, timedelta
+
 import django_filters
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django_filters import rest_framework as filters
 from .models import (
     Notification, Company, Rol, UserCompany, Ship, SeatType, 
     Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment
 )
+from .schedules import scheduled_departures
 
 
 class NotificationFilter(filters.FilterSet):
@@ -14,13 +18,14 @@ class NotificationFilter(filters.FilterSet):
     user_username = filters.CharFilter(field_name='user__username', lookup_expr='icontains')
     topic = filters.CharFilter(lookup_expr='icontains')
     body = filters.CharFilter(lookup_expr='icontains')
+    read = filters.BooleanFilter()
     created_at = filters.DateFromToRangeFilter()
     created_after = filters.DateTimeFilter(field_name='created_at', lookup_expr='gte')
     created_before = filters.DateTimeFilter(field_name='created_at', lookup_expr='lte')
 
     class Meta:
         model = Notification
-        fields = ['user', 'topic']
+        fields = ['user', 'topic', 'read']
 
     @property
     def qs(self):
@@ -195,11 +200,63 @@ class TripFilter(filters.FilterSet):
     dateDeparture = filters.NumberFilter()
     dateDeparture_min = filters.NumberFilter(field_name='dateDeparture', lookup_expr='gte')
     dateDeparture_max = filters.NumberFilter(field_name='dateDeparture', lookup_expr='lte')
+    date = filters.DateFilter(method='filter_date', label="Departure day (YYYY-MM-DD)")
+    has_seats = filters.BooleanFilter(method='filter_has_seats')
+    min_available = filters.NumberFilter(field_name='available_seats', lookup_expr='gte')
+
+    # Filters that also apply to TripSchedule, for departures not materialized yet.
+    schedule_lookups = {
+        'route': 'route',
+        'route_id': 'route__id',
+        'origin': 'route__origin__icontains',
+        'destiny': 'route__destiny__icontains',
+        'company': 'route__company__id',
+        'company_name': 'route__company__name__icontains',
+        'ship': 'ship__id',
+        'basePrice': 'basePrice',
+        'basePrice_min': 'basePrice__gte',
+        'basePrice_max': 'basePrice__lte',
+        'has_seats': None,
+        'min_available': None,
+    }
 
     class Meta:
         model = Trip
         fields = ['route', 'seat', 'basePrice', 'dateDeparture']
 
+    def filter_date(self, queryset, name, value):
+        start = timezone.make_aware(datetime.combine(value, time()))
+        return queryset.filter(dateDeparture__gte=start, dateDeparture__lt=start + timedelta(days=1))
+
+    def filter_has_seats(self, queryset, name, value):
+        if value is True:
+            return queryset.filter(available_seats__gt=0)
+        elif value is False:
+            return queryset.filter(available_seats=0)
+        return queryset
+
+    def scheduled(self, schedules):
+        """Departures of ``schedules`` matching this filter on ``date`` that
+        have no ``Trip`` row yet, without creating any."""
+        data = self.form.cleaned_data
+        day = data.get('date')
+        if day is None:
+            return []
+        for name, value in data.items():
+            if value in (None, '') or name in ('date', 'ordering', 'search'):
+                continue
+            if name not in self.schedule_lookups:
+                return []
+            if self.schedule_lookups[name] is not None:
+                schedules = schedules.filter(**{self.schedule_lookups[name]: value})
+        departures = scheduled_departures(schedules.filter(active=True), day)
+        # Unmaterialized departures have every seat free.
+        if data.get('has_seats') is False:
+            return []
+        if data.get('min_available') is not None:
+            departures = [d for d in departures if d['available_seats'] >= data['min_available']]
+        return departures
+
     @property
     def qs(self):
         parent = super().qs
@@ -0,0 +1,103 @@
+# idempotency.py
+"""``Idempotency-Key`` support for create endpoints.
+
+A create sent with the header claims ``(user, scope, key)`` in the same
+transaction that does the work, so a concurrent retry waits on the unique
+index and then finds the committed outcome. Successful responses are stored
+compressed and replayed for ``IDEMPOTENCY_KEY_TTL_HOURS`` (marked with
+``Idempotent-Replayed: true``) without re-running validation or inserts.
+Failed attempts are rolled back with the claim, so the key can be retried.
+Reusing a key for a different request body is a ``422``.
+"""
+import hashlib
+import json
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, router, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class _Unsuccessful(Exception):
+    """Unwinds the claim's transaction when the create did not succeed."""
+
+    def __init__(self, response):
+        self.response = response
+
+
+def fingerprint(request):
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{payload}'.encode()).hexdigest()
+
+
+def encode(data):
+    return zlib.compress(json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode())
+
+
+def decode(blob):
+    return json.loads(zlib.decompress(bytes(blob)))
+
+
+def replay(record, request_fingerprint):
+    if record.fingerprint != request_fingerprint:
+        return Response(
+            {'detail': f"This {HEADER} was already used for a different request."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(decode(record.response), status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+class IdempotentCreateMixin:
+    """Answer retried creates carrying the same ``Idempotency-Key`` from the store."""
+
+    def idempotency_scope(self):
+        return self.get_queryset().model._meta.model_name
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return super().create(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError({HEADER: [f"Keys can be at most {MAX_KEY_LENGTH} characters."]})
+        lookup = {'user': request.user, 'scope': self.idempotency_scope(), 'key': key}
+        request_fingerprint = fingerprint(request)
+        ttl = timedelta(hours=getattr(settings, 'IDEMPOTENCY_KEY_TTL_HOURS', 24))
+
+        # The key lives in the directory database; the created row may be on a shard.
+        using = router.db_for_write(self.get_queryset().model)
+        for _ in range(2):
+            try:
+                with transaction.atomic(), transaction.atomic(using=using):
+                    record = IdempotencyKey.objects.create(
+                        **lookup, fingerprint=request_fingerprint, expires_at=timezone.now() + ttl,
+                    )
+                    response = super().create(request, *args, **kwargs)
+                    if not status.is_success(response.status_code):
+                        raise _Unsuccessful(response)
+                    record.status_code = response.status_code
+                    record.response = encode(response.data)
+                    record.save(update_fields=['status_code', 'response'])
+                    return response
+            except _Unsuccessful as exc:
+                return exc.response
+            except IntegrityError:
+                record = IdempotencyKey.objects.filter(**lookup).first()
+                if record is None:
+                    raise
+                if record.expires_at > timezone.now():
+                    return replay(record, request_fingerprint)
+                # Expired but not pruned yet: drop it and claim the key again.
+                record.delete()
+        return super().create(request, *args, **kwargs)
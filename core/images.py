@@ -0,0 +1,140 @@
+# images.py
+"""Company logo pipeline.
+
+Uploads are checked cheaply on the request (format, size, header
+integrity); decoding and resizing run in the ``images`` job queue. Each
+size in ``LOGO_SIZES`` is stored as WebP and JPEG under a name derived from
+the file's content hash, so a variant URL never changes meaning. Variants
+are plain files in ``default_storage``: the web server in front of the
+application (``nginx.conf``) or the storage's CDN serves them with a
+one-year ``immutable`` cache header, never Django.
+"""
+import hashlib
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from . import sharding
+from .jobs import enqueue, task
+from .models import Company
+
+ALLOWED_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+VARIANT_DIR = 'logos'
+
+
+def _pillow():
+    """``(Image, ImageOps)``, or ``(None, None)`` without Pillow.
+
+    Imported on first use rather than at startup: only logo uploads and the
+    ``images`` job queue decode images.
+    """
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None, None
+    return Image, ImageOps
+
+
+def validate_logo(upload):
+    """Reject files that are too big or not a supported image, without decoding pixels."""
+    Image, _ = _pillow()
+    if Image is None:
+        raise ValidationError("Image uploads need Pillow installed.")
+    max_bytes = getattr(settings, 'LOGO_MAX_UPLOAD_BYTES', 5 * 1024 * 1024)
+    if upload.size > max_bytes:
+        raise ValidationError(f"Logo must be at most {max_bytes // (1024 * 1024)} MB.")
+    try:
+        upload.seek(0)
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except (Image.UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError("Upload a valid JPEG, PNG, WebP or GIF image.")
+    finally:
+        upload.seek(0)
+    if image_format not in ALLOWED_FORMATS:
+        raise ValidationError("Upload a valid JPEG, PNG, WebP or GIF image.")
+    if width * height > getattr(settings, 'LOGO_MAX_PIXELS', 25_000_000):
+        raise ValidationError("Logo dimensions are too large.")
+
+
+def _encode(image, size, image_format):
+    Image, ImageOps = _pillow()
+    variant = ImageOps.contain(image, (size, size), Image.Resampling.LANCZOS)
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        background = Image.new('RGB', variant.size, (255, 255, 255))
+        background.paste(variant, mask=variant.getchannel('A') if 'A' in variant.getbands() else None)
+        variant = background
+    buffer = io.BytesIO()
+    if image_format == 'JPEG':
+        variant.save(buffer, 'JPEG', quality=85, optimize=True, progressive=True)
+    else:
+        variant.save(buffer, 'WEBP', quality=80, method=4)
+    return buffer.getvalue()
+
+
+def _store(content, size, extension):
+    digest = hashlib.sha256(content).hexdigest()[:20]
+    name = posixpath.join(VARIANT_DIR, f'{digest}-{size}.{extension}')
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(content))
+    return name
+
+
+def render_variants(source):
+    """Decode ``source`` (a file) and return ``{size: {format: name}}``."""
+    Image, ImageOps = _pillow()
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        variants = {}
+        for size in getattr(settings, 'LOGO_SIZES', (64, 256)):
+            variants[str(size)] = {
+                'webp': _store(_encode(image, size, 'WEBP'), size, 'webp'),
+                'jpeg': _store(_encode(image, size, 'JPEG'), size, 'jpg'),
+            }
+    return variants
+
+
+def _save_variants(company_id, logo, variants):
+    # Skip the write if the logo was replaced meanwhile; that upload has its own job.
+    companies = Company.objects.filter(Q(logo='') | Q(logo__isnull=True) if not logo else Q(logo=logo), pk=company_id)
+    # A queryset update sends no post_save, so copy the row to the shards here.
+    if companies.update(logo_variants=variants) and sharding.enabled():
+        sharding.replicate(Company.objects.get(pk=company_id))
+
+
+@task
+def process_logo(company_id, source_name):
+    if not source_name:
+        _save_variants(company_id, source_name, {})
+        return
+    with default_storage.open(source_name, 'rb') as source:
+        variants = render_variants(source)
+    _save_variants(company_id, source_name, {'source': source_name, 'sizes': variants})
+
+
+def schedule(company):
+    """Queue variant generation when ``company.logo`` differs from the processed one."""
+    source_name = company.logo.name or ''
+    if source_name != (company.logo_variants or {}).get('source', ''):
+        enqueue(process_logo, args=[company.pk, source_name], queue='images')
+
+
+def variant_urls(company, request=None):
+    variants = company.logo_variants or {}
+    if not company.logo or variants.get('source') != company.logo.name:
+        return {}
+    urls = {}
+    for size, formats in variants.get('sizes', {}).items():
+        urls[size] = {}
+        for image_format, name in formats.items():
+            url = default_storage.url(name)
+            urls[size][image_format] = request.build_absolute_uri(url) if request is not None else url
+    return urls
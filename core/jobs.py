@@ -0,0 +1,151 @@
+# jobs.py
+"""Small job queue stored in the project database.
+
+Views call ``enqueue`` inside their own transaction, so a job exists only if
+the request committed; writes on a shard pass ``using`` so the job waits for
+that shard's commit. ``python manage.py runjobs`` workers claim jobs in
+batches -- ``SELECT ... FOR UPDATE SKIP LOCKED`` where the backend supports
+it, a conditional ``UPDATE`` tagged with a claim token everywhere (SQLite
+included) -- run them, and retry failures with exponential backoff. Claims
+on one queue first lock its ``JobQueue`` row, so two workers can't both
+count the running jobs and overshoot the queue's concurrency.
+"""
+import random
+import traceback
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job, JobQueue
+
+
+def task(func):
+    """Mark ``func`` as runnable by the job queue."""
+    func.job_task = f'{func.__module__}.{func.__qualname__}'
+    return func
+
+
+def queue_settings(queue):
+    config = getattr(settings, 'JOB_QUEUES', {}).get(queue, {})
+    return {
+        'concurrency': config.get('concurrency', 1),
+        'max_attempts': config.get('max_attempts', 5),
+        'backoff_seconds': config.get('backoff_seconds', 10),
+        'max_backoff_seconds': config.get('max_backoff_seconds', 3600),
+    }
+
+
+def enqueue(func, args=(), kwargs=None, queue='default', delay=None, max_attempts=None, using=None):
+    """Store a call to ``func`` (decorated with ``@task``) for a worker.
+
+    ``args`` and ``kwargs`` must be JSON serializable. With
+    ``settings.JOB_QUEUE_EAGER`` the call runs immediately instead.
+
+    ``using`` is the database whose transaction the call belongs to. When
+    jobs are stored elsewhere (a shard's write, with ``core.sharding``), the
+    job is only created once that transaction commits: a rolled back write
+    never leaves a job behind, but a crash between the two commits loses it.
+    """
+    if not hasattr(func, 'job_task'):
+        raise ValueError(f"{func!r} is not a registered job task.")
+    kwargs = kwargs or {}
+    if using is not None and using != router.db_for_write(Job):
+        transaction.on_commit(partial(enqueue, func, args, kwargs, queue, delay, max_attempts), using=using)
+        return None
+    if getattr(settings, 'JOB_QUEUE_EAGER', False):
+        func(*args, **kwargs)
+        return None
+    return Job.objects.create(
+        queue=queue,
+        task=func.job_task,
+        payload={'args': list(args), 'kwargs': kwargs},
+        max_attempts=max_attempts or queue_settings(queue)['max_attempts'],
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+
+
+def requeue_stale(queue):
+    """Hand jobs of crashed workers back to the queue."""
+    timeout = timedelta(seconds=getattr(settings, 'JOB_LOCK_TIMEOUT_SECONDS', 600))
+    return Job.objects.filter(
+        queue=queue, status='running', locked_at__lt=timezone.now() - timeout,
+    ).update(status='queued', locked_by=None, locked_at=None)
+
+
+def _lock_queue(queue, now):
+    # An UPDATE rather than SELECT ... FOR UPDATE: it takes the row lock on
+    # MySQL and PostgreSQL and the database write lock on SQLite.
+    if not JobQueue.objects.filter(name=queue).update(claimed_at=now):
+        JobQueue.objects.get_or_create(name=queue)
+        JobQueue.objects.filter(name=queue).update(claimed_at=now)
+
+
+def claim(queue, worker_id, limit):
+    """Atomically take up to ``limit`` due jobs, capped by the queue's
+    concurrency limit minus the jobs already running on it."""
+    token = f'{worker_id}:{uuid.uuid4().hex[:12]}'
+    now = timezone.now()
+    with transaction.atomic():
+        _lock_queue(queue, now)
+        running = Job.objects.filter(queue=queue, status='running').count()
+        limit = min(limit, queue_settings(queue)['concurrency'] - running)
+        if limit <= 0:
+            return []
+        due = Job.objects.filter(queue=queue, status='queued', run_at__lte=now).order_by('run_at', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        ids = list(due.values_list('id', flat=True)[:limit])
+        if not ids:
+            return []
+        # The status condition makes the claim safe even without row locks.
+        Job.objects.filter(id__in=ids, status='queued').update(
+            status='running', locked_by=token, locked_at=now, attempts=F('attempts') + 1,
+        )
+    return list(Job.objects.filter(locked_by=token, status='running').order_by('run_at', 'id'))
+
+
+def backoff(job):
+    config = queue_settings(job.queue)
+    delay = min(config['backoff_seconds'] * 2 ** (job.attempts - 1), config['max_backoff_seconds'])
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run(job):
+    """Execute a claimed job and record the outcome. Returns True on success."""
+    try:
+        func = import_string(job.task)
+        if getattr(func, 'job_task', None) != job.task:
+            raise ValueError(f"{job.task} is not a registered job task.")
+        func(*job.payload.get('args', []), **job.payload.get('kwargs', {}))
+    except Exception:
+        error = traceback.format_exc()
+        update = {'locked_by': None, 'locked_at': None, 'last_error': error[-5000:]}
+        if job.attempts < job.max_attempts:
+            update.update(status='queued', run_at=timezone.now() + backoff(job))
+        else:
+            update.update(status='failed')
+        Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(**update)
+        return False
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        status='done', locked_by=None, locked_at=None, last_error='',
+    )
+    return True
+
+
+def work(queues, worker_id, batch_size=10):
+    """Claim and run one batch per queue. Returns ``(succeeded, failed)``."""
+    succeeded = failed = 0
+    for queue in queues:
+        requeue_stale(queue)
+        for job in claim(queue, worker_id, batch_size):
+            if run(job):
+                succeeded += 1
+            else:
+                failed += 1
+    return succeeded, failed
@@ -0,0 +1,254 @@
+# journeys.py
+"""Multi-leg journey planner over upcoming trips.
+
+Each process keeps an in-memory index of trips departing within
+``JOURNEY_HORIZON_DAYS``, grouped by departure port and sorted by departure
+time. Queries never touch the database. The index follows trip, route and
+seat type edits through the change log (``core.changefeed``) at most every
+``JOURNEY_SYNC_SECONDS`` and is rebuilt every ``JOURNEY_REBUILD_SECONDS``
+so the horizon keeps sliding forward. Updates never change a port list in
+place: they build new lists and swap them in, so a search running at the
+same time reads a consistent snapshot without taking the lock.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import namedtuple
+from datetime import timedelta
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import Min
+from django.utils import timezone
+
+from . import changefeed, sharding
+from .models import SeatType, Trip
+
+
+Leg = namedtuple('Leg', [
+    'departure', 'trip_id', 'arrival', 'route_id', 'company_id',
+    'origin', 'destiny', 'price', 'ship_id',
+])
+
+_departure = attrgetter('departure')
+
+
+def port_key(name):
+    return ' '.join(name.split()).lower()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class JourneyIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.by_port = {}
+        self.legs = {}
+        self.surcharges = {}
+        self.ports = {}
+        self.position = None
+        self.horizon_end = None
+        self.next_sync = 0.0
+        self.next_rebuild = 0.0
+
+    # -- loading ---------------------------------------------------------
+
+    def _trip_rows(self, alias, **filters):
+        now = timezone.now()
+        return Trip.objects.using(alias).filter(
+            dateDeparture__gte=now, dateDeparture__lt=self.horizon_end, **filters
+        ).values_list(
+            'id', 'route_id', 'route__company_id', 'route__origin', 'route__destiny',
+            'route__duration', 'basePrice', 'dateDeparture', 'seat__seatType__ship_id',
+        )
+
+    def _surcharges(self, alias, ship_ids=None):
+        seat_types = SeatType.objects.using(alias)
+        if ship_ids is not None:
+            seat_types = seat_types.filter(ship_id__in=ship_ids)
+        return dict(seat_types.values('ship_id').annotate(low=Min('aditionalPrice')).values_list('ship_id', 'low'))
+
+    def _make_leg(self, row, surcharges):
+        trip_id, route_id, company_id, origin, destiny, duration, base_price, departure, ship_id = row
+        duration = duration or timedelta(minutes=_setting('JOURNEY_DEFAULT_LEG_MINUTES', 720))
+        self.ports.setdefault(port_key(origin), origin)
+        self.ports.setdefault(port_key(destiny), destiny)
+        return Leg(
+            departure, trip_id, departure + duration, route_id, company_id,
+            port_key(origin), port_key(destiny), base_price + (surcharges.get(ship_id) or 0.0), ship_id,
+        )
+
+    def rebuild(self):
+        self.horizon_end = timezone.now() + timedelta(days=_setting('JOURNEY_HORIZON_DAYS', 30))
+        position = changefeed.head_position()
+        by_port, legs, all_surcharges = {}, {}, {}
+        # Every shard's trips; a ship's seat types live on its shard too.
+        for alias in sharding.shard_aliases():
+            surcharges = self._surcharges(alias)
+            all_surcharges.update(surcharges)
+            for row in self._trip_rows(alias).iterator(chunk_size=5000):
+                leg = self._make_leg(row, surcharges)
+                legs[leg.trip_id] = leg
+                by_port.setdefault(leg.origin, []).append(leg)
+        for port_legs in by_port.values():
+            port_legs.sort()
+        self.by_port, self.legs, self.surcharges, self.position = by_port, legs, all_surcharges, position
+        now = time.monotonic()
+        self.next_sync = now + _setting('JOURNEY_SYNC_SECONDS', 5)
+        self.next_rebuild = now + _setting('JOURNEY_REBUILD_SECONDS', 3600)
+
+    def sync(self):
+        """Apply trip, route and seat type changes logged since the last sync.
+
+        Only the port lists that change are copied; the new dicts replace
+        the old ones in single assignments once they are complete.
+        """
+        entries, self.position, _ = changefeed.read_entries(self.position)
+        self.next_sync = time.monotonic() + _setting('JOURNEY_SYNC_SECONDS', 5)
+        changes = [
+            (entry.id, entry.model, entry.object_id)
+            for entry in entries if entry.model in ('trip', 'route', 'seattype')
+        ]
+        if not changes:
+            return
+        legs = dict(self.legs)
+        trip_ids = {object_id for _, model, object_id in changes if model == 'trip'}
+        route_ids = {object_id for _, model, object_id in changes if model == 'route'}
+        trip_ids |= {leg.trip_id for leg in legs.values() if leg.route_id in route_ids}
+        surcharges = self.surcharges
+        if any(model == 'seattype' for _, model, _ in changes):
+            # A deleted seat type no longer names its ship, so compare the
+            # cheapest surcharge of every ship instead.
+            surcharges = {}
+            for alias in sharding.shard_aliases():
+                surcharges.update(self._surcharges(alias))
+            ships = {
+                ship_id for ship_id in surcharges.keys() | self.surcharges.keys()
+                if surcharges.get(ship_id) != self.surcharges.get(ship_id)
+            }
+            trip_ids |= {leg.trip_id for leg in legs.values() if leg.ship_id in ships}
+
+        by_port = dict(self.by_port)
+        copied = set()
+
+        def port_legs(port):
+            if port not in copied:
+                by_port[port] = list(by_port.get(port, ()))
+                copied.add(port)
+            return by_port[port]
+
+        def remove(trip_id):
+            leg = legs.pop(trip_id, None)
+            if leg is not None:
+                origin_legs = port_legs(leg.origin)
+                position = bisect_left(origin_legs, leg)
+                if position < len(origin_legs) and origin_legs[position] == leg:
+                    del origin_legs[position]
+
+        for trip_id in trip_ids:
+            remove(trip_id)
+        for alias in sharding.shard_aliases():
+            rows = list(self._trip_rows(alias, id__in=trip_ids)) if trip_ids else []
+            if route_ids:
+                rows += list(self._trip_rows(alias, route_id__in=route_ids).exclude(id__in=trip_ids))
+            for row in rows:
+                leg = self._make_leg(row, surcharges)
+                remove(leg.trip_id)
+                legs[leg.trip_id] = leg
+                insort(port_legs(leg.origin), leg)
+        self.by_port, self.legs, self.surcharges = by_port, legs, surcharges
+
+    def refresh(self):
+        now = time.monotonic()
+        if now < self.next_sync:
+            return
+        with self._lock:
+            if now >= self.next_rebuild:
+                self.rebuild()
+            elif now >= self.next_sync:
+                self.sync()
+
+    # -- queries ---------------------------------------------------------
+
+    def search(self, origin, destiny, depart_after, max_legs=3, min_transfer=timedelta(hours=1),
+               max_duration=timedelta(days=7)):
+        """Pareto-optimal journeys by (arrival, price) from ``origin`` to ``destiny``.
+
+        A label-setting search over (port, arrival, price, legs) labels: a
+        label is dropped when another label at the same port arrives no
+        later, costs no more and uses no more legs. The first leg may
+        leave at ``depart_after``; later legs need ``min_transfer`` after
+        the previous arrival. Results are sorted by arrival.
+        """
+        self.refresh()
+        by_port = self.by_port
+        origin, destiny = port_key(origin), port_key(destiny)
+        deadline = depart_after + max_duration
+        labels = {}
+        results = []
+        heap = [(0.0, depart_after, 0, origin, ())]
+
+        def dominated(port, price, arrival, legs):
+            return any(
+                p <= price and a <= arrival and n <= legs
+                for p, a, n in labels.get(port, ())
+            )
+
+        while heap:
+            price, arrival, legs, port, path = heapq.heappop(heap)
+            if port == destiny:
+                if not any(p <= price and a <= arrival for p, a, _, _ in results):
+                    results.append((price, arrival, legs, path))
+                continue
+            if legs >= max_legs:
+                continue
+            earliest = arrival if not path else arrival + min_transfer
+            visited = {origin} | {leg.destiny for leg in path}
+            port_legs = by_port.get(port, [])
+            for position in range(bisect_left(port_legs, earliest, key=_departure), len(port_legs)):
+                leg = port_legs[position]
+                if leg.departure > deadline:
+                    break
+                if leg.destiny in visited or leg.arrival > deadline:
+                    continue
+                new_price = price + leg.price
+                if any(p <= new_price and a <= leg.arrival for p, a, _, _ in results):
+                    continue
+                if dominated(leg.destiny, new_price, leg.arrival, legs + 1):
+                    continue
+                labels.setdefault(leg.destiny, []).append((new_price, leg.arrival, legs + 1))
+                heapq.heappush(heap, (new_price, leg.arrival, legs + 1, leg.destiny, path + (leg,)))
+
+        results.sort(key=lambda result: (result[1], result[0]))
+        return [self._describe(price, path) for price, _, _, path in results]
+
+    def _describe(self, price, path):
+        return {
+            'departure': path[0].departure,
+            'arrival': path[-1].arrival,
+            'price': round(price, 2),
+            'transfers': len(path) - 1,
+            'legs': [
+                {
+                    'trip_id': leg.trip_id,
+                    'route_id': leg.route_id,
+                    'company_id': leg.company_id,
+                    'origin': self.ports.get(leg.origin, leg.origin),
+                    'destiny': self.ports.get(leg.destiny, leg.destiny),
+                    'departure': leg.departure,
+                    'arrival': leg.arrival,
+                    'price': leg.price,
+                }
+                for leg in path
+            ],
+        }
+
+
+_index = JourneyIndex()
+
+
+def get_index():
+    return _index
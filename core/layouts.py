@@ -0,0 +1,111 @@
+# layouts.py
+"""Precomputed ship layouts: seat numbers per seat type, surcharges and capacity.
+
+``ShipLayout`` holds one row per ship. ``core.signals`` marks a ship dirty
+whenever one of its seats or seat types is saved or deleted, and the row is
+recomputed once after the transaction commits, so trip pages and trip
+generation read one row instead of walking every seat. ``get_many`` builds
+rows that are still missing on first read; ``python manage.py
+rebuild_ship_layouts`` recomputes them after bulk loads that skip signals.
+"""
+import threading
+from functools import partial
+
+from django.db import transaction
+
+from . import sharding
+from .bulk import upsert
+from .models import Seat, SeatType, Ship, ShipLayout
+
+
+_pending = threading.local()
+
+
+def compute(ship_ids):
+    """Return ``{ship_id: (capacity, seat_types)}`` for the ships that exist, in three queries."""
+    layouts = {ship_id: [] for ship_id in Ship.objects.filter(pk__in=ship_ids).values_list('id', flat=True)}
+    seat_types = {}
+    for seat_type_id, ship_id, surcharge in (
+        SeatType.objects.filter(ship_id__in=layouts).order_by('id').values_list('id', 'ship_id', 'aditionalPrice')
+    ):
+        seat_types[seat_type_id] = {'id': seat_type_id, 'aditionalPrice': surcharge, 'capacity': 0, 'seats': []}
+        layouts[ship_id].append(seat_types[seat_type_id])
+    for seat_id, seat_type_id, number in (
+        Seat.objects.filter(seatType_id__in=seat_types).order_by('number', 'id').values_list('id', 'seatType_id', 'number')
+    ):
+        seat_types[seat_type_id]['seats'].append([seat_id, number])
+        seat_types[seat_type_id]['capacity'] += 1
+    return {
+        ship_id: (sum(seat_type['capacity'] for seat_type in types), types)
+        for ship_id, types in layouts.items()
+    }
+
+
+def store(results):
+    upsert(
+        ShipLayout,
+        [
+            ShipLayout(ship_id=ship_id, capacity=capacity, seat_types=seat_types)
+            for ship_id, (capacity, seat_types) in results.items()
+        ],
+        unique_fields=['ship'],
+        update_fields=['capacity', 'seat_types', 'updated_at'],
+    )
+
+
+def refresh(ship_ids):
+    by_shard = {}
+    for ship_id in ship_ids:
+        by_shard.setdefault(sharding.shard_for_pk(ship_id), []).append(ship_id)
+    for alias, ids in by_shard.items():
+        with sharding.pinned(alias):
+            store(compute(ids))
+
+
+def _flush(using):
+    ship_ids = getattr(_pending, 'ships', {}).pop(using, set())
+    refresh(ship_ids)
+
+
+def mark_dirty(ship_id, using=None):
+    """Recompute the layout of ``ship_id`` after the transaction on ``using`` commits.
+
+    Ships marked inside one transaction are recomputed together.
+    """
+    if not hasattr(_pending, 'ships'):
+        _pending.ships = {}
+    _pending.ships.setdefault(using, set()).add(ship_id)
+    transaction.on_commit(partial(_flush, using), using=using)
+
+
+def get_many(ship_ids):
+    """``{ship_id: (capacity, seat_types)}``; missing layouts are computed and stored."""
+    layouts = {
+        ship_id: (capacity, seat_types)
+        for ship_id, capacity, seat_types in (
+            ShipLayout.objects.filter(ship_id__in=ship_ids).values_list('ship_id', 'capacity', 'seat_types')
+        )
+    }
+    missing = set(ship_ids) - set(layouts)
+    if missing:
+        results = compute(missing)
+        if results:
+            store(results)
+        layouts.update(results)
+    return layouts
+
+
+def get(ship_id):
+    """``(capacity, seat_types)`` of ``ship_id``, or ``None`` if there is no such ship."""
+    return get_many([ship_id]).get(ship_id)
+
+
+def rebuild(ship_ids=None, batch_size=100):
+    """Recompute the layouts of ``ship_ids`` (every ship by default) on the current shard."""
+    ships = Ship.objects.order_by('id')
+    if ship_ids:
+        ships = ships.filter(pk__in=ship_ids)
+    ids = list(ships.values_list('id', flat=True))
+    for offset in range(0, len(ids), batch_size):
+        store(compute(ids[offset:offset + batch_size]))
+    return len(ids)
@@ -0,0 +1,83 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core.benchmarks import (
+    format_table, load_json, measure, report, throttling_disabled, write_json
+)
+from core.models import Booking, Route, Trip
+from core.urls import router
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every router endpoint in core/urls.py (list, detail and a few "
+        "filtered searches) in-process: p50/p95/p99 latency, queries per request "
+        "and throughput. Run it against a database filled by seed_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--only', action='append', help="Run only scenarios whose name contains this.")
+        parser.add_argument('--scenarios', help="JSON file with extra [{\"name\": ..., \"path\": ...}] entries.")
+        parser.add_argument('--json', dest='json_path', help="Write results to this file.")
+        parser.add_argument('--compare', help="Previous --json output to diff against.")
+        parser.add_argument('--username', default='benchmark')
+
+    def scenarios(self, options):
+        scenarios = []
+        for prefix, viewset, basename in router.registry:
+            scenarios.append((f'{prefix} list', f'/api/{prefix}/'))
+            pk = viewset.queryset.order_by('pk').values_list('pk', flat=True).first()
+            if pk is not None:
+                scenarios.append((f'{prefix} detail', f'/api/{prefix}/{pk}/'))
+
+        route = Route.objects.order_by('pk').first()
+        if route is not None:
+            scenarios.append((
+                'trips search origin/destiny',
+                f'/api/trips/?origin={route.origin}&destiny={route.destiny}',
+            ))
+        trip = Trip.objects.order_by('pk').first()
+        if trip is not None:
+            scenarios.append(('trip-seats by trip_id', f'/api/trip-seats/?trip_id={trip.pk}'))
+            scenarios.append(('trip-seats available', f'/api/trip-seats/?trip_id={trip.pk}&available_seats=true'))
+        booking = Booking.objects.order_by('pk').first()
+        if booking is not None:
+            scenarios.append(('bookings by user_id', f'/api/bookings/?user_id={booking.user_id}'))
+
+        if options['scenarios']:
+            scenarios += [(row['name'], row['path']) for row in load_json(options['scenarios'])]
+        if options['only']:
+            scenarios = [s for s in scenarios if any(o in s[0] for o in options['only'])]
+        return scenarios
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username=options['username'])
+        token = str(RefreshToken.for_user(user).access_token)
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        results = []
+        with throttling_disabled():
+            for name, path in self.scenarios(options):
+                stats = measure(
+                    lambda: client.get(path),
+                    iterations=options['iterations'], warmup=options['warmup'],
+                )
+                results.append({'name': name, 'path': path, **stats})
+                self.stderr.write(f"  {name}: p50 {stats['p50_ms']:.2f} ms")
+
+        baseline = load_json(options['compare']) if options['compare'] else None
+        self.stdout.write(format_table(results, baseline))
+        data = report(results, {'iterations': options['iterations']})
+        if options['json_path']:
+            write_json(options['json_path'], data)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
+        if any(row['status'] and row['status'] >= 500 for row in results):
+            raise CommandError("Some endpoints returned server errors:\n" + json.dumps(
+                [row['name'] for row in results if row['status'] and row['status'] >= 500]
+            ))
@@ -0,0 +1,82 @@
+import copy
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.utils import load_backend
+
+from core import dbpool
+from core.benchmarks import format_table, load_json, measure, report, write_json
+
+
+MODES = [
+    ('direct', "new connection per request", None),
+    ('pooled', "pooled, ping after DATABASE_POOL['ping_after']", {}),
+    ('pooled-ping', "pooled, ping on every checkout", {'ping_after': 0}),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the database cost of a request's connection lifecycle (connect, "
+        "--queries trivial queries, close) with a fresh connection per request and "
+        "with pooled connections."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--queries', type=int, default=3, help="Queries per simulated request.")
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--json', dest='json_path', help="Write results to this file.")
+        parser.add_argument('--compare', help="Previous --json output to diff against.")
+
+    def handle(self, *args, **options):
+        base_settings = connections.settings[options['database']]
+        backend = load_backend(base_settings['ENGINE'])
+        if not issubclass(backend.DatabaseWrapper, dbpool.PooledDatabaseWrapperMixin):
+            raise CommandError(f"{base_settings['ENGINE']} is not a pooled backend (core.backends.*).")
+
+        results = []
+        for mode, description, overrides in MODES:
+            settings_dict = copy.deepcopy(base_settings)
+            settings_dict.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=True)
+            if overrides is None:
+                settings_dict['OPTIONS'].pop('pool', None)
+            else:
+                pool = settings_dict['OPTIONS'].get('pool')
+                settings_dict['OPTIONS']['pool'] = {**(pool if isinstance(pool, dict) else {}), **overrides}
+            alias = f"{options['database']}-benchmark-{mode}"
+            wrapper = backend.DatabaseWrapper(settings_dict, alias)
+
+            def request_cycle():
+                with wrapper.cursor() as cursor:
+                    for _ in range(options['queries']):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+                wrapper.close()
+
+            try:
+                stats = measure(request_cycle, options['iterations'], options['warmup'])
+                pool_stats = dbpool.stats().get(alias, {})
+            finally:
+                wrapper.close()
+                dbpool.close_pool(alias)
+            results.append({
+                'name': mode,
+                'description': description,
+                'connects': pool_stats.get('connects', options['iterations'] + options['warmup']),
+                **stats,
+            })
+
+        baseline = load_json(options['compare']) if options['compare'] else None
+        self.stdout.write(format_table(results, baseline))
+        self.stdout.write('')
+        for row in results:
+            self.stdout.write(f"{row['name']:<40} {row['connects']:>6} connections opened  ({row['description']})")
+        if options['json_path']:
+            write_json(options['json_path'], report(results, {
+                'database': options['database'],
+                'vendor': connections[options['database']].vendor,
+                'queries_per_request': options['queries'],
+            }))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
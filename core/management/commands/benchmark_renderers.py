@@ -0,0 +1,71 @@
+import io
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import format_table, load_json, measure, report, write_json
+from core.filters import BookingFilter, PaymentFilter, TripFilter, TripSeatFilter
+from core.models import Booking, Payment, Trip, TripSeat
+from core.renderers import FastJSONParser, FastJSONRenderer, MessagePackParser, MessagePackRenderer
+from core.serializers import BookingSerializer, PaymentSerializer, TripSerializer, TripSeatSerializer
+
+
+SERIALIZERS = [
+    ('BookingSerializer', BookingSerializer, Booking, BookingFilter),
+    ('TripSeatSerializer', TripSeatSerializer, TripSeat, TripSeatFilter),
+    ('TripSerializer', TripSerializer, Trip, TripFilter),
+    ('PaymentSerializer', PaymentSerializer, Payment, PaymentFilter),
+]
+CODECS = [
+    ('json', JSONRenderer, JSONParser),
+    ('orjson', FastJSONRenderer, FastJSONParser),
+    ('msgpack', MessagePackRenderer, MessagePackParser),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare render and parse cost of the stock JSON renderer, FastJSONRenderer and "
+        "MessagePackRenderer on list output of the existing serializers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help="Objects per rendered list.")
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--json', dest='json_path', help="Write results to this file.")
+        parser.add_argument('--compare', help="Previous --json output to diff against.")
+
+    def handle(self, *args, **options):
+        results = []
+        for name, serializer_class, model, filterset_class in SERIALIZERS:
+            queryset = filterset_class(queryset=model.objects.order_by('pk')).qs[:options['rows']]
+            data = serializer_class(queryset, many=True).data
+            if not data:
+                self.stderr.write(f"  {name}: no rows, run seed_data first")
+                continue
+            for codec, renderer_class, parser_class in CODECS:
+                renderer, parser = renderer_class(), parser_class()
+                payload = renderer.render(data)
+                for step, func in [
+                    ('render', lambda: renderer.render(data)),
+                    ('parse', lambda: parser.parse(io.BytesIO(payload))),
+                ]:
+                    stats = measure(func, options['iterations'], options['warmup'])
+                    results.append({
+                        'name': f'{name} x{len(data)} {codec} {step}',
+                        'bytes': len(payload),
+                        **stats,
+                    })
+
+        baseline = load_json(options['compare']) if options['compare'] else None
+        self.stdout.write(format_table(results, baseline))
+        self.stdout.write('')
+        for row in results:
+            if row['name'].endswith('render'):
+                self.stdout.write(f"{row['name'][:-len(' render')]:<40} {row['bytes']:>10} bytes")
+        if options['json_path']:
+            write_json(options['json_path'], report(results, {'rows': options['rows']}))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
+
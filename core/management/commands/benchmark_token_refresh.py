@@ -0,0 +1,66 @@
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import revocation
+from core.benchmarks import format_table, load_json, measure, report, throttling_disabled, write_json
+from core.models import RevokedToken
+
+
+MODES = [
+    ('off', "no revocation check"),
+    ('database', "indexed lookup on every refresh"),
+    ('filter', "Bloom filter, lookup only on a hit"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure /api/token/refresh/ throughput without revocation, with a database "
+        "lookup per refresh and with the in-memory filter. Runs inside a transaction "
+        "that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--revoked', type=int, default=100000, help="Revoked JTIs to preload.")
+        parser.add_argument('--iterations', type=int, default=500)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--json', dest='json_path', help="Write results to this file.")
+        parser.add_argument('--compare', help="Previous --json output to diff against.")
+
+    def handle(self, *args, **options):
+        results = []
+        with transaction.atomic():
+            expires = timezone.now() + timedelta(days=7)
+            RevokedToken.objects.bulk_create(
+                [RevokedToken(jti=uuid.uuid4().hex, expires_at=expires) for _ in range(options['revoked'])],
+                batch_size=5000,
+            )
+            user, _ = User.objects.get_or_create(username='benchmark')
+            refresh = str(RefreshToken.for_user(user))
+            client = Client()
+
+            with throttling_disabled():
+                for mode, description in MODES:
+                    with override_settings(REVOCATION_CHECK=mode):
+                        revocation.index.reset()
+                        stats = measure(
+                            lambda: client.post('/api/token/refresh/', {'refresh': refresh}),
+                            options['iterations'], options['warmup'],
+                        )
+                    results.append({'name': f'refresh ({mode})', 'description': description, **stats})
+            transaction.set_rollback(True)
+        revocation.index.reset()
+
+        baseline = load_json(options['compare']) if options['compare'] else None
+        self.stdout.write(format_table(results, baseline))
+        if options['json_path']:
+            write_json(options['json_path'], report(results, {'revoked': options['revoked']}))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.changefeed import compact
+
+
+class Command(BaseCommand):
+    help = "Compact the delta-sync change log (expired and superseded entries)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        expired, superseded = compact(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Removed {expired} expired and {superseded} superseded change log entries."
+        ))
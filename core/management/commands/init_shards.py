@@ -0,0 +1,38 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from core import sharding
+from core.models import Company, PaymentMethod
+
+
+class Command(BaseCommand):
+    help = (
+        "Migrate every shard in SHARD_DATABASES, start its primary keys at its id block "
+        "and copy the reference tables (users, companies, payment methods) to it."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Reference rows copied per statement.")
+
+    def handle(self, *args, **options):
+        for alias in sharding.shard_aliases():
+            if alias == sharding.DIRECTORY:
+                continue
+            call_command('migrate', database=alias, interactive=False, verbosity=options['verbosity'])
+            start = sharding.reserve_ids(alias)
+            self.stdout.write(f"{alias}: new ids start after {start}.")
+            for model in (User, Company, PaymentMethod):
+                copied = self.copy_reference_table(model, alias, options['batch_size'])
+                self.stdout.write(f"{alias}: copied {copied} {model._meta.verbose_name_plural}.")
+        self.stdout.write(self.style.SUCCESS(f"Initialized {len(sharding.shard_aliases()) - 1} shards."))
+
+    def copy_reference_table(self, model, alias, batch_size):
+        copied, last_id = 0, 0
+        while True:
+            rows = list(model.objects.using(sharding.DIRECTORY).filter(pk__gt=last_id).order_by('pk')[:batch_size])
+            if not rows:
+                return copied
+            sharding.replicate_many(rows, alias)
+            copied += len(rows)
+            last_id = rows[-1].pk
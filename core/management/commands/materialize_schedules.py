@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.schedules import materialize_due
+from core.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = "Create the trips of active schedules up to SCHEDULE_WINDOW_DAYS ahead; run daily."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Window in days (defaults to SCHEDULE_WINDOW_DAYS).")
+
+    def handle(self, *args, **options):
+        created = sum(materialize_due(window_days=options['days']) for _ in each_shard())
+        self.stdout.write(self.style.SUCCESS(f"Created {created} trips."))
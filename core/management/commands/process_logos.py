@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import Company
+
+
+class Command(BaseCommand):
+    help = "Queue logo variant generation for companies whose variants are missing or stale."
+
+    def handle(self, *args, **options):
+        queued = 0
+        for company in Company.objects.exclude(logo='').exclude(logo__isnull=True).only('id', 'logo', 'logo_variants'):
+            if company.logo.name != (company.logo_variants or {}).get('source'):
+                images.schedule(company)
+                queued += 1
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} logos."))
@@ -0,0 +1,89 @@
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmarks import load_json, report, write_json
+from core.startup import parse_import_time
+
+TIMINGS = ('boot_ms', 'first_request_ms', 'next_request_ms', 'time_to_first_response_ms', 'rss_kb', 'private_kb')
+
+
+class Command(BaseCommand):
+    help = (
+        "Boot the WSGI application in fresh interpreters (python -X importtime -m "
+        "core.startup), time the first requests and report import time per package "
+        "and per module, and the worker's memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/trips/', help="Path of the timed requests.")
+        parser.add_argument(
+            '--preload', action='store_true',
+            help="Serve the requests from a forked child, as a preloaded gunicorn worker; "
+                 "time to first response then counts from the fork.",
+        )
+        parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters to boot; medians are reported.")
+        parser.add_argument('--top', type=int, default=25, help="Modules and packages to list.")
+        parser.add_argument('--json', dest='json_path', help="Write results to this file.")
+        parser.add_argument('--compare', help="Previous --json output to diff against.")
+
+    def boot(self, options):
+        command = [sys.executable, '-X', 'importtime', '-m', 'core.startup', '--path', options['path']]
+        if options['preload']:
+            command.append('--preload')
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(f"Boot failed:\n{result.stderr[-3000:]}")
+        return json.loads(result.stdout.strip().splitlines()[-1]), parse_import_time(result.stderr.splitlines())
+
+    def handle(self, *args, **options):
+        runs = [self.boot(options) for _ in range(max(options['runs'], 1))]
+        timings = {name: statistics.median(run[name] for run, _ in runs) for name in TIMINGS}
+        status = runs[0][0]['status']
+
+        own, cumulative, packages = defaultdict(list), defaultdict(list), defaultdict(list)
+        for _, modules in runs:
+            per_package = defaultdict(int)
+            for module, self_us, cumulative_us, _ in modules:
+                own[module].append(self_us)
+                cumulative[module].append(cumulative_us)
+                per_package[module.split('.')[0]] += self_us
+            for package, self_us in per_package.items():
+                packages[package].append(self_us)
+        median_ms = lambda values: statistics.median(values) / 1000  # noqa: E731
+        import_ms = sum(median_ms(values) for values in packages.values())
+
+        baseline = load_json(options['compare'])['meta'] if options['compare'] else {}
+        self.stdout.write(f"GET {options['path']} -> {status}, median of {len(runs)} fresh interpreters\n")
+        for name in TIMINGS:
+            line = f"{name:<28} {timings[name]:>10.1f}"
+            if baseline.get(name):
+                line += f"  {100 * (timings[name] - baseline[name]) / baseline[name]:+.1f}%"
+            self.stdout.write(line)
+        self.stdout.write(f"{'imports':<28} {import_ms:>10.1f} ms in {len(own)} modules\n")
+
+        self.stdout.write(f"{'package':<40} {'self ms':>9}")
+        top_packages = sorted(packages.items(), key=lambda item: -median_ms(item[1]))[:options['top']]
+        for package, values in top_packages:
+            self.stdout.write(f"{package:<40} {median_ms(values):>9.1f}")
+        self.stdout.write('')
+        self.stdout.write(f"{'module':<56} {'self ms':>9} {'cumul ms':>9}")
+        top_modules = sorted(own.items(), key=lambda item: -median_ms(cumulative[item[0]]))[:options['top']]
+        for module, values in top_modules:
+            self.stdout.write(f"{module:<56} {median_ms(values):>9.1f} {median_ms(cumulative[module]):>9.1f}")
+
+        if options['json_path']:
+            results = [
+                {'name': module, 'self_ms': round(median_ms(own[module]), 3),
+                 'cumulative_ms': round(median_ms(cumulative[module]), 3)}
+                for module in sorted(own, key=lambda module: -median_ms(cumulative[module]))
+            ]
+            write_json(options['json_path'], report(results, {
+                'path': options['path'], 'preload': options['preload'], 'runs': len(runs),
+                'import_ms': round(import_ms, 1), **timings,
+            }))
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
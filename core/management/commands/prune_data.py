@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.retention import POLICIES, prune
+
+
+class Command(BaseCommand):
+    help = "Delete rows past their retention (core.retention), in primary-key batches with pauses between them."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'policies', nargs='*', metavar='policy',
+            help=f"Policies to run ({', '.join(POLICIES)}); all by default.",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per transaction.")
+        parser.add_argument('--sleep', type=float, default=0.1, help="Seconds to pause between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Count the rows without deleting them.")
+        parser.add_argument('--start-id', type=int, default=0, help="Resume after this id (one policy only).")
+
+    def handle(self, *args, **options):
+        names = options['policies'] or list(POLICIES)
+        unknown = [name for name in names if name not in POLICIES]
+        if unknown:
+            raise CommandError(f"Unknown policies: {', '.join(unknown)}. Choose from {', '.join(POLICIES)}.")
+        if options['start_id'] and len(names) > 1:
+            raise CommandError("--start-id needs exactly one policy.")
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        for name in names:
+            total = 0
+            batches = prune(
+                name, batch_size=options['batch_size'], start_id=options['start_id'], dry_run=options['dry_run'],
+            )
+            for alias, last_id, deleted in batches:
+                total += deleted
+                self.stdout.write(f"{name} on {alias}: up to id {last_id}, {total} rows so far.")
+                if options['sleep'] and not options['dry_run']:
+                    time.sleep(options['sleep'])
+            self.stdout.write(self.style.SUCCESS(f"{verb} {total} {name}."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.revocation import prune
+
+
+class Command(BaseCommand):
+    help = "Delete revoked refresh-token JTIs whose tokens have expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = prune(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} expired revoked tokens."))
@@ -0,0 +1,24 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.fares import rebuild
+from core.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = "Recompute the fare calendar, e.g. after bulk loads that bypass model signals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--route', type=int, action='append', dest='routes', help="Route id (repeatable).")
+        parser.add_argument('--from', dest='start', help="First day (YYYY-MM-DD); defaults to today.")
+        parser.add_argument('--all', action='store_true', help="Include past days.")
+
+    def handle(self, *args, **options):
+        start = None
+        if not options['all']:
+            day = datetime.strptime(options['start'], '%Y-%m-%d').date() if options['start'] else timezone.localdate()
+            start = timezone.make_aware(datetime.combine(day, time()))
+        cells = sum(rebuild(route_ids=options['routes'], start=start) for _ in each_shard())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {cells} fare calendar days."))
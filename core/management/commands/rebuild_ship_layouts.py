@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.layouts import rebuild
+from core.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = "Recompute ship layout snapshots, e.g. after bulk loads that bypass model signals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ship', type=int, action='append', dest='ships', help="Ship id (repeatable).")
+
+    def handle(self, *args, **options):
+        ships = sum(rebuild(ship_ids=options['ships']) for _ in each_shard())
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {ships} ship layouts."))
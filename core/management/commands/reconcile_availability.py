@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.availability import reconcile
+from core.sharding import each_shard
+from core.models import Trip
+
+
+class Command(BaseCommand):
+    help = "Recount trip and seat-type availability counters in primary-key batches and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Report drift without fixing it.")
+        parser.add_argument('--start-id', type=int, default=0, help="Resume after this trip id.")
+
+    def handle(self, *args, **options):
+        checked, drifted = 0, 0
+        for _ in each_shard():
+            last_id = options['start_id']
+            while True:
+                ids = list(
+                    Trip.objects.filter(id__gt=last_id).order_by('id')
+                    .values_list('id', flat=True)[:options['batch_size']]
+                )
+                if not ids:
+                    break
+                drifted += reconcile(ids, fix=not options['dry_run'])
+                checked += len(ids)
+                last_id = ids[-1]
+                self.stdout.write(f"Checked trips up to id {last_id}: {drifted} drifted so far.")
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+        verb = "found" if options['dry_run'] else "repaired"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} trips, {verb} {drifted} with drift."))
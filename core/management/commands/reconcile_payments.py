@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+
+from core.models import Booking
+from core.payments import reconcile
+from core.sharding import each_shard
+
+
+class Command(BaseCommand):
+    help = "Mark bookings with a payment as paid and flag duplicate payments, in booking-id batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Booking ids per batch.")
+        parser.add_argument('--sleep', type=float, default=0.0, help="Seconds to pause between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would change without writing.")
+        parser.add_argument('--start-id', type=int, default=0, help="Resume after this booking id.")
+
+    def handle(self, *args, **options):
+        paid, duplicates = 0, 0
+        for _ in each_shard():
+            bounds = Booking.objects.aggregate(low=Min('id'), top=Max('id'))
+            if bounds['top'] is None:
+                continue
+            last_id = max(options['start_id'], bounds['low'] - 1)
+            while last_id < bounds['top']:
+                upper = last_id + options['batch_size']
+                batch_paid, batch_duplicates = reconcile(last_id + 1, upper, fix=not options['dry_run'])
+                paid += batch_paid
+                duplicates += batch_duplicates
+                last_id = upper
+                self.stdout.write(
+                    f"Reconciled bookings up to id {min(last_id, bounds['top'])}: "
+                    f"{paid} marked paid, {duplicates} duplicate payments so far."
+                )
+                if options['sleep']:
+                    time.sleep(options['sleep'])
+        suffix = " (dry run)" if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(
+            f"Bookings marked paid: {paid}; duplicate payments flagged: {duplicates}{suffix}."
+        ))
@@ -0,0 +1,39 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.jobs import work
+
+
+class Command(BaseCommand):
+    help = "Run a worker for the database-backed job queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help="Queue to work on (repeatable). Defaults to every queue in JOB_QUEUES.",
+        )
+        parser.add_argument('--batch-size', type=int, default=10)
+        parser.add_argument('--sleep', type=float, default=1.0, help="Idle poll interval in seconds.")
+        parser.add_argument('--once', action='store_true', help="Drain due jobs and exit.")
+
+    def handle(self, *args, **options):
+        queues = options['queues'] or list(getattr(settings, 'JOB_QUEUES', {'default': {}}))
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f"Worker {worker_id} on queues: {', '.join(queues)}")
+        try:
+            while True:
+                close_old_connections()
+                succeeded, failed = work(queues, worker_id, options['batch_size'])
+                if succeeded or failed:
+                    self.stdout.write(f"{succeeded} succeeded, {failed} failed")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,266 @@
+import random
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import router, transaction
+from django.utils import timezone
+
+from core import sharding
+from core.availability import reconcile as reconcile_availability
+from core.fares import rebuild as rebuild_fare_calendar
+from core.layouts import rebuild as rebuild_ship_layouts
+from core.models import (
+    Company, Ship, SeatType, Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment
+)
+
+
+PORTS = [
+    'Iquitos', 'Pucallpa', 'Yurimaguas', 'Nauta', 'Requena', 'Contamana',
+    'Lagunas', 'Pevas', 'Caballococha', 'Santa Rosa', 'San Lorenzo', 'Leticia',
+]
+COMPANY_WORDS = ['Amazonas', 'Ucayali', 'Marañón', 'Huallaga', 'Napo', 'Yavarí', 'Putumayo']
+SHIP_WORDS = ['Eduardo', 'Gilmer', 'Henry', 'Carolina', 'Jhuliana', 'Don José', 'Victoria']
+# Surcharge range per seat type: hammock deck, cabin, suite
+SEAT_TYPE_SURCHARGES = [(0, 0), (15, 40), (60, 120)]
+DEPARTURE_HOURS = [6, 12, 18]
+PAYMENT_METHODS = [
+    ('Efectivo', 'Pago en efectivo en agencia'),
+    ('Tarjeta', 'Tarjeta de crédito o débito'),
+    ('Yape', 'Billetera digital Yape'),
+    ('Plin', 'Billetera digital Plin'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Bulk-generate a realistic synthetic dataset (companies, ships, seat types, "
+        "seats, routes, a year of trips with their trip seats, bookings and payments) "
+        "for load tests and benchmarks."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=5)
+        parser.add_argument('--ships-per-company', type=int, default=3)
+        parser.add_argument('--seats-per-type', type=int, default=60)
+        parser.add_argument('--routes-per-company', type=int, default=4)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--trips-per-day', type=int, default=1, help="Departures per route and day.")
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--occupancy', type=float, default=0.6, help="Share of trip seats booked.")
+        parser.add_argument('--paid-ratio', type=float, default=0.8, help="Share of bookings paid.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.options = options
+
+        # Shards get their id blocks before anything is inserted on them.
+        shards = [alias for alias in sharding.shard_aliases() if alias != sharding.DIRECTORY]
+        for alias in shards:
+            sharding.reserve_ids(alias)
+        user_ids = self.create_users(options['users'])
+        method_ids = self.create_payment_methods()
+        companies = self.create_companies(options['companies'])
+        # bulk_create skips the signals that copy reference rows to the shards.
+        for alias in shards:
+            self.replicate(User, user_ids, alias)
+            self.replicate(Company, [company_id for company_id, _ in companies], alias)
+
+        by_shard = {}
+        for company_id, shard in companies:
+            by_shard.setdefault(shard or sharding.DIRECTORY, []).append(company_id)
+        totals = {'routes': 0, 'trips': 0, 'trip_seats': 0, 'bookings': 0, 'payments': 0}
+        start = timezone.make_aware(datetime.combine(timezone.now().date(), time()))
+        for alias, company_ids in by_shard.items():
+            # A company's catalog goes to its shard (a no-op pin without sharding).
+            with sharding.pinned(alias):
+                fleet = self.create_fleet(company_ids, options['ships_per_company'])
+                routes = self.create_routes(company_ids, options['routes_per_company'])
+                totals['routes'] += len(routes)
+                for route_id, company_id in routes:
+                    ships = fleet[company_id]
+                    for day_start in range(0, options['days'], 30):
+                        days = range(day_start, min(day_start + 30, options['days']))
+                        counts = self.create_trips(route_id, ships, start, days, user_ids, method_ids)
+                        for key, value in counts.items():
+                            totals[key] += value
+                    self.stdout.write(f"Route {route_id}: {totals}")
+                # bulk_create skips the signals that keep the fare calendar current.
+                rebuild_fare_calendar(route_ids=[route_id for route_id, _ in routes], start=start)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(companies)} companies, {totals['routes']} routes, "
+            f"{totals['trips']} trips, {totals['trip_seats']} trip seats, "
+            f"{totals['bookings']} bookings and {totals['payments']} payments."
+        ))
+
+    def bulk(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+
+    def replicate(self, model, ids, alias):
+        for offset in range(0, len(ids), self.batch_size):
+            rows = list(model.objects.using(sharding.DIRECTORY).filter(pk__in=ids[offset:offset + self.batch_size]))
+            if rows:
+                sharding.replicate_many(rows, alias)
+
+    def create_users(self, count):
+        # One shared unusable hash; hashing thousands of passwords would dominate the run.
+        password = make_password(None)
+        first = User.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.bulk(User, [
+            User(username=f'seed_user_{first + i}', email=f'seed_user_{first + i}@example.com', password=password)
+            for i in range(count)
+        ])
+        return list(User.objects.filter(username__startswith='seed_user_').values_list('id', flat=True))
+
+    def create_payment_methods(self):
+        for name, description in PAYMENT_METHODS:
+            PaymentMethod.objects.get_or_create(name=name, defaults={'description': description})
+        return list(PaymentMethod.objects.values_list('id', flat=True))
+
+    def create_companies(self, count):
+        first = Company.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        companies = [
+            Company(
+                name=f'Transportes {self.rng.choice(COMPANY_WORDS)} {first + i}',
+                email=f'ventas{first + i}@example.com',
+                address=f'Malecón {self.rng.choice(PORTS)} {self.rng.randint(100, 999)}',
+                phoneNumber=f'+5165{self.rng.randint(100000, 999999)}',
+                description='Transporte fluvial de pasajeros y carga.',
+            )
+            for i in range(count)
+        ]
+        # bulk_create skips the pre_save signal that picks a company's shard.
+        sharding.assign_many(companies)
+        self.bulk(Company, companies)
+        return list(Company.objects.filter(id__gt=first).order_by('id').values_list('id', 'shard'))
+
+    def create_fleet(self, companies, ships_per_company):
+        """Returns ``{company_id: [(ship_id, [(seat_id, seat_type_id)])]}``."""
+        first_ship = Ship.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.bulk(Ship, [
+            Ship(
+                company_id=company_id,
+                name=f'{self.rng.choice(SHIP_WORDS)} {self.rng.choice("IVX") * self.rng.randint(1, 3)}',
+                construction_year=self.rng.randint(1985, 2022),
+            )
+            for company_id in companies for _ in range(ships_per_company)
+        ])
+        ships = list(Ship.objects.filter(id__gt=first_ship).values_list('id', 'company_id'))
+
+        first_type = SeatType.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        self.bulk(SeatType, [
+            SeatType(ship_id=ship_id, aditionalPrice=float(self.rng.randint(*surcharge)))
+            for ship_id, _ in ships for surcharge in SEAT_TYPE_SURCHARGES
+        ])
+        types = list(SeatType.objects.filter(id__gt=first_type).order_by('id').values_list('id', 'ship_id'))
+
+        first_seat = Seat.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        seats_per_type = self.options['seats_per_type']
+        seats = []
+        numbers = {}
+        for type_id, ship_id in types:
+            for _ in range(seats_per_type):
+                numbers[ship_id] = numbers.get(ship_id, 0) + 1
+                seats.append(Seat(seatType_id=type_id, number=numbers[ship_id]))
+        self.bulk(Seat, seats)
+
+        # bulk_create skips the signals that keep ship layouts current.
+        rebuild_ship_layouts(ship_ids=[ship_id for ship_id, _ in ships])
+
+        by_ship = {}
+        rows = Seat.objects.filter(id__gt=first_seat).values_list('id', 'seatType_id', 'seatType__ship_id')
+        for seat_id, type_id, ship_id in rows:
+            by_ship.setdefault(ship_id, []).append((seat_id, type_id))
+        fleet = {}
+        for ship_id, company_id in ships:
+            fleet.setdefault(company_id, []).append((ship_id, by_ship.get(ship_id, [])))
+        return fleet
+
+    def create_routes(self, companies, routes_per_company):
+        first = Route.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        routes = []
+        for company_id in companies:
+            for _ in range(routes_per_company):
+                origin, destiny = self.rng.sample(PORTS, 2)
+                routes.append(Route(company_id=company_id, origin=origin, destiny=destiny))
+        self.bulk(Route, routes)
+        return list(Route.objects.filter(id__gt=first).order_by('id').values_list('id', 'company_id'))
+
+    def create_trips(self, route_id, ships, start, days, user_ids, method_ids):
+        """Create a chunk of trips and everything hanging off them in one transaction.
+
+        ``bulk_create`` does not return primary keys on MySQL, so ids are read
+        back with range queries after each level.
+        """
+        with transaction.atomic(using=router.db_for_write(Trip)):
+            return self._create_trips(route_id, ships, start, days, user_ids, method_ids)
+
+    def _create_trips(self, route_id, ships, start, days, user_ids, method_ids):
+        trips_per_day = self.options['trips_per_day']
+        base_price = float(self.rng.randrange(40, 250, 5))
+        first_trip = Trip.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        trips = []
+        for day in days:
+            for n in range(trips_per_day):
+                ship_id, seats = ships[(day + n) % len(ships)]
+                if not seats:
+                    continue
+                hour = DEPARTURE_HOURS[n % len(DEPARTURE_HOURS)]
+                trips.append(Trip(
+                    route_id=route_id,
+                    seat_id=seats[0][0],
+                    basePrice=base_price + self.rng.choice([0, 0, 5, 10, -5]),
+                    dateDeparture=start + timedelta(days=day, hours=hour),
+                ))
+        self.bulk(Trip, trips)
+        trip_rows = list(Trip.objects.filter(id__gt=first_trip).values_list('id', 'seat__seatType__ship_id'))
+        seats_by_ship = {ship_id: seats for ship_id, seats in ships}
+
+        occupancy = self.options['occupancy']
+        first_trip_seat = TripSeat.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        trip_seats = []
+        for trip_id, ship_id in trip_rows:
+            for seat_id, _ in seats_by_ship[ship_id]:
+                roll = self.rng.random()
+                if roll < occupancy * 0.85:
+                    state = 'ocupado'
+                elif roll < occupancy:
+                    state = 'reservado'
+                else:
+                    state = 'disponible'
+                trip_seats.append(TripSeat(trip_id=trip_id, seat_id=seat_id, state=state))
+        self.bulk(TripSeat, trip_seats)
+        trip_ids = [trip_id for trip_id, _ in trip_rows]
+        for offset in range(0, len(trip_ids), self.batch_size):
+            reconcile_availability(trip_ids[offset:offset + self.batch_size])
+
+        booked = TripSeat.objects.filter(id__gt=first_trip_seat).exclude(state='disponible').values_list('id', 'state')
+        first_booking = Booking.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        paid_ratio = self.options['paid_ratio']
+        self.bulk(Booking, [
+            Booking(
+                tripSeat_id=trip_seat_id,
+                user_id=self.rng.choice(user_ids),
+                paid=state == 'ocupado' and self.rng.random() < paid_ratio,
+            )
+            for trip_seat_id, state in booked.iterator(chunk_size=self.batch_size)
+        ] if user_ids else [])
+
+        paid = Booking.objects.filter(id__gt=first_booking, paid=True).values_list('id', flat=True)
+        payments = [
+            Payment(booking_id=booking_id, method_id=self.rng.choice(method_ids))
+            for booking_id in paid.iterator(chunk_size=self.batch_size)
+        ]
+        self.bulk(Payment, payments)
+
+        return {
+            'trips': len(trip_rows),
+            'trip_seats': len(trip_seats),
+            'bookings': Booking.objects.filter(id__gt=first_booking).count(),
+            'payments': len(payments),
+        }
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_revokedtoken'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='route',
+            name='duration',
+            field=models.DurationField(blank=True, null=True),
+        ),
+    ]
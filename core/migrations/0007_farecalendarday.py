@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_route_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FareCalendarDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('day', models.DateField()),
+                ('min_price', models.FloatField(null=True)),
+                ('available_seats', models.IntegerField(default=0)),
+                ('trips', models.IntegerField(default=0)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.route')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('route', 'day'), name='farecalendar_route_day_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_company_logo_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('basePrice', models.FloatField(default=0.0)),
+                ('departure_time', models.TimeField()),
+                ('weekdays', models.CharField(default='0123456', max_length=7)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('active', models.BooleanField(default=True)),
+                ('materialized_until', models.DateField(blank=True, editable=False, null=True)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.route')),
+                ('ship', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.ship')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='trip',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.tripschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='trip',
+            constraint=models.UniqueConstraint(fields=('schedule', 'dateDeparture'), name='trip_schedule_departure_uniq'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def seed_counters(apps, schema_editor):
+    Trip = apps.get_model('core', 'Trip')
+    TripSeat = apps.get_model('core', 'TripSeat')
+    SeatTypeAvailability = apps.get_model('core', 'SeatTypeAvailability')
+    available = TripSeat.objects.filter(state='disponible')
+    Trip.objects.update(available_seats=Coalesce(Subquery(
+        available.filter(trip_id=OuterRef('pk')).order_by().values('trip_id').annotate(n=Count('id')).values('n')
+    ), Value(0)))
+    rows = available.values('trip_id', 'seat__seatType_id').annotate(n=Count('id')).order_by()
+    batch = []
+    for row in rows.iterator(chunk_size=5000):
+        batch.append(SeatTypeAvailability(trip_id=row['trip_id'], seatType_id=row['seat__seatType_id'], available=row['n']))
+        if len(batch) >= 5000:
+            SeatTypeAvailability.objects.bulk_create(batch)
+            batch = []
+    SeatTypeAvailability.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_tripschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trip',
+            name='available_seats',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='SeatTypeAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('available', models.IntegerField(default=0)),
+                ('seatType', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.seattype')),
+                ('trip', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.trip')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('trip', 'seatType'), name='seattypeavailability_trip_type_uniq')],
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
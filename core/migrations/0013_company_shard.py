@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 15:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='company',
+            name='shard',
+            field=models.CharField(blank=True, default='', editable=False, max_length=50),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-19 16:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_user_created_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShipLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('capacity', models.IntegerField(default=0)),
+                ('seat_types', models.JSONField(default=list)),
+                ('ship', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='layout', to='core.ship')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
@@ -1,17 +1,108 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 
+class RoutedQuerySet(models.QuerySet):
+    """``create()`` without ``using()`` lets the database router place the row
+    from its own field values (``core.sharding``), not from the bare manager."""
+
+    def create(self, **kwargs):
+        if self._db is not None or self._hints:
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        self._for_write = True
+        obj.save(force_insert=True)
+        return obj
+
+
 class BaseModel(models.Model):
     created_at  = models.DateTimeField(auto_now_add=True)
     updated_at  = models.DateTimeField(auto_now=True)
 
+    objects = RoutedQuerySet.as_manager()
+
     class Meta:
         abstract = True # ✅ prevents Django from creating a BaseModel table
 
+
+class VersionConflict(Exception):
+    """A conditional save found the row at another version (``current``, ``None`` if deleted)."""
+
+    def __init__(self, current):
+        super().__init__(f"Row is at version {current}.")
+        self.current = current
+
+
+class VersionedModel(BaseModel):
+    """Rows whose ``version`` goes up by one on every save.
+
+    Setting ``expected_version`` before ``save()`` turns the write into
+    ``UPDATE ... WHERE version = expected_version`` and raises
+    ``VersionConflict`` when no row matched; the check is one-shot. Queryset
+    ``update()`` calls bypass it and leave the version alone.
+    """
+    version = models.PositiveIntegerField(default=1, editable=False)
+    expected_version = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields and 'version' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'version']
+        try:
+            if self.expected_version is None:
+                super().save(*args, **kwargs)
+            else:
+                # A savepoint, so a conflict doesn't doom the caller's transaction.
+                using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+                with transaction.atomic(using=using):
+                    super().save(*args, **kwargs)
+        finally:
+            self.expected_version = None
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        values = [
+            (field, model, F('version') + 1 if field.attname == 'version' else value)
+            for field, model, value in values
+        ]
+        filtered = base_qs.filter(pk=pk_val)
+        expected = self.expected_version
+        if expected is None:
+            if not filtered._update(values):
+                return False
+            # Not read back: after a concurrent unconditional save this is
+            # behind the stored version, so an If-Match built on it conflicts
+            # rather than overwriting.
+            self.version += 1
+            return True
+        if not filtered.filter(version=expected)._update(values):
+            raise VersionConflict(filtered.values_list('version', flat=True).first())
+        self.version = expected + 1
+        return True
+
 class Notification(BaseModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     topic = models.CharField(max_length=100)
     body = models.TextField(max_length=1000)
+    read = models.BooleanField(default=False)
+    # Set by ``notifications.fan_out``: a retried fan-out skips users it already notified.
+    fan_out_key = models.CharField(max_length=32, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'read', 'created_at'], name='notification_unread_idx'),
+            models.Index(fields=['user', 'created_at'], name='notification_user_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['fan_out_key', 'user'], name='notification_fan_out_user_uniq'),
+        ]
+
+class NotificationCounter(BaseModel):
+    """Per-user unread notification count, kept in step with ``Notification.read``."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True)
+    unread = models.IntegerField(default=0)
 
 class Company(BaseModel):
     email = models.EmailField(null = True)
@@ -19,7 +110,9 @@ class Company(BaseModel):
     address = models.CharField(max_length=100)
     phoneNumber = models.CharField(max_length=15)
     logo = models.ImageField(null=True, blank=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)  # filled by core.images
     description = models.TextField(max_length=1000)
+    shard = models.CharField(max_length=50, blank=True, default='', editable=False)  # set by core.sharding
 
     def __str__(self):
         return self.name 
@@ -52,15 +145,51 @@ class Route(BaseModel):
     company = models.ForeignKey(Company, on_delete=models.CASCADE)
     origin = models.CharField(max_length=100)
     destiny = models.CharField(max_length=100)
+    duration = models.DurationField(null=True, blank=True)  # sailing time, used by the journey planner
     
 
-class Trip(BaseModel):
+class TripSchedule(BaseModel):
+    """Recurring departure of a route; trips are generated from it by ``core.schedules``."""
+    route = models.ForeignKey(Route, on_delete=models.CASCADE)
+    ship = models.ForeignKey(Ship, on_delete=models.CASCADE)
+    basePrice = models.FloatField(default=0.0)
+    departure_time = models.TimeField()
+    weekdays = models.CharField(max_length=7, default='0123456')  # Monday=0 ... Sunday=6
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    active = models.BooleanField(default=True)
+    materialized_until = models.DateField(null=True, blank=True, editable=False)
+
+    def runs_on(self, day):
+        return (
+            self.active and str(day.weekday()) in self.weekdays
+            and self.start_date <= day and (self.end_date is None or day <= self.end_date)
+        )
+
+
+class Trip(VersionedModel):
     route = models.ForeignKey(Route, on_delete=models.CASCADE)
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
     basePrice = models.FloatField(default=0.0)
     dateDeparture = models.DateTimeField()
+    schedule = models.ForeignKey(TripSchedule, on_delete=models.SET_NULL, null=True, blank=True)
+    available_seats = models.IntegerField(default=0, editable=False)  # maintained by core.availability
 
-class TripSeat(BaseModel):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['schedule', 'dateDeparture'], name='trip_schedule_departure_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The counter moves with F() updates; never write back a stale copy.
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'available_seats'
+            ]
+        super().save(*args, **kwargs)
+
+class TripSeat(VersionedModel):
     trip = models.ForeignKey(Trip, on_delete=models.CASCADE)
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
 
@@ -72,13 +201,70 @@ class TripSeat(BaseModel):
 
     state = models.CharField(choices=STATE_CHOICES, max_length=10)
 
+    def save(self, *args, **kwargs):
+        # Lock the row and keep its stored state so the post_save handler
+        # (core.availability) moves the counters in this same transaction.
+        using = kwargs.get('using') or router.db_for_write(TripSeat, instance=self)
+        with transaction.atomic(using=using):
+            self._previous = None
+            if not self._state.adding:
+                self._previous = (
+                    TripSeat.objects.using(using).select_for_update().filter(pk=self.pk)
+                    .values_list('trip_id', 'seat_id', 'state').first()
+                )
+            super().save(*args, **kwargs)
+
+
+class SeatTypeAvailability(models.Model):
+    """Available seats of one seat type on one trip (``core.availability``)."""
+    objects = RoutedQuerySet.as_manager()
+
+    trip = models.ForeignKey(Trip, on_delete=models.CASCADE)
+    seatType = models.ForeignKey(SeatType, on_delete=models.CASCADE)
+    available = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['trip', 'seatType'], name='seattypeavailability_trip_type_uniq'),
+        ]
+
+
+class ShipLayout(BaseModel):
+    """Seat numbers per seat type and capacity of one ship (``core.layouts``).
+
+    ``seat_types`` is ``[{id, aditionalPrice, capacity, seats: [[seat_id, number], ...]}]``
+    ordered by seat type id, with seats by number.
+    """
+    ship = models.OneToOneField(Ship, on_delete=models.CASCADE, related_name='layout')
+    capacity = models.IntegerField(default=0)
+    seat_types = models.JSONField(default=list)
+
 
-class Booking(BaseModel):
+class FareCalendarDay(BaseModel):
+    """Cheapest available fare and seat count of a route on one day (``core.fares``)."""
+    route = models.ForeignKey(Route, on_delete=models.CASCADE)
+    day = models.DateField()
+    min_price = models.FloatField(null=True)
+    available_seats = models.IntegerField(default=0)
+    trips = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'day'], name='farecalendar_route_day_uniq'),
+        ]
+
+
+class Booking(VersionedModel):
     tripSeat = models.ForeignKey(TripSeat, on_delete=models.CASCADE)
     user = models.ForeignKey(User, on_delete=models.CASCADE)
 
     paid = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='booking_user_created_idx'),
+        ]
+
 class PaymentMethod(BaseModel):
     name = models.CharField(max_length=100)
     description = models.TextField(max_length=1000)
@@ -86,4 +272,105 @@ class PaymentMethod(BaseModel):
 class Payment(BaseModel):
     method = models.ForeignKey(PaymentMethod, on_delete=models.SET_NULL, null=True)
     booking = models.ForeignKey(Booking, on_delete=models.CASCADE)
+    # Set by ``reconcile_payments`` on every payment but the first of a booking.
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
+
+
+class ChangeLog(models.Model):
+    """Append-only log of catalog changes consumed by the delta-sync feed.
+
+    The primary key doubles as the feed's sequence number.
+    """
+    ACTION_CHOICES = [
+        ('created', 'Created'),
+        ('updated', 'Updated'),
+        ('deleted', 'Deleted'),
+    ]
+
+    model = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    action = models.CharField(choices=ACTION_CHOICES, max_length=10)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='changelog_object_idx'),
+        ]
+
+
+class Job(BaseModel):
+    """Unit of deferred work for the database-backed job queue (``core.jobs``)."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    queue = models.CharField(max_length=50, default='default')
+    task = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(choices=STATUS_CHOICES, max_length=10, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, null=True, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['queue', 'status', 'run_at'], name='job_claim_idx'),
+            models.Index(fields=['locked_by'], name='job_lock_idx'),
+        ]
+
+
+class JobQueue(models.Model):
+    """One row per job queue; ``jobs.claim`` locks it so claims on a queue
+    take turns and its concurrency limit holds."""
+    name = models.CharField(max_length=50, unique=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.name
+
+
+class Event(models.Model):
+    """Live event relayed between processes by ``events.DatabaseBackend``."""
+    channel = models.CharField(max_length=100)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class EventListener(models.Model):
+    """Process relaying events to its subscribers; ``events.DatabaseBackend``
+    only inserts ``Event`` rows while a recent one exists."""
+    name = models.CharField(max_length=255, unique=True)
+    seen_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RevokedToken(models.Model):
+    """JTI of a refresh token that must no longer be accepted (``core.revocation``)."""
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class IdempotencyKey(models.Model):
+    """Stored outcome of a create sent with an ``Idempotency-Key`` header (``core.idempotency``)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    scope = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.BinaryField(null=True)  # zlib-compressed JSON body
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotencykey_user_scope_key_uniq'),
+        ]
@@ -0,0 +1,130 @@
+# notifications.py
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import sharding
+from .events import publish_on_commit, user_channel
+from .jobs import enqueue, task
+from .models import Booking, Notification, NotificationCounter
+
+
+def batch_size():
+    return getattr(settings, 'NOTIFICATION_FANOUT_BATCH_SIZE', 1000)
+
+
+def bump_unread(user_ids, delta=1):
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(
+        unread=Greatest(F('unread') + delta, 0)
+    )
+
+
+def unread_count(user):
+    count = NotificationCounter.objects.filter(user=user).values_list('unread', flat=True).first()
+    return max(count or 0, 0)
+
+
+def recipients(trip_id=None, route_id=None, after=0, limit=None):
+    """Ascending ids above ``after`` of users booked on the trip or route.
+
+    The bookings are read from the shard the trip or route id names, or from
+    every shard when neither is given.
+    """
+    bookings = Booking.objects.filter(user_id__gt=after)
+    if trip_id is not None:
+        bookings = bookings.filter(tripSeat__trip_id=trip_id)
+    if route_id is not None:
+        bookings = bookings.filter(tripSeat__trip__route_id=route_id)
+    owner = trip_id if trip_id is not None else route_id
+    aliases = [sharding.shard_for_pk(owner)] if owner is not None else sharding.shard_aliases()
+    user_ids = set()
+    for alias in aliases:
+        if alias is not None:
+            user_ids.update(
+                bookings.using(alias).values_list('user_id', flat=True).distinct().order_by('user_id')[:limit]
+            )
+    return sorted(user_ids)[:limit]
+
+
+@task
+def fan_out(topic, body, trip_id=None, route_id=None, key=None):
+    """Notify every user holding a booking on the trip or route.
+
+    Recipients are paged by user id and each page is inserted with one
+    ``bulk_create`` and one counter update in its own transaction. The
+    notifications carry ``key`` (``schedule_fan_out`` draws one per call), so
+    a retry after a failed page skips the users earlier pages committed.
+    Returns the number of notifications created.
+    """
+    size = batch_size()
+    created = 0
+    last_user_id = 0
+    while True:
+        batch = recipients(trip_id=trip_id, route_id=route_id, after=last_user_id, limit=size)
+        if not batch:
+            break
+        with transaction.atomic():
+            if key is not None:
+                notified = set(
+                    Notification.objects.filter(fan_out_key=key, user_id__in=batch).values_list('user_id', flat=True)
+                )
+                pending = [user_id for user_id in batch if user_id not in notified]
+            else:
+                pending = batch
+            created_rows = Notification.objects.bulk_create(
+                [Notification(user_id=user_id, topic=topic, body=body, fan_out_key=key) for user_id in pending],
+                batch_size=size,
+            )
+            if key is not None:
+                # MySQL doesn't return the ids of bulk inserts; the key finds the rows.
+                created_rows = Notification.objects.filter(fan_out_key=key, user_id__in=pending)
+            bump_unread(pending)
+            for notification in created_rows:
+                publish_on_commit(user_channel(notification.user_id), {
+                    'type': 'notification',
+                    'id': notification.pk,
+                    'topic': topic,
+                    'body': body,
+                    'created_at': notification.created_at.isoformat(),
+                })
+        created += len(pending)
+        last_user_id = batch[-1]
+    return created
+
+
+def schedule_fan_out(topic, body, trip_id=None, route_id=None):
+    """Queue ``fan_out`` for a background worker."""
+    return enqueue(
+        fan_out,
+        kwargs={'topic': topic, 'body': body, 'trip_id': trip_id, 'route_id': route_id, 'key': uuid.uuid4().hex},
+        queue='notifications',
+    )
+
+
+def mark_read(user, ids=None):
+    """Mark the user's notifications (all, or only ``ids``) as read in batches."""
+    size = batch_size()
+    pending = Notification.objects.filter(user=user, read=False)
+    if ids is not None:
+        pending = pending.filter(id__in=ids)
+    updated = 0
+    while True:
+        batch = list(pending.order_by('id').values_list('id', flat=True)[:size])
+        if not batch:
+            break
+        with transaction.atomic():
+            count = Notification.objects.filter(id__in=batch, read=False).update(read=True)
+            if count:
+                bump_unread([user.pk], -count)
+        updated += count
+    return updated
@@ -0,0 +1,150 @@
+# pagination.py
+import hashlib
+import json
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+
+def count_cache_key(queryset):
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.sha1(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    return f'pagination-count:{digest}'
+
+
+def estimate_count(queryset):
+    """Row estimate from the query planner, or ``None`` when the backend
+    has none (SQLite) or the plan can't be read."""
+    queryset = queryset.order_by().select_related(None)
+    connection = connections[queryset.db]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'mysql':
+                if not queryset.query.where and not queryset.query.distinct:
+                    # Unfiltered listing: the table statistics are enough.
+                    cursor.execute(
+                        "SELECT TABLE_ROWS FROM information_schema.TABLES "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                        [queryset.model._meta.db_table],
+                    )
+                    row = cursor.fetchone()
+                    return int(row[0]) if row and row[0] is not None else None
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute('EXPLAIN ' + sql, params)
+                columns = [column[0] for column in cursor.description]
+                rows_at, filtered_at = columns.index('rows'), columns.index('filtered')
+                estimate = 1.0
+                for plan_row in cursor.fetchall():
+                    estimate *= (plan_row[rows_at] or 1) * float(plan_row[filtered_at] or 100) / 100
+                return int(estimate)
+            if connection.vendor == 'postgresql':
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                plan = cursor.fetchone()[0]
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                return int(plan[0]['Plan']['Plan Rows'])
+    except Exception:
+        return None
+    return None
+
+
+class ApproximatePage(Page):
+    """Page whose ``has_next`` comes from a one-row lookahead instead of the count."""
+
+    def __init__(self, object_list, number, paginator, has_more):
+        super().__init__(object_list, number, paginator)
+        self.has_more = has_more
+
+    def has_next(self):
+        return self.has_more
+
+
+class CachedCountPaginator(Paginator):
+    def __init__(self, *args, exact=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact = exact
+        self._approximate = False
+
+    @property
+    def count_is_approximate(self):
+        self.count
+        return self._approximate
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+
+        key = count_cache_key(self.object_list)
+        if not self.exact:
+            cached = cache.get(key)
+            if cached is not None:
+                count, self._approximate = cached
+                return count
+            threshold = getattr(settings, 'PAGINATION_APPROXIMATE_COUNT_THRESHOLD', 100000)
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate > threshold:
+                self._approximate = True
+                cache.set(key, (estimate, True), getattr(settings, 'PAGINATION_COUNT_CACHE_SECONDS', 30))
+                return estimate
+
+        count = self.object_list.count()
+        cache.set(key, (count, False), getattr(settings, 'PAGINATION_COUNT_CACHE_SECONDS', 30))
+        return count
+
+    def validate_number(self, number):
+        if not self.count_is_approximate:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+        # The estimate may be off either way, so page bounds come from the data.
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage('That page contains no results')
+        return ApproximatePage(rows[:self.per_page], number, self, len(rows) > self.per_page)
+
+
+class CachedCountPagination(PageNumberPagination):
+    """Page-number pagination whose total count is cached per filter (SQL)
+    for ``PAGINATION_COUNT_CACHE_SECONDS`` and, above
+    ``PAGINATION_APPROXIMATE_COUNT_THRESHOLD`` rows, taken from the query
+    planner's estimate. ``?exact_count=true`` forces an exact ``COUNT(*)``."""
+    exact_count_query_param = 'exact_count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        exact = request.query_params.get(self.exact_count_query_param, '').lower() in ('1', 'true', 'yes')
+        self.django_paginator_class = partial(CachedCountPaginator, exact=exact)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_approximate', self.page.paginator.count_is_approximate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
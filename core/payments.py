@@ -0,0 +1,49 @@
+# payments.py
+"""Keeping ``Booking.paid`` and duplicate payments consistent.
+
+A new ``Payment`` marks its booking paid (``core.signals``). The
+``reconcile_payments`` command repairs older data in booking-id batches:
+bookings with a payment are marked paid, and every payment of a booking but
+the first is flagged with ``duplicate_of``. Each batch is a handful of
+set-based statements, never a query per row.
+"""
+from django.db import router, transaction
+from django.db.models import Count, F, Min
+
+from .models import Booking, Payment
+
+
+def mark_paid(booking_ids):
+    """Mark ``booking_ids`` paid; returns how many bookings changed."""
+    return Booking.objects.filter(pk__in=booking_ids, paid=False).update(paid=True, version=F('version') + 1)
+
+
+def reconcile(first_id, last_id, fix=True):
+    """Reconcile bookings with ids in ``[first_id, last_id]``.
+
+    Returns ``(bookings marked paid, payments flagged as duplicates)``.
+    """
+    with transaction.atomic(using=router.db_for_write(Booking)):
+        # Materialized: MySQL can't update a table filtered by a subquery on itself.
+        unpaid = list(
+            Booking.objects.filter(pk__range=(first_id, last_id), paid=False, payment__isnull=False)
+            .distinct().values_list('id', flat=True)
+        )
+        firsts = dict(
+            Payment.objects.filter(booking_id__gte=first_id, booking_id__lte=last_id)
+            .values('booking_id').annotate(n=Count('id'), first=Min('id')).filter(n__gt=1)
+            .values_list('booking_id', 'first')
+        )
+        duplicates = [
+            Payment(pk=payment_id, duplicate_of_id=firsts[booking_id])
+            for payment_id, booking_id, duplicate_of_id in (
+                Payment.objects.filter(booking_id__in=firsts).exclude(pk__in=firsts.values())
+                .values_list('id', 'booking_id', 'duplicate_of_id')
+            )
+            if duplicate_of_id != firsts[booking_id]
+        ] if firsts else []
+        if not fix:
+            return len(unpaid), len(duplicates)
+        paid = mark_paid(unpaid)
+        Payment.objects.bulk_update(duplicates, ['duplicate_of'], batch_size=1000)
+        return paid, len(duplicates)
@@ -0,0 +1,126 @@
+# retention.py
+"""Deleting rows past their retention in small primary-key batches.
+
+Each entry of ``POLICIES`` selects the rows of one model that may go:
+
+``notifications``
+    Notifications older than ``RETENTION_DAYS['notifications']``.
+``trip_seats``
+    Trip seats of trips that departed more than ``RETENTION_DAYS['trip_seats']``
+    days ago: released seats and holds that never turned into a booking.
+``jobs``
+    Done and failed jobs last touched more than ``RETENTION_DAYS['jobs']`` days ago.
+``idempotency_keys``
+    Idempotency keys past their ``expires_at``.
+``events``
+    Live events relayed by ``events.DatabaseBackend``, kept for
+    ``RETENTION_DAYS['events']`` days.
+
+``prune`` walks a policy's rows in ascending primary-key order and deletes
+them ``batch_size`` at a time, one short transaction per batch, so MySQL
+never holds a long-running delete's locks. Rows that other rows reference
+with ``on_delete=CASCADE`` (a trip seat with a booking, say) are never
+selected, so a batch can't cascade into further tables. Deleted rows are
+gone, so a rerun resumes by itself; ``start_id`` skips ahead.
+
+A batch is one ``DELETE ... WHERE id IN (...)``: no model signals are sent,
+so pruning writes no change log entries, fare calendar marks or live events
+for rows that only expired. What the signals would have kept right is fixed
+per batch instead (``ON_DELETE``): the unread counters of deleted unread
+notifications, and the availability counters of deleted free trip seats.
+The change log and revoked tokens have their own commands
+(``compact_changelog``, ``prune_revoked_tokens``).
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+
+from . import availability, sharding
+from .models import Event, IdempotencyKey, Job, Notification, TripSeat
+from .notifications import bump_unread
+
+DEFAULT_DAYS = {'notifications': 90, 'trip_seats': 30, 'jobs': 14, 'events': 1}
+
+
+def cutoff(name):
+    days = {**DEFAULT_DAYS, **getattr(settings, 'RETENTION_DAYS', {})}[name]
+    return timezone.now() - timedelta(days=days)
+
+
+POLICIES = {
+    'notifications': lambda: Notification.objects.filter(created_at__lt=cutoff('notifications')),
+    'trip_seats': lambda: TripSeat.objects.filter(trip__dateDeparture__lt=cutoff('trip_seats')),
+    'jobs': lambda: Job.objects.filter(status__in=['done', 'failed'], updated_at__lt=cutoff('jobs')),
+    'idempotency_keys': lambda: IdempotencyKey.objects.filter(expires_at__lte=timezone.now()),
+    'events': lambda: Event.objects.filter(created_at__lt=cutoff('events')),
+}
+
+
+def _notifications_deleted(batch):
+    by_count = {}
+    for user_id, count in Counter(batch.filter(read=False).values_list('user_id', flat=True)).items():
+        by_count.setdefault(count, []).append(user_id)
+    for count, user_ids in by_count.items():
+        bump_unread(user_ids, -count)
+
+
+def _trip_seats_deleted(batch):
+    availability.seats_deleted(batch.values_list('trip_id', 'seat_id', 'state'))
+
+
+# Run on a batch's locked rows right before they are deleted.
+ON_DELETE = {
+    'notifications': _notifications_deleted,
+    'trip_seats': _trip_seats_deleted,
+}
+
+
+def without_dependents(queryset):
+    """``queryset`` minus the rows that deleting would cascade from."""
+    for relation in queryset.model._meta.related_objects:
+        if relation.on_delete is models.CASCADE:
+            queryset = queryset.filter(**{f'{relation.name}__isnull': True})
+    return queryset
+
+
+def _delete(name, ids):
+    rows = POLICIES[name]
+    model = rows().model
+    with transaction.atomic(using=router.db_for_write(model)):
+        # Filtered again: a row may have gained a dependent since.
+        ids = list(
+            without_dependents(rows()).filter(pk__in=ids)
+            .select_for_update(of=('self',)).values_list('pk', flat=True)
+        )
+        batch = model._base_manager.filter(pk__in=ids)
+        if name in ON_DELETE:
+            ON_DELETE[name](batch)
+        return batch._raw_delete(batch.db)
+
+
+def prune(name, batch_size=1000, start_id=0, dry_run=False):
+    """Delete the rows of policy ``name`` in primary-key batches.
+
+    Yields ``(alias, last id, rows deleted)`` after each batch; with
+    ``dry_run`` the rows are only counted. Each batch runs with its shard
+    pinned, and the pin is released before yielding.
+    """
+    rows = POLICIES[name]
+    model = rows().model
+    aliases = sharding.shard_aliases() if sharding.is_sharded(model) else [router.db_for_write(model)]
+    for alias in aliases:
+        last_id = start_id
+        while True:
+            with sharding.pinned(alias):
+                ids = list(
+                    without_dependents(rows()).filter(pk__gt=last_id)
+                    .order_by('pk').values_list('pk', flat=True)[:batch_size]
+                )
+                deleted = len(ids) if dry_run or not ids else _delete(name, ids)
+            if not ids:
+                break
+            last_id = ids[-1]
+            yield alias, last_id, deleted
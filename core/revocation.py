@@ -0,0 +1,157 @@
+# revocation.py
+"""Refresh-token revocation without a database hit on every refresh.
+
+Revoked JTIs live in ``RevokedToken`` until their token would have expired
+anyway. Each process keeps a Bloom filter of them: a miss ("definitely not
+revoked", the common case) answers without touching the database, a hit is
+confirmed with one indexed lookup. The filter picks up rows revoked by other
+processes every ``REVOCATION_SYNC_SECONDS`` and is rebuilt from scratch,
+dropping expired JTIs, every ``REVOCATION_REBUILD_SECONDS``. Auto-increment
+ids can become visible out of order, so each sync re-reads the last
+``REVOCATION_SYNC_OVERLAP`` ids as well.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = max(capacity, 1024)
+        self.size = int(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(int(round(self.size / self.capacity * math.log(2))), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _overlap():
+    return getattr(settings, 'REVOCATION_SYNC_OVERLAP', 1000)
+
+
+class RevocationIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self.seen = set()
+        self.next_sync = 0.0
+        self.next_rebuild = 0.0
+
+    def rebuild(self):
+        live = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        last_id = RevokedToken.objects.aggregate(last=Max('id'))['last'] or 0
+        bloom = BloomFilter(live.count() * 2)
+        overlap_from = last_id - _overlap()
+        seen = set()
+        for row_id, jti in live.filter(id__lte=last_id).values_list('id', 'jti').iterator(chunk_size=5000):
+            bloom.add(jti)
+            if row_id > overlap_from:
+                seen.add(row_id)
+        now = time.monotonic()
+        self.bloom, self.last_id, self.seen = bloom, last_id, seen
+        self.next_sync = now + getattr(settings, 'REVOCATION_SYNC_SECONDS', 5)
+        self.next_rebuild = now + getattr(settings, 'REVOCATION_REBUILD_SECONDS', 3600)
+
+    def sync(self):
+        # Rows below last_id that committed late are in the overlap; seen
+        # ones are skipped so they don't count twice towards the capacity.
+        rows = RevokedToken.objects.filter(id__gt=self.last_id - _overlap()).values_list('id', 'jti')
+        for row_id, jti in rows:
+            if row_id not in self.seen:
+                self.seen.add(row_id)
+                self.bloom.add(jti)
+                self.last_id = max(self.last_id, row_id)
+        overlap_from = self.last_id - _overlap()
+        self.seen = {row_id for row_id in self.seen if row_id > overlap_from}
+        self.next_sync = time.monotonic() + getattr(settings, 'REVOCATION_SYNC_SECONDS', 5)
+
+    def might_contain(self, jti):
+        now = time.monotonic()
+        if now >= self.next_sync:
+            with self._lock:
+                if self.bloom is None or now >= self.next_rebuild or self.bloom.count > self.bloom.capacity:
+                    self.rebuild()
+                elif now >= self.next_sync:
+                    self.sync()
+        return jti in self.bloom
+
+    def add(self, jti):
+        if self.bloom is not None:
+            self.bloom.add(jti)
+
+    def reset(self):
+        with self._lock:
+            self.bloom = None
+            self.next_sync = 0.0
+
+
+index = RevocationIndex()
+
+
+def revoke(payload):
+    """Revoke the refresh token with this payload until it expires."""
+    jti = payload[api_settings.JTI_CLAIM]
+    RevokedToken.objects.bulk_create(
+        [RevokedToken(jti=jti, expires_at=datetime.fromtimestamp(payload['exp'], tz=dt_timezone.utc))],
+        ignore_conflicts=True,
+    )
+    index.add(jti)
+
+
+def is_revoked(jti):
+    mode = getattr(settings, 'REVOCATION_CHECK', 'filter')
+    if mode == 'off':
+        return False
+    if mode == 'filter' and not index.might_contain(jti):
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+class RevocableRefreshToken(RefreshToken):
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        if is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        revoke(self.payload)
+
+
+def prune(batch_size=1000):
+    """Delete revoked JTIs whose tokens have expired, in primary-key batches."""
+    deleted = 0
+    now = timezone.now()
+    while True:
+        ids = list(
+            RevokedToken.objects.filter(expires_at__lte=now)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += RevokedToken.objects.filter(id__in=ids).delete()[0]
@@ -0,0 +1,145 @@
+# schedules.py
+"""Trips generated from recurring ``TripSchedule`` rows.
+
+Only departures inside a rolling window of ``SCHEDULE_WINDOW_DAYS`` are
+stored as ``Trip``/``TripSeat`` rows (``materialize_due``, run by the
+``materialize_schedules`` command); a later date is materialized on first
+access with ``materialize_day``. Until then ``scheduled_departures``
+answers searches for it from the schedules alone.
+
+Rows are written with ``bulk_create``, so the change log, availability
+counters, fare calendar and list caches are updated here instead of by
+model signals.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from . import availability, fares, layouts
+from .changefeed import record_changes
+from .coalescing import get_coalescer
+from .models import Trip, TripSchedule, TripSeat
+
+
+def departure_at(schedule, day):
+    return timezone.make_aware(datetime.combine(day, schedule.departure_time))
+
+
+def _days(start, end):
+    day = start
+    while day <= end:
+        yield day
+        day += timedelta(days=1)
+
+
+def _materialize(schedule, days):
+    """Create the trips (with seats) of ``schedule`` on ``days``; existing ones are kept."""
+    departures = [departure_at(schedule, day) for day in days if schedule.runs_on(day)]
+    if not departures:
+        return []
+    layout = layouts.get(schedule.ship_id)
+    seats = sorted(seat_id for seat_type in layout[1] for seat_id, _ in seat_type['seats']) if layout else []
+    if not seats:
+        return []
+    Trip.objects.bulk_create(
+        [
+            Trip(route_id=schedule.route_id, seat_id=seats[0], basePrice=schedule.basePrice,
+                 dateDeparture=departure, schedule=schedule)
+            for departure in departures
+        ],
+        ignore_conflicts=True,
+    )
+    # bulk_create does not return ids on MySQL; new trips are the ones without seats.
+    new_trips = list(
+        Trip.objects.filter(schedule=schedule, dateDeparture__in=departures, tripseat__isnull=True)
+        .values_list('id', flat=True)
+    )
+    if not new_trips:
+        return []
+    TripSeat.objects.bulk_create(
+        [TripSeat(trip_id=trip_id, seat_id=seat_id, state='disponible') for trip_id in new_trips for seat_id in seats],
+        batch_size=5000,
+    )
+    trip_seats = TripSeat.objects.filter(trip_id__in=new_trips).values_list('id', flat=True)
+    availability.reconcile(new_trips)
+    record_changes(Trip, new_trips, 'created')
+    record_changes(TripSeat, list(trip_seats), 'created')
+    fares.refresh(cells={(schedule.route_id, fares.departure_day(departure)) for departure in departures})
+    get_coalescer().clear()
+    return new_trips
+
+
+def materialize_range(schedule_id, start, end):
+    with transaction.atomic(using=router.db_for_write(TripSchedule)):
+        # Serializes concurrent materializations of one schedule.
+        schedule = TripSchedule.objects.select_for_update().get(pk=schedule_id)
+        return _materialize(schedule, list(_days(start, end)))
+
+
+def materialize_day(schedule, day):
+    """Materialize one departure on first access; returns the trip or ``None``."""
+    if not schedule.runs_on(day):
+        return None
+    materialize_range(schedule.pk, day, day)
+    return Trip.objects.filter(schedule=schedule, dateDeparture=departure_at(schedule, day)).first()
+
+
+def materialize_due(window_days=None, schedules=None):
+    """Extend every active schedule's trips up to today + ``window_days``."""
+    window_days = window_days if window_days is not None else getattr(settings, 'SCHEDULE_WINDOW_DAYS', 14)
+    today = timezone.localdate()
+    until = today + timedelta(days=window_days)
+    schedules = schedules if schedules is not None else TripSchedule.objects.filter(active=True)
+    created = 0
+    for schedule in schedules.only('id', 'start_date', 'materialized_until'):
+        start = max(today, schedule.start_date)
+        if schedule.materialized_until is not None:
+            start = max(start, schedule.materialized_until + timedelta(days=1))
+        if start > until:
+            continue
+        with transaction.atomic(using=router.db_for_write(TripSchedule)):
+            locked = TripSchedule.objects.select_for_update().get(pk=schedule.pk)
+            created += len(_materialize(locked, list(_days(start, until))))
+            TripSchedule.objects.filter(pk=schedule.pk).update(materialized_until=until)
+    return created
+
+
+def scheduled_departures(schedules, day):
+    """Departures of ``schedules`` on ``day`` that have no ``Trip`` row yet.
+
+    Nothing is written: seats are reported as the ship's full capacity and
+    the cheapest fare from its seat types, both read from its layout.
+    """
+    candidates = [schedule for schedule in schedules if schedule.runs_on(day)]
+    if not candidates:
+        return []
+    existing = set(
+        Trip.objects.filter(
+            schedule__in=candidates,
+            dateDeparture__in=[departure_at(schedule, day) for schedule in candidates],
+        ).values_list('schedule_id', flat=True)
+    )
+    ship_ids = {schedule.ship_id for schedule in candidates}
+    ship_layouts = layouts.get_many(ship_ids)
+    capacity = {ship_id: layout[0] for ship_id, layout in ship_layouts.items()}
+    surcharge = {
+        ship_id: min((seat_type['aditionalPrice'] for seat_type in seat_types), default=None)
+        for ship_id, (_, seat_types) in ship_layouts.items()
+    }
+    return [
+        {
+            'trip_id': None,
+            'schedule_id': schedule.id,
+            'route_id': schedule.route_id,
+            'ship_id': schedule.ship_id,
+            'dateDeparture': departure_at(schedule, day),
+            'basePrice': schedule.basePrice,
+            'min_price': schedule.basePrice + (surcharge.get(schedule.ship_id) or 0.0),
+            'available_seats': capacity.get(schedule.ship_id, 0),
+            'materialized': False,
+        }
+        for schedule in candidates
+        if schedule.id not in existing and capacity.get(schedule.ship_id)
+    ]
@@ -1,10 +1,15 @@
 # serializers.py
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenBlacklistSerializer, TokenRefreshSerializer
 from .models import (
     Notification, Company, Rol, UserCompany, Ship, SeatType, 
-    Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment
+    Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment, TripSchedule
 )
+from . import images
+from .batch import batch_cost
+from .revocation import RevocableRefreshToken
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, style={'input_type': 'password'})
@@ -24,6 +29,14 @@ class RegisterSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
+
+class RevocableTokenBlacklistSerializer(TokenBlacklistSerializer):
+    token_class = RevocableRefreshToken
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -37,19 +50,49 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Notification
-        fields = ['id', 'user', 'user_id', 'topic', 'body', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'user_id', 'topic', 'body', 'read', 'created_at', 'updated_at']
+        # ``read`` only changes through the mark-read action so the unread counter stays exact
+        read_only_fields = ['id', 'read', 'created_at', 'updated_at']
+
+
+class NotificationFanOutSerializer(serializers.Serializer):
+    topic = serializers.CharField(max_length=100)
+    body = serializers.CharField(max_length=1000)
+    trip_id = serializers.IntegerField(required=False)
+    route_id = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        if ('trip_id' in data) == ('route_id' in data):
+            raise serializers.ValidationError("Provide exactly one of trip_id or route_id.")
+        return data
+
+
+class NotificationMarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, max_length=10000)
 
 
 class CompanySerializer(serializers.ModelSerializer):
+    logo_variants = serializers.SerializerMethodField(
+        help_text="Resized logo URLs by size and format, e.g. {\"64\": {\"webp\": ..., \"jpeg\": ...}}; "
+                  "empty until the upload has been processed."
+    )
+
     class Meta:
         model = Company
         fields = [
             'id', 'email', 'name', 'address', 'phoneNumber', 
-            'logo', 'description', 'created_at', 'updated_at'
+            'logo', 'logo_variants', 'description', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    def get_logo_variants(self, obj):
+        return images.variant_urls(obj, self.context.get('request'))
+
+    def validate_logo(self, value):
+        if value:
+            images.validate_logo(value)
+        return value
+
     def validate_phoneNumber(self, value):
         if len(value) > 15:
             raise serializers.ValidationError("Phone number cannot exceed 15 characters.")
@@ -144,7 +187,7 @@ class RouteSerializer(serializers.ModelSerializer):
         model = Route
         fields = [
             'id', 'company', 'company_id', 'origin', 
-            'destiny', 'created_at', 'updated_at'
+            'destiny', 'duration', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
@@ -164,9 +207,9 @@ class TripSerializer(serializers.ModelSerializer):
         model = Trip
         fields = [
             'id', 'route', 'route_id', 'seat', 'seat_id', 
-            'basePrice', 'dateDeparture', 'created_at', 'updated_at'
+            'basePrice', 'dateDeparture', 'available_seats', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'available_seats', 'version', 'created_at', 'updated_at']
 
     def validate_basePrice(self, value):
         if value < 0:
@@ -174,6 +217,65 @@ class TripSerializer(serializers.ModelSerializer):
         return value
 
 
+class JourneySearchSerializer(serializers.Serializer):
+    origin = serializers.CharField(max_length=100)
+    destiny = serializers.CharField(max_length=100)
+    depart_after = serializers.DateTimeField(required=False)
+    max_legs = serializers.IntegerField(required=False, default=3, min_value=1, max_value=4)
+    min_transfer = serializers.IntegerField(
+        required=False, min_value=0, max_value=24 * 60, help_text="Minimum minutes between legs."
+    )
+    sort = serializers.ChoiceField(choices=['earliest', 'cheapest'], required=False, default='earliest')
+    limit = serializers.IntegerField(required=False, default=5, min_value=1, max_value=20)
+
+    def validate(self, data):
+        if data['origin'].strip().lower() == data['destiny'].strip().lower():
+            raise serializers.ValidationError("Origin and destiny cannot be the same.")
+        return data
+
+
+class FareCalendarQuerySerializer(serializers.Serializer):
+    month = serializers.DateField(
+        required=False, input_formats=['%Y-%m'], help_text="Month as YYYY-MM; defaults to the current month."
+    )
+
+
+class ItineraryQuerySerializer(serializers.Serializer):
+    when = serializers.ChoiceField(choices=['upcoming', 'past'], required=False, default='upcoming')
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+    offset = serializers.IntegerField(required=False, default=0, min_value=0)
+
+
+class BatchItemSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False, max_length=100)
+    method = serializers.ChoiceField(choices=['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.CharField(max_length=2000, help_text="Full path, e.g. /api/bookings/5/?paid=true")
+    body = serializers.JSONField(required=False)
+    headers = serializers.DictField(
+        child=serializers.CharField(max_length=200), required=False,
+        help_text="Per-item request headers; only If-Match and Idempotency-Key are forwarded.",
+    )
+
+    def to_internal_value(self, data):
+        if isinstance(data, dict) and isinstance(data.get('method'), str):
+            data = {**data, 'method': data['method'].upper()}
+        return super().to_internal_value(data)
+
+
+class BatchRequestSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+
+    def validate_requests(self, value):
+        max_requests = getattr(settings, 'BATCH_MAX_REQUESTS', 50)
+        if len(value) > max_requests:
+            raise serializers.ValidationError(f"A batch can contain at most {max_requests} requests.")
+        max_cost = getattr(settings, 'BATCH_MAX_COST', 100)
+        cost = batch_cost(value)
+        if cost > max_cost:
+            raise serializers.ValidationError(f"Batch cost {cost} exceeds the limit of {max_cost}.")
+        return value
+
+
 class TripSeatSerializer(serializers.ModelSerializer):
     trip = TripSerializer(read_only=True)
     trip_id = serializers.IntegerField(write_only=True)
@@ -184,24 +286,28 @@ class TripSeatSerializer(serializers.ModelSerializer):
         model = TripSeat
         fields = [
             'id', 'trip', 'trip_id', 'seat', 'seat_id', 
-            'state', 'created_at', 'updated_at'
+            'state', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
 
 
 class BookingSerializer(serializers.ModelSerializer):
     tripSeat = TripSeatSerializer(read_only=True)
     tripSeat_id = serializers.IntegerField(write_only=True)
     user = UserSerializer(read_only=True)
-    user_id = serializers.IntegerField(write_only=True)
+    user_id = serializers.IntegerField(write_only=True, required=False, help_text="Defaults to the requesting user.")
 
     class Meta:
         model = Booking
         fields = [
             'id', 'tripSeat', 'tripSeat_id', 'user', 'user_id', 
-            'paid', 'created_at', 'updated_at'
+            'paid', 'version', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'version', 'created_at', 'updated_at']
+
+    def create(self, validated_data):
+        validated_data.setdefault('user_id', self.context['request'].user.pk)
+        return super().create(validated_data)
 
 
 class PaymentMethodSerializer(serializers.ModelSerializer):
@@ -221,9 +327,9 @@ class PaymentSerializer(serializers.ModelSerializer):
         model = Payment
         fields = [
             'id', 'method', 'method_id', 'booking', 'booking_id', 
-            'created_at', 'updated_at'
+            'duplicate_of', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'duplicate_of', 'created_at', 'updated_at']
 
 
 # Lightweight serializers for listing views
@@ -258,4 +364,74 @@ class TripListSerializer(serializers.ModelSerializer):
         fields = ['id', 'route_info', 'seat_number', 'basePrice', 'dateDeparture']
 
     def get_route_info(self, obj):
-        return f"{obj.route.origin} → {obj.route.destiny}"
\ No newline at end of file
+        return f"{obj.route.origin} → {obj.route.destiny}"
+
+# Flat serializers for the trip overview: related objects are referenced by id.
+class TripOverviewTripSerializer(serializers.ModelSerializer):
+    route_id = serializers.IntegerField(read_only=True)
+    seat_id = serializers.IntegerField(read_only=True)
+    ship_id = serializers.IntegerField(source='seat.seatType.ship_id', read_only=True)
+
+    class Meta:
+        model = Trip
+        fields = ['id', 'route_id', 'seat_id', 'ship_id', 'basePrice', 'dateDeparture', 'created_at', 'updated_at']
+
+
+class TripOverviewRouteSerializer(serializers.ModelSerializer):
+    company_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Route
+        fields = ['id', 'company_id', 'origin', 'destiny', 'duration']
+
+
+class TripOverviewShipSerializer(serializers.ModelSerializer):
+    company_id = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Ship
+        fields = ['id', 'company_id', 'name', 'construction_year']
+
+
+class TripScheduleSerializer(serializers.ModelSerializer):
+    route_id = serializers.IntegerField()
+    ship_id = serializers.IntegerField()
+
+    class Meta:
+        model = TripSchedule
+        fields = [
+            'id', 'route_id', 'ship_id', 'basePrice', 'departure_time', 'weekdays',
+            'start_date', 'end_date', 'active', 'materialized_until', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['id', 'materialized_until', 'created_at', 'updated_at']
+
+    def validate_weekdays(self, value):
+        if not value or any(day not in '0123456' for day in value) or len(set(value)) != len(value):
+            raise serializers.ValidationError("Use distinct digits 0 (Monday) to 6 (Sunday), e.g. '135'.")
+        return ''.join(sorted(value))
+
+    def validate_basePrice(self, value):
+        if value < 0:
+            raise serializers.ValidationError("Base price cannot be negative.")
+        return value
+
+    def validate(self, data):
+        route_id = data.get('route_id', getattr(self.instance, 'route_id', None))
+        ship_id = data.get('ship_id', getattr(self.instance, 'ship_id', None))
+        route = Route.objects.filter(pk=route_id).values_list('company_id', flat=True).first()
+        ship = Ship.objects.filter(pk=ship_id).values_list('company_id', flat=True).first()
+        if route is None:
+            raise serializers.ValidationError({"route_id": "Route not found."})
+        if ship is None:
+            raise serializers.ValidationError({"ship_id": "Ship not found."})
+        if route != ship:
+            raise serializers.ValidationError("The ship must belong to the route's company.")
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = data.get('end_date', getattr(self.instance, 'end_date', None))
+        if end_date is not None and start_date is not None and end_date < start_date:
+            raise serializers.ValidationError("End date cannot be before start date.")
+        return data
+
+
+class ScheduleDepartureSerializer(serializers.Serializer):
+    date = serializers.DateField()
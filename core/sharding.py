@@ -0,0 +1,404 @@
+# sharding.py
+"""Company sharding of the operational tables.
+
+``SHARD_DATABASES`` lists the database aliases that hold operational data.
+Each new ``Company`` is assigned the one with the fewest companies
+(``Company.shard``). Its ships (with their layouts), seat types, seats,
+routes, schedules, trips, trip seats, bookings and payments live on that
+shard. ``default`` stays the directory for users, companies, roles,
+memberships, notifications, jobs and the change log. Users, companies and
+payment methods are also copied to every shard, so joins and foreign keys to
+them work locally.
+
+Every shard allocates primary keys from its own block of ``SHARD_ID_BLOCK``
+ids (``init_shards`` sets the sequences), so an id alone names its shard and
+the order of ``SHARD_DATABASES`` must never change.
+
+``ShardRouter`` routes a row through the instance being saved or read
+through. Other queries go to the shard pinned for the current request
+(``pinned``). ``ShardedViewSetMixin`` pins it from the URL id, the payload's
+parent id or the operator's company. Listings that span shards, such as a
+customer's bookings or staff views, use ``ScatterQuerySet``: the query runs
+on every shard in parallel and the results are merged in order.
+
+Rows written to the directory on behalf of a shard write are not part of
+the shard's transaction. Jobs are enqueued once it commits (``using`` of
+``jobs.enqueue``); change log entries are written right away and may outlive
+a rolled back write (``changefeed.record_change``).
+
+With one entry in ``SHARD_DATABASES`` (the default) nothing is routed.
+"""
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import F, Model
+from django.db.models.expressions import OrderBy
+
+from .bulk import upsert
+from .models import Company
+from .tenancy import company_scope
+
+DIRECTORY = 'default'
+# Sharded model -> the field whose value decides a new row's shard.
+SHARD_KEYS = {
+    'ship': 'company_id',
+    'route': 'company_id',
+    'seattype': 'ship_id',
+    'seat': 'seatType_id',
+    'shiplayout': 'ship_id',
+    'tripschedule': 'route_id',
+    'trip': 'route_id',
+    'tripseat': 'trip_id',
+    'seattypeavailability': 'trip_id',
+    'farecalendarday': 'route_id',
+    'booking': 'tripSeat_id',
+    'payment': 'booking_id',
+}
+REFERENCE_MODELS = {('auth', 'user'), ('core', 'company'), ('core', 'paymentmethod')}
+REFERENCE_APPS = ('auth', 'contenttypes')
+
+_pinned = ContextVar('shard', default=None)
+_company_shards = {}
+
+
+def shard_aliases():
+    return list(getattr(settings, 'SHARD_DATABASES', [DIRECTORY]))
+
+
+def enabled():
+    return len(shard_aliases()) > 1
+
+
+def is_sharded(model):
+    return model._meta.app_label == 'core' and model._meta.model_name in SHARD_KEYS
+
+
+def id_block():
+    return getattr(settings, 'SHARD_ID_BLOCK', 10 ** 12)
+
+
+def sharded_models():
+    return [model for model in apps.get_app_config('core').get_models() if is_sharded(model)]
+
+
+def shard_for_pk(pk):
+    try:
+        index = int(pk) // id_block()
+    except (TypeError, ValueError):
+        return None
+    aliases = shard_aliases()
+    return aliases[index] if 0 <= index < len(aliases) else None
+
+
+def shard_for_company(company_id):
+    try:
+        company_id = int(company_id)
+    except (TypeError, ValueError):
+        return None
+    shard = _company_shards.get(company_id)
+    if shard is None:
+        # A company never changes shard, so the lookup is cached for good.
+        shard = Company.objects.using(DIRECTORY).filter(pk=company_id).values_list('shard', flat=True).first()
+        if shard is None:
+            return None
+        shard = _company_shards[company_id] = shard or DIRECTORY
+    return shard
+
+
+def shard_for_values(model, values):
+    """Shard of a new ``model`` row, from a payload dict or an unsaved instance."""
+    key = SHARD_KEYS[model._meta.model_name]
+    value = values.get(key) if isinstance(values, dict) else getattr(values, key, None)
+    if key == 'company_id':
+        return shard_for_company(value)
+    return shard_for_pk(value)
+
+
+def assign_many(companies):
+    """Give each new company the shard with the fewest companies so far.
+
+    Bulk inserts skip the ``pre_save`` signal that calls ``assign``, so they
+    call this on the whole batch first.
+    """
+    if not enabled():
+        return
+    counts = dict.fromkeys(shard_aliases(), 0)
+    for shard in Company.objects.using(DIRECTORY).values_list('shard', flat=True):
+        shard = shard or DIRECTORY
+        if shard in counts:
+            counts[shard] += 1
+    for company in companies:
+        if not company.shard:
+            company.shard = min(counts, key=counts.get)
+            counts[company.shard] += 1
+
+
+def assign(company):
+    """Give a new company the shard with the fewest companies."""
+    if not company.shard:
+        assign_many([company])
+
+
+def current():
+    return _pinned.get()
+
+
+@contextmanager
+def pinned(alias):
+    token = _pinned.set(alias)
+    try:
+        yield alias
+    finally:
+        _pinned.reset(token)
+
+
+def each_shard():
+    """Yield every shard alias with it pinned, for jobs that walk all data."""
+    for alias in shard_aliases():
+        with pinned(alias):
+            yield alias
+
+
+def reserve_ids(alias):
+    """Start the sharded tables' id sequences on ``alias`` at its id block; returns the start."""
+    start = shard_aliases().index(alias) * id_block()
+    connection = connections[alias]
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table = model._meta.db_table
+            if connection.vendor == 'mysql':
+                # MySQL keeps the larger of this and MAX(id) + 1.
+                cursor.execute(f'ALTER TABLE {connection.ops.quote_name(table)} AUTO_INCREMENT = {start + 1}')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s AND seq < %s', [table, start])
+                cursor.execute(
+                    'INSERT INTO sqlite_sequence (name, seq) SELECT %s, %s '
+                    'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = %s)',
+                    [table, start, table],
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    f'SELECT setval(pg_get_serial_sequence(%s, %s), '
+                    f'GREATEST(%s, (SELECT MAX(id) FROM {connection.ops.quote_name(table)})))',
+                    [table, model._meta.pk.column, start],
+                )
+            else:
+                raise ImproperlyConfigured(f"Can't set id sequences on {connection.vendor}.")
+    return start
+
+
+def replicate_many(instances, alias):
+    """Upsert reference rows from the directory into ``alias``."""
+    model = type(instances[0])
+    fields = model._meta.concrete_fields
+    copies = [model(**{field.attname: getattr(instance, field.attname) for field in fields}) for instance in instances]
+    upsert(model, copies, unique_fields=[model._meta.pk.name],
+           update_fields=[field.name for field in fields if not field.primary_key], using=alias)
+
+
+def replicate(instance):
+    """Copy a reference row from the directory to the other shards."""
+    for alias in shard_aliases():
+        if alias != DIRECTORY:
+            replicate_many([instance], alias)
+
+
+def unreplicate(instance):
+    for alias in shard_aliases():
+        if alias != DIRECTORY:
+            type(instance).objects.using(alias).filter(pk=instance.pk).delete()
+
+
+class ShardRouter:
+    def _route(self, model, hints):
+        if not enabled():
+            return None
+        if not is_sharded(model):
+            return DIRECTORY
+        instance = hints.get('instance')
+        if instance is not None:
+            if is_sharded(type(instance)):
+                return instance._state.db or shard_for_values(type(instance), instance) or current()
+            if isinstance(instance, Company):
+                return shard_for_company(instance.pk) or current()
+        return current()
+
+    def db_for_read(self, model, **hints):
+        return self._route(model, hints)
+
+    def db_for_write(self, model, **hints):
+        return self._route(model, hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if not enabled():
+            return None
+        if is_sharded(type(obj1)) and is_sharded(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if not enabled():
+            return None
+        if db == DIRECTORY:
+            return True
+        if db not in shard_aliases():
+            return False
+        if app_label in REFERENCE_APPS:
+            return True
+        if (app_label, model_name) in REFERENCE_MODELS:
+            return True
+        return app_label == 'core' and model_name in SHARD_KEYS
+
+
+def scatter(func, aliases=None):
+    """``[func(alias) for alias in aliases]``, run in parallel when that is safe."""
+    aliases = aliases or shard_aliases()
+    # Other connections can't see an open transaction's uncommitted rows.
+    if len(aliases) == 1 or any(connections[alias].in_atomic_block for alias in aliases):
+        return [func(alias) for alias in aliases]
+
+    def run(alias):
+        try:
+            return func(alias)
+        finally:
+            connections.close_all()
+
+    workers = min(len(aliases), getattr(settings, 'SHARD_SCATTER_WORKERS', 8))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run, aliases))
+
+
+class _Descending:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def order_key(queryset):
+    """Python sort key matching ``queryset``'s ORDER BY, for merging shard results
+    (model instances or ``values()`` dicts)."""
+    terms = []
+    for term in queryset.query.order_by or queryset.model._meta.ordering or ['pk']:
+        if isinstance(term, OrderBy) and isinstance(term.expression, F):
+            path, descending = term.expression.name, term.descending
+        elif isinstance(term, str) and term != '?':
+            path, descending = term.lstrip('-+'), term.startswith('-')
+        else:
+            continue
+        if path == 'pk':
+            path = queryset.model._meta.pk.name
+        terms.append((path.split('__'), descending))
+
+    def key(obj):
+        values = []
+        for path, descending in terms:
+            if isinstance(obj, dict):
+                # values() rows are keyed by the whole lookup path.
+                value = obj.get('__'.join(path))
+            else:
+                value = obj
+                for name in path:
+                    value = getattr(value, name, None) if value is not None else None
+            if isinstance(value, Model):
+                value = value.pk
+            # NULLs sort first, as on MySQL and SQLite.
+            value = (value is not None, value)
+            values.append(_Descending(value) if descending else value)
+        return values
+    return key
+
+
+class ScatterQuerySet:
+    """Read-only, sliceable view of ``queryset`` over every shard, merged in its order.
+
+    A slice ``[start:stop]`` fetches at most ``stop`` rows per shard.
+    """
+    ordered = True
+
+    def __init__(self, queryset, aliases=None):
+        self.queryset = queryset if queryset.ordered else queryset.order_by('pk')
+        self.model = queryset.model
+        self.aliases = aliases or shard_aliases()
+        self._key = order_key(self.queryset)
+
+    def count(self):
+        return sum(scatter(lambda alias: self.queryset.using(alias).count(), self.aliases))
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            rows = self[index:index + 1]
+            if not rows:
+                raise IndexError(index)
+            return rows[0]
+        start, stop = index.start or 0, index.stop
+        parts = scatter(lambda alias: list(self.queryset.using(alias)[:stop]), self.aliases)
+        return list(islice(heapq.merge(*parts, key=self._key), start, stop))
+
+
+def in_bulk(queryset, ids):
+    """``{pk: obj}`` for ``ids``, each read from the shard its id names."""
+    if not enabled() or not is_sharded(queryset.model):
+        return {obj.pk: obj for obj in queryset.filter(pk__in=ids)}
+    by_shard = {}
+    for pk in ids:
+        by_shard.setdefault(shard_for_pk(pk), []).append(pk)
+    objects = {}
+    for alias, pks in by_shard.items():
+        if alias is not None:
+            objects.update((obj.pk, obj) for obj in queryset.using(alias).filter(pk__in=pks))
+    return objects
+
+
+class ShardedViewSetMixin:
+    """Pin each request to the shard it names; scatter listings that name none."""
+    _shard_token = None
+
+    def request_shard(self, request):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        if lookup in self.kwargs:
+            return shard_for_pk(self.kwargs[lookup])
+        if request.method == 'POST' and isinstance(request.data, dict):
+            shard = shard_for_values(self.queryset.model, request.data)
+            if shard is not None:
+                return shard
+        shards = {shard_for_company(company_id) for company_id in company_scope(request) or ()}
+        return shards.pop() if len(shards) == 1 else None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if enabled() and self._shard_token is None:
+            shard = self.request_shard(request)
+            if shard is not None:
+                self._shard_token = _pinned.set(shard)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._shard_token is not None:
+            _pinned.reset(self._shard_token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'list' and enabled() and current() is None:
+            return ScatterQuerySet(queryset)
+        return queryset
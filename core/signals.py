@@ -0,0 +1,198 @@
+# signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import availability, images, layouts, payments, sharding, tenancy
+from .changefeed import record_change
+from .coalescing import get_coalescer
+from .events import publish_on_commit, trip_channel, user_channel
+from .fares import departure_day, mark_dirty, refresh_seat_type
+from .jobs import enqueue
+from .models import (
+    Company, Notification, Payment, PaymentMethod, Rol, Route, Seat, SeatType, Trip, TripSeat, UserCompany,
+)
+from .notifications import bump_unread
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=Trip)
+@receiver(post_save, sender=TripSeat)
+@receiver(post_save, sender=SeatType)
+def log_catalog_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    record_change(instance, 'created' if created else 'updated')
+    if sender is not TripSeat:
+        get_coalescer().clear()
+
+
+@receiver(post_delete, sender=Route)
+@receiver(post_delete, sender=Trip)
+@receiver(post_delete, sender=TripSeat)
+@receiver(post_delete, sender=SeatType)
+def log_catalog_delete(sender, instance, **kwargs):
+    record_change(instance, 'deleted')
+    if sender is not TripSeat:
+        get_coalescer().clear()
+
+
+@receiver(post_save, sender=Notification)
+def count_new_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not instance.read:
+        bump_unread([instance.user_id])
+        publish_on_commit(user_channel(instance.user_id), {
+            'type': 'notification',
+            'id': instance.pk,
+            'topic': instance.topic,
+            'body': instance.body,
+            'created_at': instance.created_at.isoformat(),
+        })
+
+
+@receiver(post_save, sender=TripSeat)
+def publish_seat_state(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        publish_on_commit(trip_channel(instance.trip_id), {
+            'type': 'seat',
+            'trip_id': instance.trip_id,
+            'trip_seat_id': instance.pk,
+            'seat_id': instance.seat_id,
+            'state': instance.state,
+        }, using=using)
+
+
+@receiver(post_delete, sender=Notification)
+def uncount_deleted_notification(sender, instance, **kwargs):
+    if not instance.read:
+        bump_unread([instance.user_id], -1)
+
+
+@receiver(pre_save, sender=Trip)
+def refresh_previous_fare_day(sender, instance, raw=False, using=None, **kwargs):
+    # A trip moved to another day or route leaves its old calendar cell stale.
+    if raw or instance.pk is None:
+        return
+    with sharding.pinned(using):
+        previous = Trip.objects.filter(pk=instance.pk).values_list('route_id', 'dateDeparture').first()
+        if previous is not None:
+            mark_dirty(cell=(previous[0], departure_day(previous[1])), using=using)
+
+
+@receiver(post_save, sender=Trip)
+@receiver(post_delete, sender=Trip)
+def refresh_trip_fare_day(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        with sharding.pinned(using):
+            mark_dirty(cell=(instance.route_id, departure_day(instance.dateDeparture)), using=using)
+
+
+@receiver(post_save, sender=TripSeat)
+@receiver(post_delete, sender=TripSeat)
+def refresh_seat_fare_day(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        with sharding.pinned(using):
+            mark_dirty(trip_id=instance.trip_id, using=using)
+
+
+@receiver(post_save, sender=SeatType)
+def refresh_seat_type_fares(sender, instance, created, raw=False, using=None, **kwargs):
+    if not created and not raw:
+        enqueue(refresh_seat_type, args=[instance.pk], using=using)
+
+
+@receiver(pre_save, sender=Seat)
+@receiver(pre_save, sender=SeatType)
+def refresh_previous_ship_layout(sender, instance, raw=False, using=None, **kwargs):
+    # A seat or seat type moved to another ship leaves the old layout stale.
+    if raw or instance.pk is None:
+        return
+    ship_field = 'seatType__ship_id' if sender is Seat else 'ship_id'
+    previous = sender.objects.using(using).filter(pk=instance.pk).values_list(ship_field, flat=True).first()
+    if previous is not None:
+        layouts.mark_dirty(previous, using)
+
+
+@receiver(post_save, sender=Seat)
+@receiver(post_delete, sender=Seat)
+def refresh_seat_ship_layout(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        ship_id = SeatType.objects.using(using).filter(pk=instance.seatType_id).values_list('ship_id', flat=True).first()
+        if ship_id is not None:
+            layouts.mark_dirty(ship_id, using)
+
+
+@receiver(post_save, sender=SeatType)
+@receiver(post_delete, sender=SeatType)
+def refresh_seat_type_ship_layout(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        layouts.mark_dirty(instance.ship_id, using)
+
+
+@receiver(pre_save, sender=UserCompany)
+def forget_previous_member(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    previous = UserCompany.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+    if previous is not None and previous != instance.user_id:
+        tenancy.invalidate([previous])
+
+
+@receiver(post_save, sender=UserCompany)
+@receiver(post_delete, sender=UserCompany)
+def forget_memberships(sender, instance, **kwargs):
+    tenancy.invalidate([instance.user_id])
+
+
+@receiver(post_save, sender=Rol)
+@receiver(pre_delete, sender=Rol)
+def forget_role_memberships(sender, instance, **kwargs):
+    tenancy.invalidate(UserCompany.objects.filter(rol=instance).values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Company)
+def process_company_logo(sender, instance, raw=False, **kwargs):
+    if not raw:
+        images.schedule(instance)
+
+
+@receiver(post_save, sender=TripSeat)
+def count_seat_save(sender, instance, created, raw=False, using=None, **kwargs):
+    if not raw:
+        with sharding.pinned(using):
+            availability.seat_saved(instance, created)
+
+
+@receiver(post_delete, sender=TripSeat)
+def count_seat_delete(sender, instance, using=None, **kwargs):
+    with sharding.pinned(using):
+        availability.seat_deleted(instance)
+
+
+@receiver(post_save, sender=Payment)
+def mark_booking_paid(sender, instance, created, raw=False, using=None, **kwargs):
+    if created and not raw:
+        with sharding.pinned(using):
+            payments.mark_paid([instance.booking_id])
+
+
+@receiver(pre_save, sender=Company)
+def assign_company_shard(sender, instance, raw=False, **kwargs):
+    if not raw and instance._state.adding:
+        sharding.assign(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Company)
+@receiver(post_save, sender=PaymentMethod)
+def replicate_reference_row(sender, instance, raw=False, using=None, **kwargs):
+    if not raw and using == sharding.DIRECTORY and sharding.enabled():
+        sharding.replicate(instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Company)
+@receiver(post_delete, sender=PaymentMethod)
+def unreplicate_reference_row(sender, instance, using=None, **kwargs):
+    if using == sharding.DIRECTORY and sharding.enabled():
+        sharding.unreplicate(instance)
@@ -0,0 +1,152 @@
+# startup.py
+"""Worker boot: warming the application and measuring cold starts.
+
+``e_project.wsgi`` and ``e_project.asgi`` call ``warm_up`` once the
+application is built, so the URLconf, views, serializers and DRF's
+configured classes are imported at boot and not by the first request. With
+``preload_app`` (``gunicorn.conf.py``) that happens once in the master and
+forked workers share the imported modules.
+
+``python -X importtime -m core.startup`` boots the application in a fresh
+interpreter, sends requests through it and prints the timings as JSON; the
+``profile_startup`` command runs it and breaks the import time down.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import traceback
+
+API_SETTINGS = (
+    'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_THROTTLE_CLASSES',
+    'DEFAULT_RENDERER_CLASSES',
+    'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_FILTER_BACKENDS',
+    'DEFAULT_PAGINATION_CLASS',
+)
+IMPORT_TIME_RE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def warm_up():
+    """Import what the first request would, without touching the database."""
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+
+    get_resolver().url_patterns
+    for name in API_SETTINGS:
+        getattr(api_settings, name)
+
+
+def memory_kb():
+    """``(rss, private)`` of this process in KiB; private excludes pages shared with the master."""
+    memory = {}
+    for path, keys in (('/proc/self/status', ('VmRSS',)), ('/proc/self/smaps_rollup', ('Private_Clean', 'Private_Dirty'))):
+        try:
+            with open(path) as fh:
+                for line in fh:
+                    key, _, value = line.partition(':')
+                    if key in keys:
+                        memory[key] = int(value.split()[0])
+        except OSError:
+            pass
+    if 'VmRSS' not in memory:
+        import resource
+        memory['VmRSS'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    private = memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0)
+    return memory['VmRSS'], private or memory['VmRSS']
+
+
+def parse_import_time(lines):
+    """``[(module, self_us, cumulative_us, depth)]`` from ``-X importtime`` output."""
+    modules = []
+    for line in lines:
+        match = IMPORT_TIME_RE.match(line)
+        if match:
+            modules.append((match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2))
+    return modules
+
+
+def _request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'HTTP_ACCEPT': 'application/json'}
+    setup_testing_defaults(environ)
+    status = []
+    started = time.perf_counter()
+    body = application(environ, lambda code, headers, exc_info=None: status.append(code))
+    try:
+        b''.join(body)
+    finally:
+        getattr(body, 'close', lambda: None)()
+    return (time.perf_counter() - started) * 1000, status[0].split()[0]
+
+
+def _serve(application, path, started):
+    first_ms, status = _request(application, path)
+    next_ms, _ = _request(application, path)
+    rss, private = memory_kb()
+    return {
+        'status': status,
+        'first_request_ms': round(first_ms, 1),
+        'next_request_ms': round(next_ms, 1),
+        'time_to_first_response_ms': round((time.perf_counter() - started) * 1000 - next_ms, 1),
+        'rss_kb': rss,
+        'private_kb': private,
+    }
+
+
+def _in_worker(func):
+    """``func()`` run in a forked child, as gunicorn runs a preloaded worker."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            payload = func()
+        except BaseException:
+            payload = {'error': traceback.format_exc()}
+        with os.fdopen(write_fd, 'w') as fh:
+            json.dump(payload, fh)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as fh:
+        result = json.load(fh)
+    os.waitpid(pid, 0)
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    return result
+
+
+def measure_boot(path, preload=False):
+    """Boot the WSGI application in this interpreter and time the first requests.
+
+    With ``preload`` the requests are served by a forked child, and the time
+    to first response is counted from the fork.
+    """
+    import gc
+
+    started = time.perf_counter()
+    from django.core.servers.basehttp import get_internal_wsgi_application
+
+    application = get_internal_wsgi_application()
+    boot_ms = (time.perf_counter() - started) * 1000
+    if preload:
+        gc.freeze()
+        forked = time.perf_counter()
+        result = _in_worker(lambda: _serve(application, path, forked))
+    else:
+        result = _serve(application, path, started)
+    return {'path': path, 'boot_ms': round(boot_ms, 1), 'modules': len(sys.modules), **result}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--path', default='/api/trips/')
+    parser.add_argument('--preload', action='store_true')
+    args = parser.parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'e_project.settings')
+    print(json.dumps(measure_boot(args.path, args.preload)))
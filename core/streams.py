@@ -0,0 +1,87 @@
+# streams.py
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from .events import RESET, get_hub, trip_channel, user_channel
+
+
+def _authenticate(request):
+    """Resolve the user from the Authorization header, or from ``?token=``
+    since browsers' EventSource cannot send headers."""
+    auth = JWTAuthentication()
+    try:
+        result = auth.authenticate(request)
+        if result is not None:
+            return result[0]
+        raw_token = request.GET.get('token')
+        if raw_token:
+            return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        pass
+    finally:
+        # The stream stays open for minutes; hand the connection back to the
+        # pool now rather than when the response ends.
+        connections.close_all()
+    return None
+
+
+def _format(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+
+
+async def _stream(channels):
+    heartbeat = getattr(settings, 'EVENTS_HEARTBEAT_SECONDS', 15)
+    subscription = get_hub().subscribe(channels)
+    try:
+        await subscription.connected(heartbeat)
+        yield 'retry: 3000\n\n'
+        while True:
+            try:
+                event = await subscription.get(heartbeat)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if event is RESET:
+                yield _format({'type': 'reset'})
+                return
+            yield _format(event)
+    finally:
+        subscription.close()
+
+
+@require_GET
+async def live_events(request):
+    """Server-Sent Events for ``TripSeat`` state changes of ``?trip_id=`` and
+    new notifications of the authenticated user."""
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"detail": "The event stream is only served by the ASGI application (the events service)."},
+            status=501,
+        )
+
+    channels = []
+    trip_id = request.GET.get('trip_id')
+    if trip_id:
+        if not trip_id.isdigit():
+            return JsonResponse({"detail": "trip_id must be an integer."}, status=400)
+        channels.append(trip_channel(int(trip_id)))
+    user = await sync_to_async(_authenticate)(request)
+    if user is not None:
+        channels.append(user_channel(user.pk))
+    if not channels:
+        return JsonResponse({"detail": "Subscribe to a trip_id or authenticate."}, status=400)
+
+    response = StreamingHttpResponse(_stream(channels), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
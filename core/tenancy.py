@@ -0,0 +1,172 @@
+# tenancy.py
+"""Company scoping for operators.
+
+A user with ``UserCompany`` rows is an operator of those companies: the
+viewsets using ``CompanyScopedMixin`` only show and modify their companies'
+rows. Staff are unscoped; everyone else keeps the public catalog reads.
+Customer-owned rows (bookings, payments, notifications) use
+``UserScopedMixin`` as well: there a user who is neither staff nor an
+operator only sees and writes their own.
+
+Writes are further limited by role: with ``TENANCY_WRITE_ROLES`` set, an
+operator only creates, changes and deletes rows of the companies where
+their membership has one of those roles (names compared case-insensitively);
+their other companies stay read-only. Unset, every membership may write.
+
+Memberships are read once per user and cached for
+``TENANCY_CACHE_SECONDS``; ``core.signals`` drops the entry whenever one of
+the user's memberships or roles changes. The cache is per process unless
+``CACHES`` points at a shared backend, so the TTL bounds staleness in other
+workers.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from rest_framework import permissions
+from rest_framework.exceptions import PermissionDenied
+
+from .models import UserCompany
+
+
+def cache_key(user_id):
+    return f'tenancy:memberships:{user_id}'
+
+
+def load_memberships(user_id):
+    """``{company_id: role name or None}`` for ``user_id``."""
+    key = cache_key(user_id)
+    memberships = cache.get(key)
+    if memberships is None:
+        memberships = dict(UserCompany.objects.filter(user_id=user_id).values_list('empresa_id', 'rol__name'))
+        cache.set(key, memberships, getattr(settings, 'TENANCY_CACHE_SECONDS', 300))
+    return memberships
+
+
+def invalidate(user_ids):
+    cache.delete_many([cache_key(user_id) for user_id in set(user_ids)])
+
+
+def memberships(request):
+    """The requesting user's memberships, resolved once per request."""
+    django_request = getattr(request, '_request', request)
+    if not hasattr(django_request, 'tenant_memberships'):
+        user = request.user
+        django_request.tenant_memberships = load_memberships(user.pk) if user.is_authenticated else {}
+    return django_request.tenant_memberships
+
+
+def write_roles():
+    roles = getattr(settings, 'TENANCY_WRITE_ROLES', None)
+    return None if roles is None else {role.lower() for role in roles}
+
+
+def company_scope(request, write=False):
+    """Company ids the request is limited to, or ``None`` when unscoped.
+
+    With ``write``, only the companies whose role may write; that list is
+    empty for an operator with none.
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return None
+    companies = memberships(request)
+    if not companies:
+        return None
+    roles = write_roles()
+    if write and roles is not None:
+        return sorted(company_id for company_id, role in companies.items() if (role or '').lower() in roles)
+    return sorted(companies)
+
+
+class IsOperatorOrReadOnly(permissions.BasePermission):
+    """Writes need staff or a membership with a write role; the scoped
+    queryset and ``CompanyScopedMixin.perform_*`` keep them inside those
+    companies."""
+
+    def has_permission(self, request, view):
+        if request.method in permissions.SAFE_METHODS:
+            return True
+        user = request.user
+        return bool(user and user.is_authenticated and (user.is_staff or company_scope(request, write=True)))
+
+
+class CompanyScopedMixin:
+    """Limit a viewset to the operator's companies.
+
+    ``company_field`` is the lookup path from the model to ``Company``'s id.
+    Unsafe methods see only the companies the operator may write.
+    """
+    company_field = 'company_id'
+
+    def write_scope(self):
+        return company_scope(self.request, write=self.request.method not in permissions.SAFE_METHODS)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        companies = self.write_scope()
+        if companies is None:
+            return queryset
+        if len(companies) == 1:
+            return queryset.filter(**{self.company_field: companies[0]})
+        return queryset.filter(**{f'{self.company_field}__in': companies})
+
+    def should_coalesce(self, request):
+        # Scoped listings differ per operator and can't be shared.
+        return company_scope(request) is None and super().should_coalesce(request)
+
+    def _save_in_scope(self, save):
+        if self.write_scope() is None:
+            return save()
+        with transaction.atomic(using=router.db_for_write(self.get_queryset().model)):
+            instance = save()
+            if not self.get_queryset().filter(pk=instance.pk).exists():
+                raise PermissionDenied("You can only manage your own company's records.")
+        return instance
+
+    def perform_create(self, serializer):
+        self._save_in_scope(serializer.save)
+
+    def perform_update(self, serializer):
+        self._save_in_scope(serializer.save)
+
+
+class UserScopedMixin:
+    """Limit a viewset to the requesting user's own rows.
+
+    ``user_field`` is the lookup path from the model to the owner's id. Staff
+    are unscoped; when ``CompanyScopedMixin`` follows this mixin, operators
+    get their companies' rows instead.
+    """
+    user_field = 'user_id'
+
+    def user_scope(self):
+        """The user id the request is limited to, or ``None`` when unscoped."""
+        user = self.request.user
+        if user.is_staff:
+            return None
+        if isinstance(self, CompanyScopedMixin) and company_scope(self.request) is not None:
+            return None
+        return user.pk
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user_id = self.user_scope()
+        if user_id is None:
+            return queryset
+        return queryset.filter(**{self.user_field: user_id})
+
+    def _save_as_owner(self, save):
+        with transaction.atomic(using=router.db_for_write(self.get_queryset().model)):
+            instance = save()
+            if not self.get_queryset().filter(pk=instance.pk).exists():
+                raise PermissionDenied("You can only manage your own records.")
+        return instance
+
+    def perform_create(self, serializer):
+        if self.user_scope() is None:
+            return super().perform_create(serializer)
+        self._save_as_owner(serializer.save)
+
+    def perform_update(self, serializer):
+        if self.user_scope() is None:
+            return super().perform_update(serializer)
+        self._save_as_owner(serializer.save)
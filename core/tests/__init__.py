@@ -0,0 +1,7 @@
+# tests
+"""Tests for ``core``, one module per feature.
+
+Run with ``python manage.py test --settings=e_project.test_settings`` when
+no MySQL server is at hand; the sharding tests need its ``shard1`` and
+``shard2`` aliases and are skipped without them.
+"""
@@ -0,0 +1,67 @@
+# test_availability.py
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import availability
+from core.coalescing import get_coalescer
+from core.models import SeatTypeAvailability, Trip, TripSeat
+
+from .utils import client_for, make_catalog, make_company
+
+
+class AvailabilityCounterTests(TestCase):
+    def setUp(self):
+        get_coalescer().clear()
+        self.addCleanup(get_coalescer().clear)
+        self.trip, self.trip_seats = make_catalog(make_company(), seats=3)
+
+    def assertAvailable(self, seats):
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, seats)
+        self.assertEqual(SeatTypeAvailability.objects.get(trip=self.trip).available, seats)
+
+    def trip_ids(self, query):
+        get_coalescer().clear()
+        return [trip['id'] for trip in client_for().get('/api/trips/?' + query).json()['results']]
+
+    def test_counters_follow_seat_states(self):
+        self.assertAvailable(3)
+        trip_seat = self.trip_seats[0]
+        trip_seat.state = 'ocupado'
+        trip_seat.save()
+        trip_seat.save()  # Not a transition.
+        self.assertAvailable(2)
+
+        # Saving a stale copy of the trip must not overwrite the counter.
+        stale = Trip.objects.get(pk=self.trip.pk)
+        stale.available_seats = 3
+        stale.basePrice = 99
+        stale.save()
+        self.trip.refresh_from_db()
+        self.assertEqual((self.trip.available_seats, self.trip.basePrice), (2, 99))
+
+        staff = client_for(User.objects.create_user('staff', is_staff=True))
+        response = staff.patch(f'/api/trip-seats/{self.trip_seats[1].pk}/', {'state': 'reservado'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertAvailable(1)
+        self.trip_seats[2].delete()
+        self.assertAvailable(0)
+        self.assertEqual(self.trip_ids('has_seats=true'), [])
+        self.assertEqual(self.trip_ids('has_seats=false'), [self.trip.pk])
+
+    def test_reconcile_fixes_drift(self):
+        Trip.objects.filter(pk=self.trip.pk).update(available_seats=7)
+        SeatTypeAvailability.objects.all().delete()
+        TripSeat.objects.filter(pk=self.trip_seats[0].pk).update(state='ocupado')
+        self.assertEqual(availability.reconcile([self.trip.pk], fix=False), 1)
+        self.trip.refresh_from_db()
+        self.assertEqual(self.trip.available_seats, 7)
+
+        call_command('reconcile_availability', batch_size=1, stdout=StringIO())
+        self.assertAvailable(2)
+        self.assertEqual(availability.reconcile([self.trip.pk]), 0)
+        self.assertEqual(self.trip_ids('min_available=2'), [self.trip.pk])
+        self.assertEqual(self.trip_ids('min_available=3'), [])
@@ -0,0 +1,75 @@
+# test_batch.py
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.signals import got_request_exception
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from core.models import Booking, TripSeat
+from core.views import BookingViewSet
+
+from .utils import client_for, make_catalog, make_company
+
+
+class BatchTests(TestCase):
+    def setUp(self):
+        self.trip, self.trip_seats = make_catalog(make_company(), seats=3)
+        self.user = User.objects.create_user('staff', is_staff=True)
+        self.bookings = [Booking.objects.create(tripSeat=trip_seat, user=self.user) for trip_seat in self.trip_seats]
+        self.client = client_for(self.user)
+
+    def batch(self, requests):
+        return self.client.post('/api/batch/', {'requests': requests}, format='json')
+
+    def test_items_run_in_order(self):
+        requests = [{'method': 'get', 'path': f'/api/bookings/{booking.pk}/'} for booking in self.bookings]
+        requests += [
+            {'id': 'missing', 'method': 'GET', 'path': '/api/bookings/9999/'},
+            {'method': 'GET', 'path': '/api/trips/?page=1'},
+            {'method': 'PATCH', 'path': f'/api/trip-seats/{self.trip_seats[0].pk}/', 'body': {'state': 'ocupado'}},
+            {'method': 'GET', 'path': '/api/nope/'},
+            {'method': 'POST', 'path': '/api/batch/', 'body': {}},
+            {'method': 'GET', 'path': '/other/'},
+        ]
+        response = self.batch(requests)
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['responses']
+        self.assertEqual([result['status'] for result in results], [200, 200, 200, 404, 200, 200, 404, 400, 400])
+        self.assertEqual(results[0]['body']['id'], self.bookings[0].pk)
+        self.assertEqual(results[3]['id'], 'missing')
+        self.assertEqual(TripSeat.objects.get(pk=self.trip_seats[0].pk).state, 'ocupado')
+
+    def test_limits_and_authentication(self):
+        self.assertEqual(self.batch([{'method': 'POST', 'path': '/api/trips/'}] * 21).status_code, 400)
+        self.assertEqual(client_for().post('/api/batch/', {'requests': []}, format='json').status_code, 401)
+
+    def test_server_errors_are_reported(self):
+        reported = []
+
+        def receiver(sender, request, **kwargs):
+            reported.append(request.path)
+
+        got_request_exception.connect(receiver)
+        self.addCleanup(got_request_exception.disconnect, receiver)
+        requests = [{'method': 'GET', 'path': f'/api/bookings/{booking.pk}/'} for booking in self.bookings[:2]]
+        serializer_class = BookingViewSet.serializer_class
+        # The test client would re-raise the reported exception.
+        self.client.raise_request_exception = False
+        with mock.patch.object(serializer_class, 'to_representation', side_effect=RuntimeError("broken")):
+            with self.assertLogs('core.batch', 'ERROR') as logs:
+                response = self.batch(requests)
+        self.assertEqual([result['status'] for result in response.json()['responses']], [500, 500])
+        self.assertIn('Grouped retrieve of 2 BookingViewSet items failed', logs.output[0])
+        self.assertIn(f'Batch item GET /api/bookings/{self.bookings[0].pk}/ failed', logs.output[1])
+        self.assertIn('RuntimeError: broken', logs.output[1])
+        self.assertEqual(reported, [f'/api/bookings/{booking.pk}/' for booking in self.bookings[:2]])
+
+
+@override_settings(BATCH_PARALLEL_WORKERS=3)
+class ParallelBatchTests(TransactionTestCase):
+    def test_reads_run_on_worker_threads(self):
+        trip, _ = make_catalog(make_company(), seats=3)
+        client = client_for(User.objects.create_user('staff', is_staff=True))
+        paths = ['/api/trips/', '/api/routes/', '/api/ships/', f'/api/trips/{trip.pk}/overview/']
+        response = client.post('/api/batch/', {'requests': [{'method': 'GET', 'path': path} for path in paths]}, format='json')
+        self.assertEqual([result['status'] for result in response.json()['responses']], [200] * 4, response.content)
@@ -0,0 +1,78 @@
+# test_benchmarks.py
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.benchmarks import format_table, percentile
+from core.models import Booking, Company, FareCalendarDay, Payment, Route, Trip, TripSeat
+
+
+def seed(**options):
+    defaults = dict(companies=2, ships_per_company=1, seats_per_type=3, routes_per_company=2, days=3, users=4)
+    call_command('seed_data', stdout=StringIO(), **{**defaults, **options})
+
+
+class SeedDataTests(TestCase):
+    def test_generates_a_consistent_catalog(self):
+        seed(occupancy=1, paid_ratio=1)
+        self.assertEqual(Company.objects.count(), 2)
+        self.assertEqual(Route.objects.count(), 4)
+        self.assertEqual(Trip.objects.count(), 12)
+        trip = Trip.objects.first()
+        trip_seats = TripSeat.objects.filter(trip=trip)
+        self.assertTrue(trip_seats.exists())
+        self.assertEqual(trip.available_seats, trip_seats.filter(state='disponible').count())
+        # Every taken seat is booked and, with paid_ratio=1, every occupied one is paid.
+        self.assertEqual(Booking.objects.count(), TripSeat.objects.exclude(state='disponible').count())
+        self.assertEqual(Payment.objects.count(), TripSeat.objects.filter(state='ocupado').count())
+        self.assertTrue(FareCalendarDay.objects.exists())
+
+    def test_same_seed_same_data(self):
+        seed(seed=7)
+        first = list(Trip.objects.order_by('pk').values_list('basePrice', flat=True))
+        seed(seed=7)
+        self.assertEqual(list(Trip.objects.order_by('pk').values_list('basePrice', flat=True))[len(first):], first)
+
+    def test_appends_to_existing_data(self):
+        seed()
+        seed()
+        self.assertEqual(Company.objects.count(), 4)
+        self.assertEqual(Trip.objects.count(), 24)
+
+
+class BenchmarkTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_format_table_compares_with_baseline(self):
+        row = {'name': 'trips list', 'status': 200, 'p50_ms': 2.0, 'p95_ms': 4.0, 'p99_ms': 5.0,
+               'queries': 3, 'throughput_rps': 100.0}
+        table = format_table([row], {'results': [{**row, 'p50_ms': 4.0}]})
+        self.assertIn('p50 -50.0%', table)
+        self.assertIn('p95 +0.0%', table)
+
+    def test_benchmark_command(self):
+        seed(companies=1, routes_per_company=1, days=1)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'results.json')
+            stdout = StringIO()
+            call_command(
+                'benchmark', iterations=2, warmup=0, only=['trips'], json_path=path,
+                stdout=stdout, stderr=StringIO(),
+            )
+            with open(path) as fh:
+                results = json.load(fh)['results']
+            call_command('benchmark', iterations=1, warmup=0, only=['trips list'], compare=path,
+                         stdout=stdout, stderr=StringIO())
+        names = {row['name'] for row in results}
+        self.assertIn('trips list', names)
+        self.assertIn('trips search origin/destiny', names)
+        self.assertTrue(all(row['status'] == 200 and row['iterations'] == 2 for row in results))
+        self.assertIn('p50 ', stdout.getvalue().splitlines()[-1])
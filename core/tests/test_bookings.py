@@ -0,0 +1,82 @@
+# test_bookings.py
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Booking, Notification, Payment, UserCompany
+
+from .utils import client_for, make_catalog, make_company
+
+
+class UserScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.company = make_company()
+        self.trip, self.trip_seats = make_catalog(self.company, seats=3)
+        self.me = User.objects.create_user('me')
+        self.other = User.objects.create_user('other')
+        self.mine = Booking.objects.create(user=self.me, tripSeat=self.trip_seats[0])
+        self.theirs = Booking.objects.create(user=self.other, tripSeat=self.trip_seats[1])
+        self.client = client_for(self.me)
+
+    def test_customers_see_their_own_rows(self):
+        payment = Payment.objects.create(booking=self.theirs)
+        notification = Notification.objects.create(user=self.other, topic='a', body='b')
+        self.assertEqual([row['id'] for row in self.client.get('/api/bookings/').json()['results']], [self.mine.pk])
+        self.assertEqual(self.client.get(f'/api/bookings/{self.theirs.pk}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/payments/{payment.pk}/').status_code, 404)
+        self.assertEqual(self.client.get('/api/payments/').json()['count'], 0)
+        self.assertEqual(self.client.get(f'/api/notifications/{notification.pk}/').status_code, 404)
+        self.assertEqual(client_for(self.other).get(f'/api/notifications/{notification.pk}/').status_code, 200)
+
+    def test_customers_book_for_themselves(self):
+        response = self.client.post('/api/bookings/', {'tripSeat_id': self.trip_seats[2].pk, 'user_id': self.other.pk}, format='json')
+        self.assertEqual(response.status_code, 403, response.content)
+        self.assertFalse(Booking.objects.filter(tripSeat=self.trip_seats[2]).exists())
+        response = self.client.post('/api/bookings/', {'tripSeat_id': self.trip_seats[2].pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(Booking.objects.get(pk=response.json()['id']).user_id, self.me.pk)
+
+    def test_staff_and_operators_see_every_booking(self):
+        staff = client_for(User.objects.create_user('staff', is_staff=True))
+        self.assertEqual(staff.get('/api/bookings/').json()['count'], 2)
+        self.assertEqual(staff.get(f'/api/bookings/?user={self.other.pk}').status_code, 200)
+        operator = User.objects.create_user('operator')
+        UserCompany.objects.create(user=operator, empresa=self.company)
+        self.assertEqual(client_for(operator).get('/api/bookings/').json()['count'], 2)
+
+
+class MyTripsTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user('me')
+        company = make_company()
+        upcoming, seats = make_catalog(company, seats=2)
+        past, past_seats = make_catalog(company, departure=timezone.now() - timedelta(days=3), origin='Nauta')
+        for trip_seat in seats + past_seats[:1]:
+            Booking.objects.create(user=self.me, tripSeat=trip_seat)
+        Booking.objects.create(user=User.objects.create_user('other'), tripSeat=past_seats[1])
+        self.client = client_for(self.me)
+
+    def test_upcoming_trips_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/bookings/my-trips/')
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertFalse(data['has_more'])
+        self.assertEqual((data['results'][0]['price'], data['results'][0]['origin']), (15, 'Iquitos'))
+        booking_queries = [query for query in queries.captured_queries if 'core_booking' in query['sql']]
+        self.assertEqual(len(booking_queries), 1, booking_queries)
+
+    def test_paging_and_past_trips(self):
+        self.assertTrue(self.client.get('/api/bookings/my-trips/?limit=1').json()['has_more'])
+        self.assertFalse(self.client.get('/api/bookings/my-trips/?limit=1&offset=1').json()['has_more'])
+        past = self.client.get('/api/bookings/my-trips/?when=past').json()['results']
+        self.assertEqual([row['origin'] for row in past], ['Nauta'])
+        self.assertEqual(self.client.get('/api/bookings/my-trips/?limit=500').status_code, 400)
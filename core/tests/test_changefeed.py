@@ -0,0 +1,89 @@
+# test_changefeed.py
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import changefeed
+from core.models import ChangeLog, Route
+
+from .utils import client_for, make_catalog, make_company
+
+
+class ChangeFeedTests(TestCase):
+    def read(self, cursor, **params):
+        return client_for().get('/api/changes/', {'cursor': cursor, **params})
+
+    def test_cursor_follows_changes(self):
+        head = client_for().get('/api/changes/').json()
+        self.assertEqual(head['results'], [])
+        company = make_company()
+        route = Route.objects.create(company=company, origin='Iquitos', destiny='Nauta')
+
+        page = self.read(head['next_cursor']).json()
+        self.assertEqual([(c['model'], c['id'], c['action']) for c in page['results']], [('route', route.pk, 'created')])
+        self.assertEqual(page['results'][0]['data']['destiny'], 'Nauta')
+
+        route.destiny = 'Yurimaguas'
+        route.save()
+        route.delete()
+        page = self.read(page['next_cursor']).json()
+        self.assertEqual([c['action'] for c in page['results']], ['deleted'])
+        self.assertEqual(self.read(page['next_cursor']).json()['results'], [])
+
+    def test_catalog_models_are_tracked(self):
+        cursor = changefeed.head_cursor()
+        make_catalog(make_company())
+        models = {c['model'] for c in self.read(cursor).json()['results']}
+        self.assertEqual(models, {'route', 'trip', 'tripseat', 'seattype'})
+
+    def test_pages(self):
+        cursor = changefeed.head_cursor()
+        company = make_company()
+        routes = [Route.objects.create(company=company, origin='A', destiny=str(n)) for n in range(3)]
+        first = self.read(cursor, limit=2).json()
+        self.assertTrue(first['has_more'])
+        second = self.read(first['next_cursor'], limit=2).json()
+        self.assertFalse(second['has_more'])
+        seen = [c['id'] for c in first['results'] + second['results']]
+        self.assertEqual(seen, [route.pk for route in routes])
+
+    def test_skipped_ids_are_read_later(self):
+        position = changefeed.head_position()
+        first = ChangeLog.objects.create(model='route', object_id=1, action='updated')
+        late = ChangeLog.objects.create(model='route', object_id=2, action='updated')
+        last = ChangeLog.objects.create(model='route', object_id=3, action='updated')
+        late_id = late.pk
+        late.delete()  # as if its transaction had not committed yet
+
+        entries, position, _ = changefeed.read_entries(position)
+        self.assertEqual([entry.pk for entry in entries], [first.pk, last.pk])
+        position = changefeed.decode_cursor(changefeed.encode_cursor(position))
+        ChangeLog.objects.create(pk=late_id, model='route', object_id=2, action='updated')
+        entries, position, _ = changefeed.read_entries(position)
+        self.assertEqual([entry.pk for entry in entries], [late_id])
+        self.assertEqual(position.gaps, ())
+
+    def test_old_gaps_are_given_up(self):
+        position = changefeed.head_position()
+        gone = ChangeLog.objects.create(model='route', object_id=1, action='updated')
+        after = ChangeLog.objects.create(model='route', object_id=2, action='updated')
+        ChangeLog.objects.filter(pk=after.pk).update(created_at=timezone.now() - changefeed.gap_window() * 2)
+        gone.delete()
+        _, position, _ = changefeed.read_entries(position)
+        self.assertEqual((position.seq, position.gaps), (after.pk, ()))
+
+    def test_bad_and_expired_cursors(self):
+        self.assertEqual(self.read('not-a-cursor').status_code, 400)
+        old = changefeed.Position(0, (), timezone.now() - changefeed.retention() - timedelta(days=1))
+        self.assertEqual(self.read(changefeed.encode_cursor(old)).status_code, 410)
+
+    def test_compaction_keeps_the_latest_entry(self):
+        company = make_company()
+        route = Route.objects.create(company=company, origin='A', destiny='B')
+        route.save()
+        route.save()
+        call_command('compact_changelog', stdout=StringIO())
+        self.assertEqual(ChangeLog.objects.filter(model='route', object_id=route.pk).count(), 1)
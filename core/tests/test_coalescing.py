@@ -0,0 +1,76 @@
+# test_coalescing.py
+import threading
+import time
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.coalescing import SingleFlight, get_coalescer
+from core.models import Trip
+
+from .utils import client_for, make_catalog, make_company
+
+
+class SingleFlightTests(TestCase):
+    def test_concurrent_calls_share_one_computation(self):
+        flight = SingleFlight()
+        calls, results = [], []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.2)
+            return 42
+
+        threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow))) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [42] * 20)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats['leaders'] + flight.stats['followers'], 20)
+
+    def test_errors_are_not_remembered(self):
+        flight = SingleFlight(ttl=60)
+
+        def fail():
+            raise ValueError
+
+        with self.assertRaises(ValueError):
+            flight.do('key', fail)
+        self.assertEqual(flight.do('key', lambda: 1), 1)
+        self.assertEqual(flight.do('key', lambda: 2), 1)
+        flight.clear()
+        self.assertEqual(flight.do('key', lambda: 3), 3)
+
+
+class CoalescedListTests(TestCase):
+    def setUp(self):
+        get_coalescer().clear()
+        self.addCleanup(get_coalescer().clear)
+        self.trip, _ = make_catalog(make_company())
+        self.client = client_for()
+
+    def test_equivalent_queries_share_a_response(self):
+        first = self.client.get('/api/trips/?origin=Iquitos&destiny=Pucallpa')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get('/api/trips/?destiny=Pucallpa&origin=Iquitos&seat=')
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(queries), 0)
+
+        # Catalog writes drop the remembered results.
+        Trip.objects.create(route=self.trip.route, seat=self.trip.seat, basePrice=1, dateDeparture=self.trip.dateDeparture)
+        self.assertEqual(self.client.get('/api/trips/?origin=Iquitos&destiny=Pucallpa').json()['count'], 2)
+
+    def test_links_follow_each_clients_url(self):
+        Trip.objects.bulk_create([
+            Trip(route=self.trip.route, seat=self.trip.seat, basePrice=1, dateDeparture=self.trip.dateDeparture)
+            for _ in range(20)
+        ])
+        plain = self.client.get('/api/trips/').json()['next']
+        secure = self.client.get('/api/trips/', secure=True).json()['next']
+        prefixed = self.client.get('/api/trips/', SCRIPT_NAME='/ferries').json()['next']
+        self.assertTrue(plain.startswith('http://testserver/api/trips/'), plain)
+        self.assertTrue(secure.startswith('https://testserver/api/trips/'), secure)
+        self.assertTrue(prefixed.startswith('http://testserver/ferries/api/trips/'), prefixed)
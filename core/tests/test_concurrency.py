@@ -0,0 +1,70 @@
+# test_concurrency.py
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Booking, TripSeat, VersionConflict
+
+from .utils import client_for, make_catalog, make_company
+
+
+class VersionedUpdateTests(TestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        self.trip, self.trip_seats = make_catalog(make_company())
+
+    def test_if_match(self):
+        client = client_for(self.staff)
+        url = f'/api/trip-seats/{self.trip_seats[0].pk}/'
+        etag = client.get(url)['ETag']
+        self.assertEqual(etag, '"1"')
+
+        response = client.patch(url, {'state': 'ocupado'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response['ETag'], '"2"')
+
+        response = client.patch(url, {'state': 'disponible'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['version'], 2)
+        self.assertEqual(TripSeat.objects.get(pk=self.trip_seats[0].pk).state, 'ocupado')
+
+        response = client.patch(url, {'state': 'disponible'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"3"')
+
+    def test_malformed_if_match(self):
+        response = client_for(self.staff).patch(
+            f'/api/trip-seats/{self.trip_seats[0].pk}/', {'state': 'ocupado'}, format='json', HTTP_IF_MATCH='3',
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_model_saves(self):
+        trip = self.trip
+        trip.basePrice = 12
+        with CaptureQueriesContext(connection) as queries:
+            trip.save(update_fields=['basePrice'])
+        # The new version is not read back.
+        self.assertFalse([q for q in queries.captured_queries if q['sql'].startswith('SELECT "core_trip"."version"')])
+        self.assertEqual(trip.version, 2)
+        trip.refresh_from_db()
+        self.assertEqual(trip.version, 2)
+        trip.expected_version = 1
+        with self.assertRaises(VersionConflict):
+            trip.save()
+        # The check is one-shot.
+        trip.save(update_fields=['basePrice'])
+        trip.refresh_from_db()
+        self.assertEqual(trip.version, 3)
+
+    def test_batched_updates_conflict(self):
+        booking = Booking.objects.create(tripSeat=self.trip_seats[0], user=self.staff)
+        url = f'/api/bookings/{booking.pk}/'
+        response = client_for(self.staff).post('/api/batch/', {'requests': [
+            {'method': 'PATCH', 'path': url, 'body': {'paid': True}, 'headers': {'If-Match': '"1"'}},
+            {'method': 'PATCH', 'path': url, 'body': {'paid': False}, 'headers': {'If-Match': '"1"'}},
+            {'method': 'GET', 'path': url},
+        ]}, format='json')
+        results = response.json()['responses']
+        self.assertEqual([result['status'] for result in results], [200, 409, 200])
+        self.assertEqual(results[2]['headers']['ETag'], '"2"')
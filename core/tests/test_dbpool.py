@@ -0,0 +1,135 @@
+# test_dbpool.py
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase
+
+from core import dbpool
+from core.dbpool import ConnectionPool, PooledDatabaseWrapperMixin, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**options):
+    return ConnectionPool('test', **{**dbpool.DEFAULTS, **options})
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def test_connections_are_reused(self):
+        pool = make_pool()
+        entry, reused = pool.checkout(FakeConnection)
+        self.assertFalse(reused)
+        pool.checkin(entry)
+        again, reused = pool.checkout(FakeConnection)
+        self.assertTrue(reused)
+        self.assertIs(again.connection, entry.connection)
+        self.assertEqual(pool.stats()['connects'], 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_checkout_waits_for_a_free_slot(self):
+        pool = make_pool(max_size=1, timeout=0.05)
+        entry, _ = pool.checkout(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection)
+        threading.Timer(0.02, pool.checkin, [entry]).start()
+        pool.timeout = 2
+        again, reused = pool.checkout(FakeConnection)
+        self.assertTrue(reused)
+        self.assertEqual((pool.stats()['timeouts'], pool.stats()['waits']), (1, 1))
+
+    def test_unusable_and_old_connections_are_closed(self):
+        pool = make_pool(max_lifetime=60)
+        entry, _ = pool.checkout(FakeConnection)
+        connection_ = entry.connection
+        pool.checkin(entry, reusable=False)
+        self.assertTrue(connection_.closed)
+        self.assertEqual(pool.stats()['size'], 0)
+
+        entry, _ = pool.checkout(FakeConnection)
+        entry.created -= 61
+        pool.checkin(entry)
+        self.assertEqual(pool.stats()['recycled'], 1)
+        self.assertEqual(pool.stats()['size'], 0)
+
+    def test_dead_idle_connections_are_replaced(self):
+        pool = make_pool(ping_after=0)
+        entry, _ = pool.checkout(FakeConnection)
+        pool.checkin(entry)
+        dead = entry.connection
+
+        def ping(connection_):
+            raise OSError("gone")
+
+        replacement, reused = pool.checkout(FakeConnection, ping)
+        self.assertFalse(reused)
+        self.assertTrue(dead.closed)
+        self.assertIsNot(replacement.connection, dead)
+        self.assertEqual(pool.stats()['reconnects'], 1)
+
+    def test_unknown_options(self):
+        with self.assertRaises(ImproperlyConfigured):
+            dbpool.get_pool('unknown-options', {'size': 3})
+
+
+class PooledSQLiteWrapper(PooledDatabaseWrapperMixin, SQLiteDatabaseWrapper):
+    pass
+
+
+class PooledWrapperTests(SimpleTestCase):
+    def setUp(self):
+        # SQLite never closes in-memory databases, so use a file.
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.name = os.path.join(directory.name, 'pooled.sqlite3')
+
+    def wrapper(self, **options):
+        settings_dict = {
+            **connection.settings_dict, 'NAME': self.name, 'CONN_MAX_AGE': 0,
+            'OPTIONS': {'pool': {'max_size': 1, 'timeout': 0.05, **options}},
+        }
+        self.addCleanup(dbpool.close_pool, 'pooled')
+        return PooledSQLiteWrapper(settings_dict, alias='pooled')
+
+    def test_close_returns_the_connection(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw)
+        # The pool is full while the connection is checked out.
+        other = self.wrapper()
+        with self.assertRaises(OperationalError):
+            other.ensure_connection()
+        wrapper.close()
+        self.assertEqual(dbpool.stats()['pooled']['idle'], 1)
+
+    def test_broken_connections_are_discarded(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.errors_occurred = True
+        with mock.patch.object(PooledSQLiteWrapper, 'is_usable', return_value=False):
+            wrapper.close()
+        self.assertEqual(dbpool.stats()['pooled']['discarded'], 1)
+        wrapper.ensure_connection()
+        self.assertIsNot(wrapper.connection, raw)
+        wrapper.close()
+
+    def test_persistent_connections_are_refused(self):
+        wrapper = self.wrapper()
+        wrapper.settings_dict['CONN_MAX_AGE'] = 60
+        with self.assertRaises(ImproperlyConfigured):
+            wrapper.ensure_connection()
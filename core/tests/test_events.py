@@ -0,0 +1,97 @@
+# test_events.py
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, TestCase, TransactionTestCase, override_settings
+
+from core import events
+from core.events import DatabaseBackend, Hub
+from core.models import Event, EventListener
+
+from .utils import make_catalog, make_company
+
+
+def subscribe(hub, channels):
+    async def subscribe_():
+        return hub.subscribe(channels)
+
+    loop = asyncio.new_event_loop()
+    subscription = loop.run_until_complete(subscribe_())
+    return loop, subscription
+
+
+@override_settings(EVENTS_POLL_SECONDS=0)
+class DatabaseBackendTests(TestCase):
+    def setUp(self):
+        self.hub = Hub(backend_class=DatabaseBackend)
+        self.backend = self.hub.backend
+        self.backend.start = lambda: None
+
+    def test_publish_without_listeners_writes_nothing(self):
+        self.backend.publish('trip:1', {'state': 'ocupado'})
+        self.assertFalse(Event.objects.exists())
+
+        listener = Hub(backend_class=DatabaseBackend).backend
+        listener.name = 'other-process'
+        listener.heartbeat()
+        self.backend.publish('trip:1', {'state': 'ocupado'})
+        self.assertEqual(Event.objects.count(), 1)
+
+        listener.stop()
+        self.assertFalse(EventListener.objects.exists())
+        self.backend.publish('trip:1', {'state': 'libre'})
+        self.assertEqual(Event.objects.count(), 1)
+
+    def test_poll_starts_from_connect_position(self):
+        loop, subscription = subscribe(self.hub, ['c'])
+        self.addCleanup(loop.close)
+        self.backend.heartbeat()
+        self.backend.publish('c', {'n': 0})
+        self.backend.take_position()
+        # Published after connecting but before the first poll.
+        self.backend.publish('c', {'n': 1})
+        self.backend.publish('other', {'n': 2})
+        self.assertEqual(self.backend.poll(), 2)
+        Event.objects.create(channel='c', payload={'n': 3})
+        self.assertEqual(self.backend.poll(), 1)
+        self.assertEqual(self.backend.poll(), 0)
+
+        async def received():
+            return [await subscription.get(1), await subscription.get(1)]
+
+        self.assertEqual(loop.run_until_complete(received()), [{'n': 1}, {'n': 3}])
+
+
+@override_settings(EVENTS_BACKEND='core.events.DatabaseBackend', EVENTS_POLL_SECONDS=0.05)
+class LiveEventsTests(TransactionTestCase):
+    def setUp(self):
+        events._hub = None
+        self.addCleanup(setattr, events, '_hub', None)
+
+    async def test_stream_delivers_seat_changes(self):
+        trip, trip_seats = await sync_to_async(make_catalog)(await sync_to_async(make_company)())
+        response = await AsyncClient().get('/api/events/', {'trip_id': trip.pk})
+        self.assertEqual(response.status_code, 200)
+        stream = response.streaming_content.__aiter__()
+        self.assertIn(b'retry', await stream.__anext__())
+
+        trip_seat = trip_seats[0]
+        trip_seat.state = 'ocupado'
+        await sync_to_async(trip_seat.save)()
+        self.assertIn(b'ocupado', await asyncio.wait_for(stream.__anext__(), 2))
+        self.assertEqual(events.get_hub().subscriber_count(), 1)
+        poller = events.get_hub().backend._thread
+        # A client disconnect cancels the pending read.
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        pending.cancel()
+        await asyncio.sleep(0.05)
+        self.assertEqual(events.get_hub().subscriber_count(), 0)
+        # With its last subscriber gone the poller unregisters and stops.
+        await asyncio.get_running_loop().run_in_executor(None, poller.join, 2)
+        self.assertFalse(poller.is_alive())
+        self.assertFalse(await EventListener.objects.aexists())
+
+    async def test_requires_a_channel(self):
+        response = await AsyncClient().get('/api/events/')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,111 @@
+# test_fares.py
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import fares
+from core.models import FareCalendarDay, Job
+
+from .utils import client_for, make_catalog, make_company
+
+
+@override_settings(JOB_QUEUE_EAGER=True)
+class FareCalendarTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip, self.trip_seats = make_catalog(make_company(), seats=3)
+
+    def cell(self):
+        return FareCalendarDay.objects.get(route=self.trip.route, day=timezone.localdate(self.trip.dateDeparture))
+
+    def test_cells_follow_changes(self):
+        cell = self.cell()
+        self.assertEqual((cell.min_price, cell.available_seats, cell.trips), (15, 3, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip_seats[0].state = 'ocupado'
+            self.trip_seats[0].save()
+        self.assertEqual(self.cell().available_seats, 2)
+        seat_type = self.trip.seat.seatType
+        with self.captureOnCommitCallbacks(execute=True):
+            seat_type.aditionalPrice = 1
+            seat_type.save()
+        self.assertEqual(self.cell().min_price, 11)
+        with self.captureOnCommitCallbacks(execute=True):
+            for trip_seat in self.trip_seats:
+                trip_seat.state = 'reservado'
+                trip_seat.save()
+        cell = self.cell()
+        self.assertEqual((cell.min_price, cell.available_seats), (None, 0))
+
+        old_day = timezone.localdate(self.trip.dateDeparture)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.dateDeparture += timedelta(days=1)
+            self.trip.save()
+        self.assertFalse(FareCalendarDay.objects.filter(day=old_day).exists())
+        self.assertEqual(self.cell().trips, 1)
+
+        FareCalendarDay.objects.all().delete()
+        self.assertEqual(fares.rebuild(), 1)
+        self.assertEqual(self.cell().available_seats, 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip.delete()
+        self.assertFalse(FareCalendarDay.objects.exists())
+
+    def test_month_endpoint(self):
+        day = timezone.localdate(self.trip.dateDeparture)
+        client = client_for()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/routes/{self.trip.route_id}/fare-calendar/?month={day:%Y-%m}')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.json()['days'][0]['available_seats'], 3)
+        self.assertEqual(client.get('/api/routes/999/fare-calendar/').status_code, 404)
+        self.assertEqual(client.get(f'/api/routes/{self.trip.route_id}/fare-calendar/?month=bad').status_code, 400)
+
+
+class DeferredRefreshTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip, self.trip_seats = make_catalog(make_company(), seats=3)
+        Job.objects.all().delete()
+
+    def test_one_job_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            for trip_seat in self.trip_seats:
+                trip_seat.state = 'ocupado'
+                trip_seat.save()
+            self.trip.basePrice = 20
+            self.trip.save()
+        marks = [callback for callback in callbacks if isinstance(callback, fares._Marks)]
+        self.assertEqual(len(marks), 1)
+        with CaptureQueriesContext(connection) as queries:
+            marks[0]()
+        # Committing only queues the recompute.
+        self.assertEqual(len(queries), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.task, fares.refresh_cells.job_task)
+        day = timezone.localdate(self.trip.dateDeparture).isoformat()
+        self.assertEqual(job.payload['kwargs']['cells'], [[self.trip.route_id, day]])
+        self.assertEqual(job.payload['kwargs']['trip_ids'], [self.trip.pk])
+
+        fares.refresh_cells(**job.payload['kwargs'])
+        cell = FareCalendarDay.objects.get()
+        self.assertEqual((cell.min_price, cell.available_seats), (None, 0))
+
+    def test_rollback_drops_marks(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    self.trip_seats[0].state = 'ocupado'
+                    self.trip_seats[0].save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            self.trip_seats[1].state = 'ocupado'
+            self.trip_seats[1].save()
+        marks = [callback for callback in callbacks if isinstance(callback, fares._Marks)]
+        self.assertEqual(len(marks), 1)
+        self.assertEqual(marks[0].trip_ids, {self.trip.pk})
@@ -0,0 +1,81 @@
+# test_idempotency.py
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Booking, IdempotencyKey, Payment
+
+from .utils import client_for, make_catalog, make_company
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', password='pw')
+        self.trip, self.trip_seats = make_catalog(make_company())
+
+    def book(self, trip_seat, key, user=None):
+        return client_for(user or self.customer).post(
+            '/api/bookings/', {'tripSeat_id': trip_seat.pk}, format='json', HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_the_response(self):
+        first = self.book(self.trip_seats[0], 'key-1')
+        self.assertEqual(first.status_code, 201, first.content)
+        retry = self.book(self.trip_seats[0], 'key-1')
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.assertEqual(self.book(self.trip_seats[0], 'key-1').status_code, 201)
+        self.assertEqual(self.book(self.trip_seats[1], 'key-1').status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_keys_are_per_user(self):
+        self.assertEqual(self.book(self.trip_seats[0], 'key-1').status_code, 201)
+        other = User.objects.create_user('other', password='pw')
+        response = self.book(self.trip_seats[1], 'key-1', user=other)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_failed_create_releases_the_key(self):
+        client = client_for(self.customer)
+        self.assertEqual(client.post('/api/payments/', {}, format='json', HTTP_IDEMPOTENCY_KEY='pay').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.filter(key='pay').exists())
+        booking_id = self.book(self.trip_seats[0], 'key-1').json()['id']
+        response = client.post('/api/payments/', {'booking_id': booking_id}, format='json', HTTP_IDEMPOTENCY_KEY='pay')
+        self.assertEqual(response.status_code, 201, response.content)
+        client.post('/api/payments/', {'booking_id': booking_id}, format='json', HTTP_IDEMPOTENCY_KEY='pay')
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_expired_key_is_claimed_again(self):
+        self.assertEqual(self.book(self.trip_seats[0], 'key-1').status_code, 201)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        response = self.book(self.trip_seats[1], 'key-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Booking.objects.count(), 2)
+
+
+class ReconcilePaymentsTests(TestCase):
+    def test_duplicates_are_marked_and_bookings_paid(self):
+        user = User.objects.create_user('customer', password='pw')
+        _, trip_seats = make_catalog(make_company(), seats=3)
+        paid_twice, paid_once, unpaid = (Booking.objects.create(tripSeat=seat, user=user) for seat in trip_seats)
+        Payment.objects.bulk_create([
+            Payment(booking=paid_twice), Payment(booking=paid_twice), Payment(booking=paid_twice), Payment(booking=paid_once),
+        ])
+        Booking.objects.update(paid=False)
+
+        call_command('reconcile_payments', '--batch-size', '2', '--dry-run', stdout=StringIO())
+        self.assertFalse(Booking.objects.filter(paid=True).exists())
+        call_command('reconcile_payments', '--batch-size', '2', stdout=StringIO())
+        self.assertEqual(set(Booking.objects.filter(paid=True).values_list('pk', flat=True)), {paid_twice.pk, paid_once.pk})
+        first = Payment.objects.filter(booking=paid_twice).order_by('pk').first()
+        self.assertEqual(list(Payment.objects.filter(duplicate_of__isnull=False).values_list('duplicate_of', flat=True)),
+                         [first.pk, first.pk])
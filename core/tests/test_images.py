@@ -0,0 +1,63 @@
+# test_images.py
+import io
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from core.models import Company, Job
+
+from .utils import client_for
+
+
+def png(width=800, height=400):
+    buffer = io.BytesIO()
+    Image.new('RGBA', (width, height), (255, 0, 0, 128)).save(buffer, 'PNG')
+    return SimpleUploadedFile('logo.png', buffer.getvalue(), 'image/png')
+
+
+class LogoTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = client_for(User.objects.create_user('staff', is_staff=True))
+
+    def create(self, logo):
+        payload = {'name': 'Acme', 'address': 'Av. 1', 'phoneNumber': '123', 'description': 'Boats', 'logo': logo}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/companies/', payload, format='multipart')
+
+    @override_settings(JOB_QUEUE_EAGER=True)
+    def test_variants_are_rendered(self):
+        response = self.create(png())
+        self.assertEqual(response.status_code, 201, response.content)
+        data = self.client.get(f"/api/companies/{response.json()['id']}/").json()
+        self.assertEqual(set(data['logo_variants']), {'64', '256'})
+        url = data['logo_variants']['64']['webp']
+        # Served by the web server in front, never by Django.
+        self.assertEqual(self.client.get(url.replace('http://testserver', '')).status_code, 404)
+        with Image.open(default_storage.open(url.replace('http://testserver/media/', ''))) as image:
+            self.assertEqual((image.format, image.size), ('WEBP', (64, 32)))
+
+    def test_processing_is_queued(self):
+        response = self.create(png())
+        self.assertEqual(response.status_code, 201, response.content)
+        job = Job.objects.get(queue='images')
+        self.assertEqual(job.payload['args'][0], response.json()['id'])
+        # Until the job runs there are no variants to link to.
+        self.assertEqual(response.json()['logo_variants'], {})
+        self.assertEqual(Company.objects.get().logo_variants, {})
+
+    def test_invalid_uploads_are_rejected(self):
+        response = self.create(SimpleUploadedFile('logo.png', b'not an image', 'image/png'))
+        self.assertEqual(response.status_code, 400)
+        with override_settings(LOGO_MAX_UPLOAD_BYTES=100):
+            self.assertEqual(self.create(png()).status_code, 400)
+        self.assertFalse(Job.objects.exists())
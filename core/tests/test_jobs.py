@@ -0,0 +1,67 @@
+# test_jobs.py
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import jobs
+from core.models import Job, JobQueue
+
+from .utils import always_fail, calls, record_call
+
+
+@override_settings(JOB_QUEUES={'default': {'concurrency': 1, 'max_attempts': 2, 'backoff_seconds': 10}})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_claim_runs_and_marks_done(self):
+        job = jobs.enqueue(record_call, args=[7])
+        claimed = jobs.claim('default', 'worker', 10)
+        self.assertEqual([c.pk for c in claimed], [job.pk])
+        self.assertEqual(claimed[0].attempts, 1)
+        self.assertTrue(jobs.run(claimed[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('done', None))
+        self.assertEqual(calls, [7])
+
+    def test_claim_respects_queue_concurrency(self):
+        jobs.enqueue(record_call, args=[1])
+        jobs.enqueue(record_call, args=[2])
+        self.assertEqual(len(jobs.claim('default', 'first', 10)), 1)
+        self.assertEqual(jobs.claim('default', 'second', 10), [])
+        self.assertTrue(JobQueue.objects.filter(name='default').exists())
+
+    def test_failure_backs_off_then_fails(self):
+        job = jobs.enqueue(always_fail)
+        before = timezone.now()
+        self.assertFalse(jobs.run(jobs.claim('default', 'worker', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIn('RuntimeError', job.last_error)
+        # First retry: backoff_seconds, +/- 20 % jitter.
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=8))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=12))
+        self.assertEqual(jobs.claim('default', 'worker', 1), [])
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertFalse(jobs.run(jobs.claim('default', 'worker', 1)[0]))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_stale_running_jobs_are_requeued(self):
+        job = jobs.enqueue(record_call, args=[1])
+        jobs.claim('default', 'crashed', 1)
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale('default'), 1)
+        self.assertEqual([c.pk for c in jobs.claim('default', 'worker', 1)], [job.pk])
+
+    def test_unregistered_function_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue(print)
+
+    @override_settings(JOB_QUEUE_EAGER=True)
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(jobs.enqueue(record_call, args=[3]))
+        self.assertEqual(calls, [3])
+        self.assertFalse(Job.objects.exists())
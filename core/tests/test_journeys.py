@@ -0,0 +1,74 @@
+# test_journeys.py
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.journeys import get_index
+from core.models import Route, Trip
+
+from .utils import client_for, make_catalog, make_company
+
+
+@override_settings(JOURNEY_SYNC_SECONDS=0)
+class JourneySearchTests(TestCase):
+    def setUp(self):
+        self.company = make_company()
+        self.trip, _ = make_catalog(self.company, origin='A', destiny='B')
+        self.index = get_index()
+        self.index.next_rebuild = self.index.next_sync = 0
+        self.client = client_for()
+
+    def search(self, **params):
+        return self.client.get('/api/journeys/', {'origin': 'A', 'destiny': 'C', **params})
+
+    def test_connections_respect_transfer_time(self):
+        now = timezone.now()
+        seat = self.trip.seat
+        first_leg = self.trip.route
+        first_leg.duration = timedelta(hours=5)
+        first_leg.save()
+        second_leg = Route.objects.create(company=self.company, origin='B', destiny='C', duration=timedelta(hours=3))
+        # Port names match case- and blank-insensitively.
+        direct = Route.objects.create(company=self.company, origin='a', destiny='c ', duration=timedelta(hours=30))
+        self.trip.dateDeparture = now + timedelta(hours=1)
+        self.trip.save()
+        # Leaves 30 minutes after the first leg arrives: too tight to connect.
+        Trip.objects.create(route=second_leg, seat=seat, basePrice=10, dateDeparture=now + timedelta(hours=6, minutes=30))
+        Trip.objects.create(route=second_leg, seat=seat, basePrice=10, dateDeparture=now + timedelta(hours=8))
+        Trip.objects.create(route=direct, seat=seat, basePrice=5, dateDeparture=now + timedelta(hours=2))
+
+        results = self.search().json()['results']
+        self.assertEqual(len(results), 2)
+        self.assertEqual((results[0]['transfers'], results[0]['price']), (1, 30.0))
+        self.assertEqual(self.search(sort='cheapest').json()['results'][0]['price'], 10.0)
+
+        # Between syncs the search is answered from memory.
+        with override_settings(JOURNEY_SYNC_SECONDS=100):
+            self.index.next_sync = 1e18
+            with CaptureQueriesContext(connection) as queries:
+                self.search()
+            self.assertEqual(len(queries), 0)
+
+        self.trip.delete()
+        self.index.next_sync = 0
+        self.assertEqual(len(self.search().json()['results']), 1)
+        self.assertEqual(self.client.get('/api/journeys/', {'origin': 'A', 'destiny': 'a'}).status_code, 400)
+
+    def test_sync_swaps_in_a_new_snapshot(self):
+        self.trip.dateDeparture = timezone.now() + timedelta(hours=1)
+        self.trip.save()
+        before = self.search(destiny='B').json()['results'][0]['price']
+        snapshot = self.index.by_port
+        departures = list(snapshot['a'])
+
+        seat_type = self.trip.seat.seatType
+        seat_type.aditionalPrice += 7
+        seat_type.save()
+        self.index.next_sync = 0
+        self.assertEqual(self.search(destiny='B').json()['results'][0]['price'], before + 7)
+        # Searches already running keep reading the old snapshot.
+        self.assertIsNot(self.index.by_port, snapshot)
+        self.assertEqual(snapshot['a'], departures)
@@ -0,0 +1,71 @@
+# test_layouts.py
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core import layouts
+from core.models import Seat, SeatType, Ship, ShipLayout
+
+from .utils import client_for, make_catalog, make_company
+
+
+class ShipLayoutTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.trip, trip_seats = make_catalog(make_company(), seats=3)
+        self.seats = [trip_seat.seat for trip_seat in trip_seats]
+        self.ship = self.seats[0].seatType.ship
+        self.client = client_for()
+
+    def layout(self):
+        response = self.client.get(f'/api/ships/{self.ship.pk}/layout/')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_layout_endpoint(self):
+        data = self.layout()
+        self.assertEqual(data['capacity'], 3)
+        self.assertEqual(data['seat_types'][0]['seats'], [[seat.pk, seat.number] for seat in self.seats])
+        self.assertTrue(ShipLayout.objects.filter(ship=self.ship).exists())
+
+    def test_seat_changes_rebuild_the_layout(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            premium = SeatType.objects.create(ship=self.ship, aditionalPrice=9)
+            Seat.objects.create(seatType=premium, number=10)
+        data = self.layout()
+        self.assertEqual(data['capacity'], 4)
+        self.assertEqual(data['seat_types'][1]['aditionalPrice'], 9)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seats[2].delete()
+        self.assertEqual(ShipLayout.objects.get(ship=self.ship).capacity, 3)
+
+    def test_moving_a_seat_type_rebuilds_both_ships(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            premium = SeatType.objects.create(ship=self.ship, aditionalPrice=9)
+            Seat.objects.create(seatType=premium, number=10)
+            other = Ship.objects.create(company=self.ship.company, name='Tuky', construction_year=2001)
+        with self.captureOnCommitCallbacks(execute=True):
+            premium.ship = other
+            premium.save()
+        self.assertEqual(ShipLayout.objects.get(ship=self.ship).capacity, 3)
+        self.assertEqual(ShipLayout.objects.get(ship=other).capacity, 1)
+
+    def test_deleting_the_ship_removes_its_layout(self):
+        ship_id = self.ship.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ship.delete()
+        self.assertFalse(ShipLayout.objects.filter(ship_id=ship_id).exists())
+
+    def test_missing_layouts_are_built_on_read_and_by_the_command(self):
+        ShipLayout.objects.all().delete()
+        self.assertEqual(layouts.get(self.ship.pk)[0], 3)
+        self.assertTrue(ShipLayout.objects.filter(ship=self.ship).exists())
+        self.assertIsNone(layouts.get(self.ship.pk + 1000))
+
+        ShipLayout.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_ship_layouts', stdout=out)
+        self.assertIn("Rebuilt 1 ship layouts.", out.getvalue())
+        self.assertEqual(ShipLayout.objects.get(ship=self.ship).capacity, 3)
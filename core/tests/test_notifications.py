@@ -0,0 +1,76 @@
+# test_notifications.py
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core import notifications
+from core.models import Booking, Notification, NotificationCounter
+
+from .utils import client_for, make_catalog, make_company
+
+
+@override_settings(NOTIFICATION_FANOUT_BATCH_SIZE=2)
+class FanOutTests(TestCase):
+    def setUp(self):
+        self.trip, trip_seats = make_catalog(make_company(), seats=5)
+        self.users = [User.objects.create_user(f'passenger{n}') for n in range(5)]
+        for user, trip_seat in zip(self.users, trip_seats):
+            Booking.objects.create(tripSeat=trip_seat, user=user)
+        # A second booking must not notify its user twice.
+        Booking.objects.create(tripSeat=trip_seats[0], user=self.users[1])
+
+    @override_settings(JOB_QUEUE_EAGER=True)
+    def test_fan_out_endpoint(self):
+        staff = User.objects.create_user('staff', is_staff=True)
+        payload = {'trip_id': self.trip.pk, 'topic': 'Delay', 'body': 'Two hours late'}
+        response = client_for(staff).post('/api/notifications/fan-out/', payload, format='json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(sorted(Notification.objects.values_list('user_id', flat=True)), [u.pk for u in self.users])
+
+        self.assertEqual(client_for(self.users[0]).post('/api/notifications/fan-out/', payload, format='json').status_code, 403)
+        self.assertEqual(client_for(staff).post('/api/notifications/fan-out/', {'topic': 'a', 'body': 'b'}, format='json').status_code, 400)
+
+    def test_retried_fan_out_skips_notified_users(self):
+        real_bump = notifications.bump_unread
+        batches = []
+
+        def failing_second_batch(user_ids, delta=1):
+            batches.append(user_ids)
+            if len(batches) == 2:
+                raise RuntimeError("worker died")
+            return real_bump(user_ids, delta)
+
+        with mock.patch.object(notifications, 'bump_unread', failing_second_batch):
+            with self.assertRaises(RuntimeError):
+                notifications.fan_out('Delay', 'late', trip_id=self.trip.pk, key='retry')
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(notifications.fan_out('Delay', 'late', trip_id=self.trip.pk, key='retry'), 3)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(list(NotificationCounter.objects.values_list('unread', flat=True)), [1] * 5)
+
+
+class UnreadCounterTests(TestCase):
+    def test_counter_follows_reads(self):
+        user = User.objects.create_user('reader')
+        client = client_for(user)
+        first = Notification.objects.create(user=user, topic='a', body='b')
+        Notification.objects.create(user=user, topic='a', body='c')
+        with self.assertNumQueries(1):
+            self.assertEqual(client.get('/api/notifications/unread-count/').json(), {'unread': 2})
+
+        response = client.post('/api/notifications/mark-read/', {'ids': [first.pk]}, format='json')
+        self.assertEqual(response.json(), {'updated': 1, 'unread': 1})
+        # Marking an already read notification again changes nothing.
+        self.assertEqual(client.post('/api/notifications/mark-read/', {'ids': [first.pk]}, format='json').json(),
+                         {'updated': 0, 'unread': 1})
+        self.assertEqual(client.post('/api/notifications/mark-read/', {}, format='json').json(), {'updated': 1, 'unread': 0})
+
+        Notification.objects.create(user=user, topic='a', body='d').delete()
+        self.assertEqual(notifications.unread_count(user), 0)
+
+    def test_users_only_see_their_notifications(self):
+        owner, other = User.objects.create_user('owner'), User.objects.create_user('other')
+        notification = Notification.objects.create(user=owner, topic='a', body='b')
+        self.assertEqual(client_for(other).get(f'/api/notifications/{notification.pk}/').status_code, 404)
+        self.assertEqual(client_for(other).get('/api/notifications/').json()['count'], 0)
@@ -0,0 +1,39 @@
+# test_overview.py
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import layouts
+from core.models import Seat, SeatType
+
+from .utils import client_for, make_catalog, make_company
+
+
+class TripOverviewTests(TestCase):
+    def test_overview_in_three_queries(self):
+        trip, trip_seats = make_catalog(make_company(), seats=4)
+        ship = trip.seat.seatType.ship
+        # A seat type that is not offered on this trip.
+        premium = SeatType.objects.create(ship=ship, aditionalPrice=20)
+        extra = Seat.objects.create(seatType=premium, number=9)
+        trip_seats[1].state = 'ocupado'
+        trip_seats[1].save()
+        layouts.rebuild()
+
+        client = client_for()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(f'/api/trips/{trip.pk}/overview/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(queries), 3)
+        data = response.json()
+        self.assertEqual(len(data['companies']), 1)
+        self.assertEqual(data['ship']['id'], ship.pk)
+        self.assertEqual(len(data['seats']), 5)
+        self.assertEqual(data['seats'][-1], {
+            'id': extra.pk, 'number': 9, 'seat_type_id': premium.pk, 'trip_seat_id': None, 'state': None,
+        })
+        self.assertEqual(data['availability'], {'disponible': 3, 'ocupado': 1, 'reservado': 0})
+        by_type = {seat_type['id']: seat_type for seat_type in data['seat_types']}
+        self.assertEqual((by_type[trip.seat.seatType_id]['trip_seats'], by_type[trip.seat.seatType_id]['available']), (4, 3))
+        self.assertEqual(by_type[premium.pk]['trip_seats'], 0)
+        self.assertEqual(client.get('/api/trips/999/overview/').status_code, 404)
@@ -0,0 +1,42 @@
+# test_pagination.py
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from core.models import TripSeat
+
+from .utils import client_for, make_catalog, make_company
+
+
+class CachedCountPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        _, self.trip_seats = make_catalog(make_company(), seats=30)
+        self.client = client_for(User.objects.create_user('staff', is_staff=True))
+
+    def test_count_is_cached_per_filter(self):
+        data = self.client.get('/api/trip-seats/').json()
+        self.assertEqual((data['count'], data['count_approximate']), (30, False))
+        TripSeat.objects.filter(pk=self.trip_seats[0].pk).delete()
+        self.assertEqual(self.client.get('/api/trip-seats/').json()['count'], 30)
+        self.assertEqual(self.client.get('/api/trip-seats/?exact_count=1').json()['count'], 29)
+        # The exact count refreshed the cached one.
+        self.assertEqual(self.client.get('/api/trip-seats/').json()['count'], 29)
+        self.assertEqual(self.client.get('/api/trip-seats/?state=ocupado').json()['count'], 0)
+
+    @override_settings(PAGINATION_APPROXIMATE_COUNT_THRESHOLD=5)
+    def test_large_tables_use_the_planner_estimate(self):
+        with mock.patch('core.pagination.estimate_count', return_value=100):
+            data = self.client.get('/api/trip-seats/').json()
+            self.assertEqual((data['count'], data['count_approximate']), (100, True))
+            self.assertIsNotNone(data['next'])
+            # Page bounds come from the rows, not from the estimate.
+            data = self.client.get('/api/trip-seats/?page=2').json()
+            self.assertEqual(len(data['results']), 10)
+            self.assertIsNone(data['next'])
+            self.assertEqual(self.client.get('/api/trip-seats/?page=4').status_code, 404)
+            data = self.client.get('/api/trip-seats/?exact_count=true').json()
+            self.assertEqual((data['count'], data['count_approximate']), (30, False))
@@ -0,0 +1,50 @@
+# test_renderers.py
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import msgpack
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core.models import Booking
+from core.renderers import FastJSONRenderer, MessagePackRenderer
+
+from .utils import client_for, make_catalog, make_company
+
+
+class RendererTests(TestCase):
+    def setUp(self):
+        self.company = make_company()
+        departure = (timezone.now() + timedelta(days=3)).replace(microsecond=123456)
+        self.trip, self.trip_seats = make_catalog(self.company, seats=3, departure=departure)
+        self.user = User.objects.create_user('staff', is_staff=True)
+        self.client = client_for(self.user)
+
+    def test_content_negotiation(self):
+        response = self.client.get('/api/trip-seats/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['count'], 3)
+        self.assertEqual(self.client.get('/api/trip-seats/').json()['count'], 3)
+
+        payload = msgpack.packb({'company_id': self.company.pk, 'origin': 'Yurimaguas', 'destiny': 'Nauta'})
+        response = self.client.post('/api/routes/', payload, content_type='application/msgpack')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.client.post('/api/routes/', b'{bad', content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get('/api/routes/', HTTP_ACCEPT='text/html').status_code, 200)
+
+    def test_values_rows_match_serializer_datetimes(self):
+        booking = Booking.objects.create(tripSeat=self.trip_seats[0], user=self.user)
+        serialized = self.client.get(f'/api/trips/{self.trip.pk}/').json()['dateDeparture']
+        self.assertTrue(serialized.endswith('.123456Z'), serialized)
+
+        row = self.client.get('/api/bookings/my-trips/').json()['results'][0]
+        self.assertEqual(row['dateDeparture'], serialized)
+        self.assertEqual(row['booked_at'], self.client.get(f'/api/bookings/{booking.pk}/').json()['created_at'])
+        response = self.client.get('/api/bookings/my-trips/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['results'][0]['dateDeparture'], serialized)
+
+    @override_settings(TIME_ZONE='America/Lima')
+    def test_datetimes_use_current_time_zone(self):
+        value = datetime(2026, 1, 2, 15, 0, tzinfo=dt_timezone.utc)
+        self.assertEqual(FastJSONRenderer().render({'at': value}), b'{"at":"2026-01-02T10:00:00-05:00"}')
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render({'at': value})), {'at': '2026-01-02T10:00:00-05:00'})
@@ -0,0 +1,102 @@
+# test_retention.py
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from core import availability, jobs, retention, sharding
+from core.models import Booking, ChangeLog, Event, Job, Notification, NotificationCounter, Trip, TripSeat
+from core.notifications import mark_read
+
+from .test_sharding import SHARDS, ShardedTestCase
+from .utils import make_catalog, make_company, record_call
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('customer', password='pw')
+
+    def prune(self, name, **kwargs):
+        return sum(deleted for _, _, deleted in retention.prune(name, **kwargs))
+
+    def age(self, name, queryset, field='created_at'):
+        queryset.update(**{field: retention.cutoff(name) - timedelta(days=1)})
+
+    def test_notifications(self):
+        old = Notification.objects.create(user=self.user, topic='t', body='old')
+        new = Notification.objects.create(user=self.user, topic='t', body='new')
+        self.age('notifications', Notification.objects.filter(pk=old.pk))
+        self.assertEqual(self.prune('notifications', dry_run=True), 1)
+        self.assertTrue(Notification.objects.filter(pk=old.pk).exists())
+        self.assertEqual(self.prune('notifications', batch_size=1), 1)
+        self.assertEqual(list(Notification.objects.values_list('pk', flat=True)), [new.pk])
+
+    def test_notifications_fix_unread_counters(self):
+        other = User.objects.create_user('other', password='pw')
+        for user, bodies in ((self.user, 'abc'), (other, 'de')):
+            for body in bodies:
+                Notification.objects.create(user=user, topic='t', body=body)
+        mark_read(self.user, [Notification.objects.get(body='c').pk])
+        self.age('notifications', Notification.objects.exclude(body='e'))
+        self.assertEqual(self.prune('notifications'), 4)
+        counters = dict(NotificationCounter.objects.values_list('user_id', 'unread'))
+        self.assertEqual(counters, {self.user.pk: 0, other.pk: 1})
+
+    def test_jobs_keep_queued_and_recent(self):
+        done = jobs.enqueue(record_call, args=[1])
+        queued = jobs.enqueue(record_call, args=[2])
+        recent = jobs.enqueue(record_call, args=[3])
+        Job.objects.filter(pk__in=[done.pk, recent.pk]).update(status='done')
+        self.age('jobs', Job.objects.filter(pk__in=[done.pk, queued.pk]), field='updated_at')
+        self.assertEqual(self.prune('jobs'), 1)
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {queued.pk, recent.pk})
+
+    def test_trip_seats_with_bookings_are_kept(self):
+        departed = retention.cutoff('trip_seats') - timedelta(days=1)
+        _, trip_seats = make_catalog(make_company(), seats=3, departure=departed)
+        Booking.objects.create(tripSeat=trip_seats[0], user=self.user)
+        self.assertEqual(self.prune('trip_seats'), 2)
+        self.assertEqual(list(TripSeat.objects.values_list('pk', flat=True)), [trip_seats[0].pk])
+
+    def test_trip_seats_skip_signals_but_keep_availability(self):
+        departed = retention.cutoff('trip_seats') - timedelta(days=1)
+        trip, _ = make_catalog(make_company(), seats=3, departure=departed)
+        changes, events = ChangeLog.objects.count(), Event.objects.count()
+        Job.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.prune('trip_seats'), 3)
+        self.assertEqual(Trip.objects.get(pk=trip.pk).available_seats, 0)
+        self.assertEqual(availability.reconcile([trip.pk], fix=False), 0)
+        # Expired rows leave no change log entries, fare marks or events.
+        self.assertEqual(ChangeLog.objects.count(), changes)
+        self.assertEqual(Event.objects.count(), events)
+        self.assertFalse(Job.objects.exists())
+
+    def test_pin_is_released_between_batches(self):
+        for body in 'ab':
+            Notification.objects.create(user=self.user, topic='t', body=body)
+        self.age('notifications', Notification.objects.all())
+        batches = 0
+        for _ in retention.prune('notifications', batch_size=1):
+            self.assertIsNone(sharding._pinned.get())
+            batches += 1
+        self.assertEqual(batches, 2)
+
+
+@skipUnless(set(SHARDS) <= set(settings.DATABASES), "needs the shard aliases of e_project.test_settings")
+@override_settings(SHARD_DATABASES=SHARDS)
+class ShardedRetentionTests(ShardedTestCase):
+    def test_prunes_every_shard_without_leaking_the_pin(self):
+        departed = retention.cutoff('trip_seats') - timedelta(days=1)
+        trips = [make_catalog(make_company(name), departure=departed)[0] for name in ('A', 'B', 'C')]
+        aliases = []
+        for alias, _, deleted in retention.prune('trip_seats'):
+            self.assertIsNone(sharding._pinned.get())
+            aliases.append(alias)
+            self.assertEqual(deleted, 2)
+        self.assertEqual(aliases, SHARDS)
+        for alias, trip in zip(SHARDS, trips):
+            self.assertFalse(TripSeat.objects.using(alias).exists())
+            self.assertEqual(Trip.objects.using(alias).get(pk=trip.pk).available_seats, 0)
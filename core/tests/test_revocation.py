@@ -0,0 +1,81 @@
+# test_revocation.py
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from core import revocation
+from core.models import RevokedToken
+from core.revocation import BloomFilter, RevocationIndex
+
+from .utils import client_for
+
+
+class BloomFilterTests(TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(capacity=100)
+        keys = [f'jti-{n}' for n in range(500)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        self.assertEqual(bloom.count, 500)
+        false_positives = sum(f'other-{n}' in bloom for n in range(1000))
+        self.assertLess(false_positives, 50)
+
+
+class RevocationIndexTests(TestCase):
+    def test_sync_reads_rows_committed_out_of_order(self):
+        expires = timezone.now() + timedelta(days=1)
+        RevokedToken.objects.create(jti='a', expires_at=expires)
+        late = RevokedToken.objects.create(jti='late', expires_at=expires)
+        RevokedToken.objects.create(jti='c', expires_at=expires)
+        late_id = late.pk
+        late.delete()  # Not committed yet when the index is built.
+        index = RevocationIndex()
+        index.rebuild()
+        count = index.bloom.count
+        RevokedToken.objects.create(pk=late_id, jti='late', expires_at=expires)
+        index.sync()
+        index.sync()
+        self.assertIn('late', index.bloom)
+        self.assertEqual(index.bloom.count, count + 1)
+
+
+class RefreshRevocationTests(TestCase):
+    def setUp(self):
+        revocation.index.reset()
+        self.addCleanup(revocation.index.reset)
+        self.refresh = str(RefreshToken.for_user(User.objects.create_user('rider')))
+        self.client = client_for()
+
+    def refresh_status(self):
+        return self.client.post('/api/token/refresh/', {'refresh': self.refresh}).status_code
+
+    def test_logout_revokes_refresh_token(self):
+        self.assertEqual(self.refresh_status(), 200)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.refresh_status(), 200)
+        self.assertFalse(any('revokedtoken' in query['sql'] for query in queries.captured_queries))
+
+        self.assertEqual(self.client.post('/api/logout/', {'refresh': self.refresh}).status_code, 200)
+        self.assertEqual(self.refresh_status(), 401)
+        # Another process learns about it from the table.
+        revocation.index.reset()
+        self.assertEqual(self.refresh_status(), 401)
+
+    @override_settings(REVOCATION_CHECK='off')
+    def test_check_can_be_disabled(self):
+        self.client.post('/api/logout/', {'refresh': self.refresh})
+        self.assertEqual(self.refresh_status(), 200)
+
+    def test_prune_drops_expired_jtis(self):
+        RevokedToken.objects.create(jti='old', expires_at=timezone.now() - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='new', expires_at=timezone.now() + timedelta(days=1))
+        call_command('prune_revoked_tokens', stdout=StringIO())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['new'])
@@ -0,0 +1,81 @@
+# test_schedules.py
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core import schedules
+from core.models import FareCalendarDay, Trip, TripSchedule, TripSeat
+
+from .utils import client_for, make_catalog, make_company
+
+
+class TripScheduleTests(TestCase):
+    def setUp(self):
+        self.trip, _ = make_catalog(make_company(), seats=3)
+        self.route = self.trip.route
+        self.ship = self.trip.seat.seatType.ship
+        self.today = timezone.localdate()
+        self.customer = client_for(User.objects.create_user('customer'))
+
+    def create_schedule(self, **fields):
+        payload = {
+            'route_id': self.route.pk, 'ship_id': self.ship.pk, 'basePrice': 20,
+            'departure_time': '08:30', 'weekdays': '0123456', 'start_date': str(self.today), **fields,
+        }
+        staff = client_for(User.objects.create_user('staff', is_staff=True))
+        response = staff.post('/api/trip-schedules/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()['id']
+
+    def test_creation_materializes_the_window(self):
+        schedule_id = self.create_schedule()
+        self.assertEqual(Trip.objects.filter(schedule_id=schedule_id).count(), 15)
+        self.assertEqual(TripSeat.objects.filter(trip__schedule_id=schedule_id).count(), 45)
+        self.assertEqual(schedules.materialize_due(), 0)
+        self.assertEqual(self.customer.post('/api/trip-schedules/', {}, format='json').status_code, 403)
+
+    def test_weekdays_and_end_date(self):
+        schedule_id = self.create_schedule(weekdays=str(self.today.weekday()), end_date=str(self.today + timedelta(days=7)))
+        days = sorted(
+            timezone.localdate(departure)
+            for departure in Trip.objects.filter(schedule_id=schedule_id).values_list('dateDeparture', flat=True)
+        )
+        self.assertEqual(days, [self.today, self.today + timedelta(days=7)])
+
+    def test_later_dates_materialize_on_demand(self):
+        schedule_id = self.create_schedule()
+        far = self.today + timedelta(days=40)
+        client = client_for()
+        response = client.get(f'/api/trips/availability/?date={far}&origin=Iquitos')
+        self.assertEqual(response.status_code, 200, response.content)
+        results = response.json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0]['materialized'])
+        self.assertEqual((results[0]['available_seats'], results[0]['min_price']), (3, 25))
+        self.assertEqual(client.get(f'/api/trips/availability/?date={far}&origin=Nauta').json()['results'], [])
+        # Listing does not create rows.
+        self.assertEqual(Trip.objects.count(), 16)
+
+        first = self.customer.post(f'/api/trip-schedules/{schedule_id}/departures/', {'date': str(far)}, format='json')
+        self.assertEqual(first.status_code, 200, first.content)
+        second = self.customer.post(f'/api/trip-schedules/{schedule_id}/departures/', {'date': str(far)}, format='json')
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        results = client.get(f'/api/trips/availability/?date={far}').json()['results']
+        self.assertEqual(len(results), 1)
+        self.assertTrue(results[0]['materialized'])
+        self.assertEqual(results[0]['available_seats'], 3)
+        self.assertTrue(FareCalendarDay.objects.filter(route=self.route, day=far).exists())
+        self.assertEqual(client.get('/api/trips/availability/').status_code, 400)
+
+    def test_materialize_command_extends_the_window(self):
+        schedule_id = self.create_schedule()
+        until = self.today + timedelta(days=10)
+        Trip.objects.filter(schedule_id=schedule_id, dateDeparture__date__gt=until).delete()
+        TripSchedule.objects.filter(pk=schedule_id).update(materialized_until=until)
+        call_command('materialize_schedules', stdout=StringIO())
+        self.assertEqual(Trip.objects.filter(schedule_id=schedule_id).count(), 15)
+        self.assertEqual(TripSchedule.objects.get(pk=schedule_id).materialized_until, self.today + timedelta(days=14))
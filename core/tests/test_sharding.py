@@ -0,0 +1,117 @@
+# test_sharding.py
+from io import StringIO
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import changefeed, sharding
+from core.journeys import JourneyIndex
+from core.models import Booking, Company, Route, Trip, UserCompany
+from core.notifications import recipients
+
+from .utils import client_for, make_catalog, make_company
+
+SHARDS = ['default', 'shard1', 'shard2']
+
+
+@skipUnless(set(SHARDS) <= set(settings.DATABASES), "needs the shard aliases of e_project.test_settings")
+@override_settings(SHARD_DATABASES=SHARDS)
+class ShardedTestCase(TestCase):
+    databases = set(SHARDS)
+
+    def setUp(self):
+        for alias in SHARDS[1:]:
+            sharding.reserve_ids(alias)
+        sharding._company_shards.clear()
+        self.addCleanup(sharding._company_shards.clear)
+
+
+class ShardRoutingTests(ShardedTestCase):
+    def test_rows_follow_their_company(self):
+        companies = [make_company(name) for name in ('A', 'B', 'C')]
+        self.assertEqual([company.shard for company in companies], SHARDS)
+        # Reference rows are copied to every shard.
+        for alias in SHARDS:
+            self.assertEqual(Company.objects.using(alias).count(), 3)
+
+        trips = [make_catalog(company)[0] for company in companies]
+        for alias, trip in zip(SHARDS, trips):
+            self.assertEqual(trip._state.db, alias)
+            self.assertEqual(sharding.shard_for_pk(trip.pk), alias)
+            self.assertEqual(Trip.objects.using(alias).filter(pk=trip.pk).count(), 1)
+        self.assertFalse(Trip.objects.using('default').filter(pk=trips[2].pk).exists())
+
+    def test_api_reads_and_writes_across_shards(self):
+        staff = User.objects.create_user('staff', password='pw', is_staff=True)
+        companies = [make_company(name) for name in ('A', 'B', 'C')]
+        trips = [make_catalog(company)[0] for company in companies]
+        client = client_for(staff)
+
+        listing = client.get('/api/trips/').json()
+        self.assertEqual(sorted(row['id'] for row in listing['results']), sorted(trip.pk for trip in trips))
+        detail = client.get(f'/api/trips/{trips[2].pk}/')
+        self.assertEqual(detail.json()['route']['company']['name'], 'C')
+
+        response = client.post('/api/routes/', {'company_id': companies[1].pk, 'origin': 'X', 'destiny': 'Y'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(sharding.shard_for_pk(response.json()['id']), 'shard1')
+        self.assertTrue(Route.objects.using('shard1').filter(pk=response.json()['id']).exists())
+
+    def test_customer_and_operator_scopes(self):
+        companies = [make_company(name) for name in ('A', 'B', 'C')]
+        catalogs = [make_catalog(company) for company in companies]
+        customer = User.objects.create_user('customer', password='pw')
+        client = client_for(customer)
+        booked = [client.post('/api/bookings/', {'tripSeat_id': trip_seats[0].pk}, format='json')
+                  for _, trip_seats in catalogs[1:]]
+        self.assertEqual([response.status_code for response in booked], [201, 201])
+        listing = client.get('/api/bookings/', {'ordering': '-id'}).json()
+        self.assertEqual([row['id'] for row in listing['results']], [booked[1].json()['id'], booked[0].json()['id']])
+
+        operator = User.objects.create_user('operator', password='pw')
+        UserCompany.objects.create(user=operator, empresa=companies[2])
+        trips = client_for(operator).get('/api/trips/').json()['results']
+        self.assertEqual([row['id'] for row in trips], [catalogs[2][0].pk])
+
+    def test_change_feed_reads_each_shard(self):
+        cursor = changefeed.head_cursor()
+        companies = [make_company(name) for name in ('A', 'B', 'C')]
+        routes = [Route.objects.create(company=company, origin='A', destiny='B') for company in companies]
+        page = client_for().get('/api/changes/', {'cursor': cursor}).json()
+        actions = {c['id']: c['action'] for c in page['results'] if c['model'] == 'route'}
+        self.assertEqual(actions, {route.pk: 'created' for route in routes})
+
+    def test_directory_readers_span_shards(self):
+        companies = [make_company(name) for name in ('A', 'B')]
+        (trip_a, seats_a), (trip_b, seats_b) = (make_catalog(company) for company in companies)
+        first, second = (User.objects.create_user(name) for name in ('first', 'second'))
+        Booking.objects.create(user=first, tripSeat=seats_a[0])
+        Booking.objects.create(user=second, tripSeat=seats_b[0])
+        Booking.objects.create(user=first, tripSeat=seats_b[1])
+        self.assertEqual(recipients(trip_id=trip_b.pk), [first.pk, second.pk])
+        self.assertEqual(recipients(after=first.pk), [second.pk])
+
+        index = JourneyIndex()
+        index.rebuild()
+        self.assertEqual(set(index.legs), {trip_a.pk, trip_b.pk})
+
+
+class SeedDataTests(ShardedTestCase):
+    def test_seeded_rows_land_on_their_company_shard(self):
+        call_command(
+            'seed_data', companies=3, ships_per_company=1, seats_per_type=2, routes_per_company=1,
+            days=2, users=5, stdout=StringIO(),
+        )
+        companies = list(Company.objects.order_by('pk'))
+        self.assertEqual([company.shard for company in companies], SHARDS)
+        for alias in SHARDS:
+            self.assertEqual(Company.objects.using(alias).count(), 3)
+            self.assertEqual(User.objects.using(alias).count(), 5)
+        for company in companies:
+            routes = list(Route.objects.using(company.shard).filter(company=company).values_list('pk', flat=True))
+            self.assertEqual(len(routes), 1)
+            self.assertEqual(sharding.shard_for_pk(routes[0]), company.shard)
+            self.assertEqual(Trip.objects.using(company.shard).filter(route_id=routes[0]).count(), 2)
@@ -0,0 +1,48 @@
+# test_startup.py
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+
+from core.startup import parse_import_time, warm_up
+
+
+class WarmUpTests(SimpleTestCase):
+    def test_warm_up_needs_no_database(self):
+        # SimpleTestCase fails any query.
+        warm_up()
+
+    def test_boot_imports_the_api_but_not_the_docs(self):
+        script = (
+            "import json, sys, e_project.wsgi; "
+            "print(json.dumps({name: name in sys.modules for name in "
+            "('core.views', 'core.serializers', 'drf_yasg.views', 'PIL.Image')}))"
+        )
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'e_project.test_settings'}
+        result = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(json.loads(result.stdout.splitlines()[-1]), {
+            'core.views': True, 'core.serializers': True, 'drf_yasg.views': False, 'PIL.Image': False,
+        })
+
+    def test_parse_import_time(self):
+        lines = [
+            'import time: self [us] | cumulative | imported package',
+            'import time:       120 |        120 |     _io',
+            'import time:      1500 |       4000 |   django.urls',
+            'unrelated output',
+        ]
+        self.assertEqual(parse_import_time(lines), [('_io', 120, 120, 2), ('django.urls', 1500, 4000, 1)])
+
+
+class LazySchemaViewTests(TestCase):
+    def test_schema_is_built_on_first_request(self):
+        response = self.client.get('/swagger/?format=openapi')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/trips/', json.loads(response.content)['paths'])
+        self.assertEqual(self.client.get('/swagger.json').status_code, 200)
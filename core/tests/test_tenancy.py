@@ -0,0 +1,73 @@
+# test_tenancy.py
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Route, Rol, UserCompany
+
+from .utils import client_for, make_catalog, make_company
+
+
+class CompanyScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.company = make_company()
+        self.trip, self.trip_seats = make_catalog(self.company)
+        self.other = make_company('Other')
+        self.other_route = Route.objects.create(company=self.other, origin='Nauta', destiny='Requena')
+        self.operator = User.objects.create_user('operator')
+        self.membership = UserCompany.objects.create(
+            empresa=self.company, user=self.operator, rol=Rol.objects.create(name='admin'),
+        )
+
+    def route_ids(self, client):
+        return [route['id'] for route in client.get('/api/routes/').json()['results']]
+
+    def test_operators_see_their_companies(self):
+        client = client_for(self.operator)
+        self.assertEqual(self.route_ids(client), [self.trip.route_id])
+        self.assertEqual(len(self.route_ids(client_for())), 2)
+        self.assertEqual(client.get(f'/api/routes/{self.other_route.pk}/').status_code, 404)
+        # Memberships are cached after the first request.
+        with CaptureQueriesContext(connection) as queries:
+            client.get('/api/ships/')
+        self.assertFalse(any('core_usercompany' in query['sql'] for query in queries.captured_queries))
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.assertEqual(len(client_for(staff).get('/api/companies/').json()['results']), 2)
+
+    def test_writes_stay_inside_the_scope(self):
+        client = client_for(self.operator)
+        response = client.post('/api/routes/', {'company_id': self.other.pk, 'origin': 'X', 'destiny': 'Y'}, format='json')
+        self.assertEqual(response.status_code, 403, response.content)
+        self.assertFalse(Route.objects.filter(origin='X').exists())
+        response = client.post('/api/routes/', {'company_id': self.company.pk, 'origin': 'X', 'destiny': 'Y'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        customer = client_for(User.objects.create_user('customer'))
+        response = customer.post('/api/routes/', {'company_id': self.other.pk, 'origin': 'X', 'destiny': 'Y'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_membership_changes_drop_the_cache(self):
+        client = client_for(self.operator)
+        self.assertEqual(self.route_ids(client), [self.trip.route_id])
+        self.membership.empresa = self.other
+        self.membership.save()
+        self.assertEqual(self.route_ids(client), [self.other_route.pk])
+        self.membership.delete()
+        self.assertEqual(len(self.route_ids(client)), 2)
+
+    def test_write_roles(self):
+        trip_seat = self.trip_seats[0]
+        path = f'/api/trip-seats/{trip_seat.pk}/'
+        customer = client_for(User.objects.create_user('customer'))
+        self.assertEqual(customer.patch(path, {'state': 'ocupado'}, format='json').status_code, 403)
+        viewer = User.objects.create_user('viewer')
+        UserCompany.objects.create(empresa=self.company, user=viewer, rol=Rol.objects.create(name='viewer'))
+        with override_settings(TENANCY_WRITE_ROLES=['ADMIN']):
+            self.assertEqual(client_for(viewer).get(path).status_code, 200)
+            self.assertEqual(client_for(viewer).patch(path, {'state': 'ocupado'}, format='json').status_code, 403)
+            self.assertEqual(client_for(self.operator).patch(path, {'state': 'ocupado'}, format='json').status_code, 200)
+        # Unset, every membership may write.
+        self.assertEqual(client_for(viewer).patch(path, {'state': 'disponible'}, format='json').status_code, 200)
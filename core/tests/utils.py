@@ -0,0 +1,46 @@
+# utils.py
+"""Fixtures shared by the test modules."""
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core import jobs
+from core.models import Company, Route, Seat, SeatType, Ship, Trip, TripSeat
+
+calls = []
+
+
+@jobs.task
+def record_call(value):
+    calls.append(value)
+
+
+@jobs.task
+def always_fail():
+    raise RuntimeError("boom")
+
+
+def make_company(name='Acme'):
+    return Company.objects.create(name=name, address='Av. 1', phoneNumber='123', description='Boats')
+
+
+def make_catalog(company, seats=2, departure=None, origin='Iquitos', destiny='Pucallpa'):
+    """A ship with ``seats`` seats of one seat type and one trip of a new route; returns ``(trip, trip_seats)``."""
+    ship = Ship.objects.create(company=company, name='Gilmer', construction_year=2001)
+    seat_type = SeatType.objects.create(ship=ship, aditionalPrice=5)
+    seat_rows = [Seat.objects.create(seatType=seat_type, number=number + 1) for number in range(seats)]
+    route = Route.objects.create(company=company, origin=origin, destiny=destiny)
+    trip = Trip.objects.create(
+        route=route, seat=seat_rows[0], basePrice=10,
+        dateDeparture=departure or timezone.now() + timedelta(days=2),
+    )
+    trip_seats = [TripSeat.objects.create(trip=trip, seat=seat, state='disponible') for seat in seat_rows]
+    return trip, trip_seats
+
+
+def client_for(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
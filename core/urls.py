@@ -2,9 +2,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
+from .streams import live_events
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
+    TokenBlacklistView,
 )
 
 # Create a router and register our viewsets with it
@@ -20,6 +22,7 @@ router.register(r'seat-types', views.SeatTypeViewSet, basename='seattype')
 router.register(r'seats', views.SeatViewSet, basename='seat')
 router.register(r'routes', views.RouteViewSet, basename='route')
 router.register(r'trips', views.TripViewSet, basename='trip')
+router.register(r'trip-schedules', views.TripScheduleViewSet, basename='tripschedule')
 router.register(r'trip-seats', views.TripSeatViewSet, basename='tripseat')
 router.register(r'bookings', views.BookingViewSet, basename='booking')
 router.register(r'payment-methods', views.PaymentMethodViewSet, basename='paymentmethod')
@@ -31,5 +34,11 @@ urlpatterns = [
     path('api-auth/', include('rest_framework.urls')),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),  
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),  
+    path('logout/', TokenBlacklistView.as_view(), name='token_revoke'),
     path('register/', views.RegisterView.as_view(), name='register'),  
+    path('changes/', views.ChangeFeedView.as_view(), name='change_feed'),
+    path('events/', live_events, name='live_events'),
+    path('batch/', views.BatchView.as_view(), name='batch'),
+    path('journeys/', views.JourneyPlannerView.as_view(), name='journey_planner'),
+    path('db-pool/', views.DatabasePoolView.as_view(), name='db_pool'),
 ]
\ No newline at end of file
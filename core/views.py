@@ -1,31 +1,54 @@
 # views.py
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
+import os
+from datetime import timedelta
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import transaction
+from django.db.models import F, Min, Q
+from django.utils import timezone
+from django.http import Http404
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.views import APIView
 
 from .models import (
     Notification, Company, Rol, UserCompany, Ship, SeatType, 
-    Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment
+    Seat, Route, Trip, TripSeat, Booking, PaymentMethod, Payment, TripSchedule
 )
 from .serializers import (
     NotificationSerializer, CompanySerializer, CompanyListSerializer,
     RolSerializer, UserCompanySerializer, ShipSerializer, ShipListSerializer,
     SeatTypeSerializer, SeatSerializer, RouteSerializer, RouteListSerializer,
     TripSerializer, TripListSerializer, TripSeatSerializer, BookingSerializer,
-    PaymentMethodSerializer, PaymentSerializer, UserSerializer, RegisterSerializer
+    PaymentMethodSerializer, PaymentSerializer, UserSerializer, RegisterSerializer,
+    NotificationFanOutSerializer, NotificationMarkReadSerializer, JourneySearchSerializer, FareCalendarQuerySerializer,
+    TripOverviewTripSerializer, TripOverviewRouteSerializer, TripOverviewShipSerializer,
+    BatchRequestSerializer, TripScheduleSerializer, ScheduleDepartureSerializer, ItineraryQuerySerializer
 )
 from .filters import (
     NotificationFilter, CompanyFilter, RolFilter, UserCompanyFilter,
     ShipFilter, SeatTypeFilter, SeatFilter, RouteFilter, TripFilter,
     TripSeatFilter, BookingFilter, PaymentMethodFilter, PaymentFilter
 )
+from . import batch, dbpool, fares, layouts, notifications, schedules, sharding
+from .batch import BatchRateThrottle
+from .coalescing import CoalescedListMixin
+from .concurrency import VersionedUpdateMixin
+from .idempotency import IdempotentCreateMixin
+from .sharding import ShardedViewSetMixin
+from .tenancy import CompanyScopedMixin, IsOperatorOrReadOnly, UserScopedMixin, company_scope
+from .journeys import get_index as get_journey_index
+from .pagination import CachedCountPagination
+from .changefeed import (
+    InvalidCursor, ExpiredCursor, decode_cursor, encode_cursor, head_cursor, read_changes
+)
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -47,28 +70,169 @@ class RegisterView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
-    queryset=Notification.objects.all()
-    serializer_class = NotificationSerializer
+class BatchView(APIView):
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_class = NotificationFilter
+    throttle_classes = [BatchRateThrottle]
+    batchable = False
+
+    @swagger_auto_schema(
+        operation_summary="Run several API calls in one request",
+        operation_description=(
+            "Each item is dispatched to the matching `/api/` endpoint as the batch's "
+            "user and answered with its own status, selected headers and body, in "
+            "request order. Reads run together (retrieves on one endpoint share a "
+            "query); writes run in order and are not rolled back if a later item "
+            "fails. Limited to `BATCH_MAX_REQUESTS` items and `BATCH_MAX_COST` "
+            "(reads cost 1, writes 5), charged against the user's rate limit."
+        ),
+        request_body=BatchRequestSerializer,
+        responses={200: openapi.Response(description="Per-item results")},
+    )
+    def post(self, request):
+        serializer = BatchRequestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        prefix = reverse('batch').rsplit('batch/', 1)[0]
+        return Response({"responses": batch.execute(request, serializer.validated_data['requests'], prefix)})
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class DatabasePoolView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    @swagger_auto_schema(
+        operation_summary="Connection pool metrics of this worker",
+        operation_description=(
+            "Counters of the worker process that served the request: checkouts, "
+            "checkouts that had to wait (and for how long), timeouts, new "
+            "connections, connections replaced after a failed ping, and "
+            "connections closed for age or returned in an unsafe state."
+        ),
+        responses={200: openapi.Response(description="Per-database pool counters")},
+    )
+    def get(self, request):
+        return Response({"pid": os.getpid(), "pools": dbpool.stats()})
+
+
+class ChangeFeedView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    max_limit = 1000
+
+    @swagger_auto_schema(
+        operation_summary="Delta-sync change feed",
+        operation_description=(
+            "Returns routes, trips, trip seats and seat types created, updated or deleted since "
+            "`cursor`. Without a cursor only the current head cursor is returned: "
+            "fetch it first, then do the full listing, then poll with it."
+        ),
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+        ],
+        responses={
+            200: openapi.Response(description="Changes and the next cursor"),
+            400: openapi.Response(description="Invalid cursor"),
+            410: openapi.Response(description="Cursor expired, resync from the listings"),
+        }
+    )
+    def get(self, request):
+        cursor = request.query_params.get('cursor')
+        if not cursor:
+            return Response({"results": [], "next_cursor": head_cursor(), "has_more": False})
+        try:
+            position = decode_cursor(cursor)
+        except InvalidCursor:
+            return Response({"detail": "Invalid cursor."}, status=status.HTTP_400_BAD_REQUEST)
+        except ExpiredCursor:
+            return Response({"detail": "Cursor expired, resync required."}, status=status.HTTP_410_GONE)
+        try:
+            limit = min(int(request.query_params.get('limit', 500)), self.max_limit)
+        except ValueError:
+            return Response({"detail": "Invalid limit."}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes, position, has_more = read_changes(position, max(limit, 1), context={'request': request})
+        return Response({
+            "results": changes,
+            "next_cursor": encode_cursor(position),
+            "has_more": has_more,
+        })
+
+
+class JourneyPlannerView(APIView):
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    @swagger_auto_schema(
+        operation_summary="Search direct and connecting journeys",
+        operation_description=(
+            "Returns Pareto-optimal journeys (no other option both arrives earlier and "
+            "costs less) between two ports, sorted by `sort`. Prices include the "
+            "cheapest seat type surcharge of each leg's ship."
+        ),
+        query_serializer=JourneySearchSerializer,
+    )
+    def get(self, request):
+        serializer = JourneySearchSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        min_transfer = params.get('min_transfer', getattr(settings, 'JOURNEY_MIN_TRANSFER_MINUTES', 60))
+
+        journeys = get_journey_index().search(
+            params['origin'], params['destiny'],
+            depart_after=params.get('depart_after') or timezone.now(),
+            max_legs=params['max_legs'],
+            min_transfer=timedelta(minutes=min_transfer),
+        )
+        if params['sort'] == 'cheapest':
+            journeys.sort(key=lambda journey: (journey['price'], journey['arrival']))
+        return Response({"results": journeys[:params['limit']]})
+
+
+class NotificationViewSet(UserScopedMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = NotificationFilter
+    ordering = ['-created_at', '-id']
 
+    @swagger_auto_schema(
+        operation_summary="Notify every booker of a trip or route",
+        request_body=NotificationFanOutSerializer,
+        responses={202: openapi.Response(description="Fan-out queued")},
+    )
+    @action(detail=False, methods=['post'], url_path='fan-out',
+            permission_classes=[permissions.IsAdminUser])
+    def fan_out(self, request):
+        serializer = NotificationFanOutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = notifications.schedule_fan_out(**serializer.validated_data)
+        return Response(
+            {"message": "Fan-out queued", "job_id": job.pk if job else None},
+            status=status.HTTP_202_ACCEPTED,
+        )
 
-class CompanyViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'], url_path='unread-count')
+    def unread_count(self, request):
+        return Response({"unread": notifications.unread_count(request.user)})
+
+    @swagger_auto_schema(
+        operation_summary="Mark notifications as read",
+        operation_description="Marks the given ids, or every unread notification when `ids` is omitted.",
+        request_body=NotificationMarkReadSerializer,
+    )
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        serializer = NotificationMarkReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        updated = notifications.mark_read(request.user, serializer.validated_data.get('ids'))
+        return Response({"updated": updated, "unread": notifications.unread_count(request.user)})
+
+
+class CompanyViewSet(CompanyScopedMixin, viewsets.ModelViewSet):
     queryset = Company.objects.all()
     serializer_class = CompanySerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = CompanyFilter
+    company_field = 'id'
 
 
 class RolViewSet(viewsets.ModelViewSet):
@@ -79,68 +243,350 @@ class RolViewSet(viewsets.ModelViewSet):
     filterset_class = RolFilter
 
 
-class UserCompanyViewSet(viewsets.ModelViewSet):
+class UserCompanyViewSet(CompanyScopedMixin, viewsets.ModelViewSet):
     queryset = UserCompany.objects.all()
     serializer_class = UserCompanySerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = UserCompanyFilter
+    company_field = 'empresa_id'
 
 
-class ShipViewSet(viewsets.ModelViewSet):
+class ShipViewSet(ShardedViewSetMixin, CompanyScopedMixin, viewsets.ModelViewSet):
     queryset = Ship.objects.all()
     serializer_class = ShipSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = ShipFilter
+    company_field = 'company_id'
+
+    @swagger_auto_schema(
+        operation_summary="Seat layout and capacity of a ship",
+        operation_description=(
+            "Reads the ship's precomputed layout: total `capacity` and, per seat type, its "
+            "surcharge, capacity and `seats` as `[seat_id, number]` pairs ordered by number. "
+            "Rebuilt whenever one of the ship's seats or seat types changes."
+        ),
+    )
+    @action(detail=True, methods=['get'])
+    def layout(self, request, pk=None):
+        ship = self.get_object()
+        capacity, seat_types = layouts.get(ship.pk)
+        return Response({"ship_id": ship.pk, "capacity": capacity, "seat_types": seat_types})
 
 
-class SeatTypeViewSet(viewsets.ModelViewSet):
+class SeatTypeViewSet(ShardedViewSetMixin, CompanyScopedMixin, viewsets.ModelViewSet):
     queryset = SeatType.objects.all()
     serializer_class = SeatTypeSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = SeatTypeFilter
+    company_field = 'ship__company_id'
 
 
-class SeatViewSet(viewsets.ModelViewSet):
+class SeatViewSet(ShardedViewSetMixin, CompanyScopedMixin, viewsets.ModelViewSet):
     queryset = Seat.objects.all()
     serializer_class = SeatSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = SeatFilter
+    company_field = 'seatType__ship__company_id'
 
 
-class RouteViewSet(viewsets.ModelViewSet):
+class RouteViewSet(ShardedViewSetMixin, CompanyScopedMixin, CoalescedListMixin, viewsets.ModelViewSet):
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = RouteFilter
+    company_field = 'company_id'
 
+    @swagger_auto_schema(
+        operation_summary="Cheapest fare and available seats per day of a month",
+        operation_description=(
+            "Reads the precomputed fare calendar. `min_price` is the base price plus the "
+            "cheapest surcharge among available seats, `null` when the day's trips are full. "
+            "Days without trips are omitted."
+        ),
+        query_serializer=FareCalendarQuerySerializer,
+    )
+    @action(detail=True, methods=['get'], url_path='fare-calendar')
+    def fare_calendar(self, request, pk=None):
+        serializer = FareCalendarQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        first_day = (serializer.validated_data.get('month') or timezone.localdate()).replace(day=1)
+        if not pk.isdigit():
+            raise Http404
+        days = list(fares.month(pk, first_day))
+        if not days:
+            get_object_or_404(Route, pk=pk)
+        return Response({"route_id": int(pk), "month": first_day.strftime('%Y-%m'), "days": days})
 
-class TripViewSet(viewsets.ModelViewSet):
+
+class TripViewSet(
+    VersionedUpdateMixin, ShardedViewSetMixin, CompanyScopedMixin, CoalescedListMixin, viewsets.ModelViewSet,
+):
     queryset = Trip.objects.all()
     serializer_class = TripSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = TripFilter
+    company_field = 'route__company_id'
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'overview':
+            queryset = queryset.select_related('route__company', 'seat__seatType__ship__company')
+        return queryset
 
+    @swagger_auto_schema(
+        operation_summary="Departures and free seats on one day",
+        operation_description=(
+            "Accepts the trip filters and requires `date`. Stored trips report their free "
+            "seats; scheduled departures without a trip row yet (`materialized: false`) "
+            "report the ship's full capacity, without creating any rows."
+        ),
+        manual_parameters=[
+            openapi.Parameter('date', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date', required=True),
+        ],
+    )
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        filterset = TripFilter(request.query_params, queryset=self.get_queryset(), request=request)
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        if filterset.form.cleaned_data.get('date') is None:
+            raise ValidationError({"date": ["This parameter is required."]})
 
-class TripSeatViewSet(viewsets.ModelViewSet):
+        trips = filterset.qs.select_related(None).annotate(
+            min_surcharge=Min(
+                'seattypeavailability__seatType__aditionalPrice',
+                filter=Q(seattypeavailability__available__gt=0),
+            ),
+        ).values(
+            'id', 'schedule_id', 'route_id', 'seat__seatType__ship_id', 'dateDeparture', 'basePrice',
+            'min_surcharge', 'available_seats',
+        )
+        results = [
+            {
+                'trip_id': trip['id'],
+                'schedule_id': trip['schedule_id'],
+                'route_id': trip['route_id'],
+                'ship_id': trip['seat__seatType__ship_id'],
+                'dateDeparture': trip['dateDeparture'],
+                'basePrice': trip['basePrice'],
+                'min_price': None if trip['min_surcharge'] is None else trip['basePrice'] + trip['min_surcharge'],
+                'available_seats': trip['available_seats'],
+                'materialized': True,
+            }
+            for trip in trips
+        ]
+        scheduled = TripSchedule.objects.all()
+        companies = company_scope(request)
+        if companies is not None:
+            scheduled = scheduled.filter(route__company_id__in=companies)
+        results += filterset.scheduled(scheduled)
+        results.sort(key=lambda departure: departure['dateDeparture'])
+        return Response({"date": filterset.form.cleaned_data['date'], "results": results})
+
+    @swagger_auto_schema(
+        operation_summary="Trip page in one call",
+        operation_description=(
+            "Trip, route, ship layout, seat type prices and seat availability in three "
+            "queries. Companies, the ship and seat types appear once and are referenced "
+            "by id; `seats` covers the whole ship, with `trip_seat_id`/`state` null for "
+            "seats not offered on this trip."
+        ),
+    )
+    @action(detail=True, methods=['get'])
+    def overview(self, request, pk=None):
+        trip = self.get_object()
+        ship = trip.seat.seatType.ship
+        _, layout = layouts.get(ship.id)
+        seat_types = [(seat_type['id'], seat_type['aditionalPrice']) for seat_type in layout]
+        seats = sorted(
+            (
+                (seat_id, number, seat_type['id'])
+                for seat_type in layout for seat_id, number in seat_type['seats']
+            ),
+            key=lambda seat: (seat[1], seat[0]),
+        )
+        trip_seats = {
+            seat_id: (trip_seat_id, state)
+            for trip_seat_id, seat_id, state in TripSeat.objects.filter(trip_id=trip.id).values_list(
+                'id', 'seat_id', 'state'
+            )
+        }
+
+        availability = {state: 0 for state, _ in TripSeat.STATE_CHOICES}
+        counts = {}
+        seat_rows = []
+        for seat_id, number, seat_type_id in seats:
+            trip_seat_id, state = trip_seats.get(seat_id, (None, None))
+            seat_rows.append({
+                "id": seat_id, "number": number, "seat_type_id": seat_type_id,
+                "trip_seat_id": trip_seat_id, "state": state,
+            })
+            if state is not None:
+                availability[state] = availability.get(state, 0) + 1
+                total, available = counts.get(seat_type_id, (0, 0))
+                counts[seat_type_id] = (total + 1, available + (state == 'disponible'))
+
+        companies = {trip.route.company_id: trip.route.company, ship.company_id: ship.company}
+        context = self.get_serializer_context()
+        return Response({
+            "trip": TripOverviewTripSerializer(trip, context=context).data,
+            "route": TripOverviewRouteSerializer(trip.route, context=context).data,
+            "ship": TripOverviewShipSerializer(ship, context=context).data,
+            "companies": CompanySerializer(companies.values(), many=True, context=context).data,
+            "seat_types": [
+                {
+                    "id": seat_type_id,
+                    "aditionalPrice": surcharge,
+                    "price": trip.basePrice + surcharge,
+                    "trip_seats": counts.get(seat_type_id, (0, 0))[0],
+                    "available": counts.get(seat_type_id, (0, 0))[1],
+                }
+                for seat_type_id, surcharge in seat_types
+            ],
+            "seats": seat_rows,
+            "availability": availability,
+        })
+
+
+class TripScheduleViewSet(ShardedViewSetMixin, CompanyScopedMixin, viewsets.ModelViewSet):
+    queryset = TripSchedule.objects.all()
+    serializer_class = TripScheduleSerializer
+    permission_classes = [IsOperatorOrReadOnly]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['route', 'ship', 'active']
+    company_field = 'route__company_id'
+
+    def get_permissions(self):
+        if self.action == 'departures':
+            return [IsAuthenticated()]
+        return super().get_permissions()
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        schedules.materialize_due(schedules=TripSchedule.objects.filter(pk=serializer.instance.pk))
+
+    def perform_update(self, serializer):
+        # Trips already generated keep their time and price; only new dates follow the edit.
+        super().perform_update(serializer)
+        schedules.materialize_due(schedules=TripSchedule.objects.filter(pk=serializer.instance.pk))
+
+    @swagger_auto_schema(
+        operation_summary="Get or create the trip of a scheduled date",
+        operation_description=(
+            "Materializes the departure on `date` (with its seats) if it has no trip yet, "
+            "so it can be booked. Limited to `SCHEDULE_BOOKING_HORIZON_DAYS` ahead."
+        ),
+        request_body=ScheduleDepartureSerializer,
+        responses={200: TripSerializer, 400: openapi.Response(description="No departure on that date")},
+    )
+    @action(detail=True, methods=['post'])
+    def departures(self, request, pk=None):
+        schedule = self.get_object()
+        serializer = ScheduleDepartureSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        day = serializer.validated_data['date']
+        horizon = timezone.localdate() + timedelta(days=getattr(settings, 'SCHEDULE_BOOKING_HORIZON_DAYS', 365))
+        if day < timezone.localdate() or day > horizon:
+            raise ValidationError({"date": ["Date is outside the booking horizon."]})
+        trip = schedules.materialize_day(schedule, day)
+        if trip is None:
+            raise ValidationError({"date": ["This schedule has no departure on that date."]})
+        return Response(TripSerializer(trip, context=self.get_serializer_context()).data)
+
+
+class TripSeatViewSet(VersionedUpdateMixin, ShardedViewSetMixin, CompanyScopedMixin, viewsets.ModelViewSet):
     queryset = TripSeat.objects.all()
     serializer_class = TripSeatSerializer
-    permission_classes = [IsAuthenticatedOrReadOnly]
+    permission_classes = [IsOperatorOrReadOnly]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = TripSeatFilter
+    company_field = 'trip__route__company_id'
+    pagination_class = CachedCountPagination
 
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(
+    IdempotentCreateMixin, VersionedUpdateMixin, ShardedViewSetMixin, UserScopedMixin, CompanyScopedMixin,
+    viewsets.ModelViewSet,
+):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
     filterset_class = BookingFilter
+    company_field = 'tripSeat__trip__route__company_id'
+    pagination_class = CachedCountPagination
+    ordering = ['-created_at', '-id']
+
+    @swagger_auto_schema(
+        operation_summary="The requesting user's trips",
+        operation_description=(
+            "Upcoming (soonest first) or past (latest first) trips booked by the requesting "
+            "user, whatever their role, as flat rows of booking, trip, route, seat and price "
+            "read in one query. `has_more` tells whether another `offset` page exists."
+        ),
+        query_serializer=ItineraryQuerySerializer,
+    )
+    @action(detail=False, methods=['get'], url_path='my-trips')
+    def my_trips(self, request):
+        serializer = ItineraryQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        when, limit, offset = (serializer.validated_data[key] for key in ('when', 'limit', 'offset'))
+
+        bookings = Booking.objects.filter(user_id=request.user.pk)
+        if when == 'upcoming':
+            bookings = bookings.filter(tripSeat__trip__dateDeparture__gte=timezone.now()).order_by(
+                'tripSeat__trip__dateDeparture', 'id'
+            )
+        else:
+            bookings = bookings.filter(tripSeat__trip__dateDeparture__lt=timezone.now()).order_by(
+                '-tripSeat__trip__dateDeparture', '-id'
+            )
+        rows = bookings.annotate(
+            price=F('tripSeat__trip__basePrice') + F('tripSeat__seat__seatType__aditionalPrice'),
+        ).values(
+            'id', 'paid', 'created_at', 'tripSeat_id', 'tripSeat__state', 'tripSeat__trip_id',
+            'tripSeat__trip__dateDeparture', 'tripSeat__trip__route_id', 'tripSeat__trip__route__origin',
+            'tripSeat__trip__route__destiny', 'tripSeat__trip__route__duration',
+            'tripSeat__trip__route__company_id', 'tripSeat__trip__route__company__name',
+            'tripSeat__seat_id', 'tripSeat__seat__number', 'tripSeat__seat__seatType_id', 'price',
+        )
+        if sharding.enabled():
+            # The user's bookings can be on every shard.
+            rows = sharding.ScatterQuerySet(rows)
+        rows = list(rows[offset:offset + limit + 1])
+
+        results = [
+            {
+                'booking_id': row['id'],
+                'paid': row['paid'],
+                'booked_at': row['created_at'],
+                'trip_id': row['tripSeat__trip_id'],
+                'dateDeparture': row['tripSeat__trip__dateDeparture'],
+                'arrival': (
+                    None if row['tripSeat__trip__route__duration'] is None
+                    else row['tripSeat__trip__dateDeparture'] + row['tripSeat__trip__route__duration']
+                ),
+                'route_id': row['tripSeat__trip__route_id'],
+                'origin': row['tripSeat__trip__route__origin'],
+                'destiny': row['tripSeat__trip__route__destiny'],
+                'company_id': row['tripSeat__trip__route__company_id'],
+                'company_name': row['tripSeat__trip__route__company__name'],
+                'trip_seat_id': row['tripSeat_id'],
+                'seat_id': row['tripSeat__seat_id'],
+                'seat_number': row['tripSeat__seat__number'],
+                'seat_type_id': row['tripSeat__seat__seatType_id'],
+                'state': row['tripSeat__state'],
+                'price': row['price'],
+            }
+            for row in rows[:limit]
+        ]
+        return Response({"when": when, "results": results, "has_more": len(rows) > limit})
 
 
 class PaymentMethodViewSet(viewsets.ModelViewSet):
@@ -151,9 +597,14 @@ class PaymentMethodViewSet(viewsets.ModelViewSet):
     filterset_class = PaymentMethodFilter
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(
+    IdempotentCreateMixin, ShardedViewSetMixin, UserScopedMixin, CompanyScopedMixin, viewsets.ModelViewSet,
+):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_class = PaymentFilter
\ No newline at end of file
+    filterset_class = PaymentFilter
+    company_field = 'booking__tripSeat__trip__route__company_id'
+    user_field = 'booking__user_id'
+    pagination_class = CachedCountPagination
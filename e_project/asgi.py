@@ -2,6 +2,12 @@
 ASGI config for e_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The Server-Sent Events stream at ``/api/events/`` is only served through it:
+the ``events`` service of docker-compose.yml runs it with gunicorn's uvicorn
+workers (``gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker
+e_project.asgi:application``); route ``/api/events/`` there and everything
+else to the WSGI service. Events cross processes through
+``settings.EVENTS_BACKEND`` (``core.events``).
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -11,6 +17,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from core.startup import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'e_project.settings')
 
 application = get_asgi_application()
+
+# Import the URLconf, views and serializers now instead of on the first
+# request (once, in the master, when gunicorn preloads the app).
+warm_up()
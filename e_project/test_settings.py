@@ -0,0 +1,20 @@
+# test_settings.py
+"""Settings for running the test suite without MySQL.
+
+    python manage.py test --settings=e_project.test_settings
+
+Every alias is SQLite (the test runner keeps the test databases in
+memory). ``shard1`` and ``shard2`` exist for ``core.tests`` to turn
+sharding on with ``override_settings(SHARD_DATABASES=...)``; outside those
+tests ``SHARD_DATABASES`` stays ``['default']`` and nothing is routed.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR
+
+DATABASES = {
+    alias: {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / f'test_{alias}.sqlite3'}
+    for alias in ('default', 'shard1', 'shard2')
+}
+SHARD_DATABASES = ['default']
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
@@ -11,6 +11,12 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from core.startup import warm_up
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'e_project.settings')
 
 application = get_wsgi_application()
+
+# Import the URLconf, views and serializers now instead of on the first
+# request (once, in the master, when gunicorn preloads the app).
+warm_up()
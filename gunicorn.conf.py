@@ -0,0 +1,30 @@
+# gunicorn.conf.py
+"""Gunicorn settings (``gunicorn -c gunicorn.conf.py e_project.wsgi:application``).
+
+The application is loaded and warmed up (``core.startup``) in the master
+before it forks, so a new worker serves its first request at once and shares
+the imported code with the others instead of importing its own copy. Set
+``GUNICORN_PRELOAD=0`` to load it in each worker instead, e.g. with
+``--reload``. The worker count comes from ``WEB_CONCURRENCY`` or ``-w``.
+"""
+import gc
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from django.db import connections
+
+    from core import dbpool
+
+    # Workers must not share the master's database sockets.
+    connections.close_all()
+    for alias in list(dbpool.stats()):
+        dbpool.close_pool(alias)
+    # Move the preloaded objects out of the collector's reach, so collections
+    # in the workers don't write to (and so copy) the pages they share.
+    gc.freeze()